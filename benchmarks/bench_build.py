@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import argparse
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / "scripts"))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+from build_site import (  # noqa: E402
+    add_egress_rows,
+    add_split_level_transfer_fallbacks,
+    build_data,
+    build_door_lookup,
+    build_doors,
+    build_exit_map,
+    build_station_entry,
+    build_station_reference_lookup,
+    iter_typed_rows,
+    load_meta,
+    memoized_helpers,
+    nearest_doors,
+    read_csv,
+)
+from synthetic_network import SCALES, SYNTHETIC_CODE_RE, generate_network  # noqa: E402
+
+DEFAULT_MAX_EXPONENT = 1.2
+
+
+def best_time(func, repeat, setup=None):
+    best = None
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def prepare_stations(input_files, station_codes):
+    meta = load_meta(input_files["meta"])
+    station_rows = read_csv(input_files["stations"])
+    station_lookup = build_station_reference_lookup(station_rows)
+    exit_map = build_exit_map(iter_typed_rows(input_files["exits"], "Exits", meta), station_lookup)
+    doors, _door_meta = build_doors(list(iter_typed_rows(input_files["doors"], "Doors", meta)))
+    door_lookup = build_door_lookup(doors)
+    stations = []
+    station_map = {}
+    for row in station_rows:
+        name = row["nameStd"].strip()
+        station = build_station_entry(row, name, station_codes, SYNTHETIC_CODE_RE)
+        stations.append(station)
+        station_map[name] = station
+    add_egress_rows(
+        iter_typed_rows(input_files["egresses"], "Egresses", meta, station_lookup),
+        station_map,
+        exit_map,
+        doors,
+        door_lookup,
+    )
+    return stations
+
+
+def bench_scale(scale, repeat, work_dir):
+    input_files, station_codes = generate_network(Path(work_dir) / f"x{scale}", scale)
+    meta = load_meta(input_files["meta"])
+    station_rows = read_csv(input_files["stations"])
+    doors, _door_meta = build_doors(list(iter_typed_rows(input_files["doors"], "Doors", meta)))
+    x_values = [row.x for row in iter_typed_rows(input_files["egresses"], "Egresses", meta)]
+
+    def run_nearest_doors():
+        for x_value in x_values:
+            nearest_doors(doors, x_value)
+
+    timings = {
+        "build_data": (
+            len(x_values),
+            best_time(
+                lambda: build_data(
+                    input_files=input_files,
+                    station_codes=station_codes,
+                    station_code_re=SYNTHETIC_CODE_RE,
+                ),
+                repeat,
+            ),
+        ),
+        "nearest_doors": (len(x_values), best_time(run_nearest_doors, repeat)),
+        "build_station_reference_lookup": (
+            len(station_rows),
+            best_time(lambda: build_station_reference_lookup(station_rows), repeat),
+        ),
+        "add_split_level_transfer_fallbacks": (
+            len(station_rows),
+            best_time(
+                add_split_level_transfer_fallbacks,
+                repeat,
+                setup=lambda: (prepare_stations(input_files, station_codes),),
+            ),
+        ),
+    }
+    return timings, memo_counts(input_files, station_codes)
+
+
+def memo_counts(input_files, station_codes):
+    helpers = memoized_helpers()
+    # build_data() clears the memos before it starts.
+    build_data(
+        input_files=input_files,
+        station_codes=station_codes,
+        station_code_re=SYNTHETIC_CODE_RE,
+    )
+    meta = load_meta(input_files["meta"])
+    egress_rows = sum(1 for _row in iter_typed_rows(input_files["egresses"], "Egresses", meta))
+    counts = {}
+    for name, helper in helpers.items():
+        info = helper.cache_info()
+        counts[name] = (egress_rows, info.hits + info.misses, info.misses)
+    return counts
+
+
+def scaling_exponent(previous, current):
+    (prev_units, prev_seconds), (units, seconds) = previous, current
+    if prev_seconds <= 0 or seconds <= 0 or units == prev_units:
+        return None
+    return math.log(seconds / prev_seconds) / math.log(units / prev_units)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the build pipeline on synthetic networks.")
+    parser.add_argument(
+        "--scales",
+        default=",".join(str(scale) for scale in SCALES),
+        help="comma-separated multiples of the WMATA network size (default: %(default)s)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="best-of-N timing (default: %(default)s)")
+    parser.add_argument(
+        "--max-exponent",
+        type=float,
+        default=DEFAULT_MAX_EXPONENT,
+        help="flag steps whose log-log slope exceeds this (default: %(default)s)",
+    )
+    parser.add_argument("--check", action="store_true", help="exit 1 when any step is flagged")
+    args = parser.parse_args()
+    scales = [int(value) for value in args.scales.split(",") if value.strip()]
+
+    results = {}
+    memo = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scale in scales:
+            print(f"Benchmarking {scale}x ...", file=sys.stderr)
+            results[scale], memo[scale] = bench_scale(scale, args.repeat, work_dir)
+
+    flagged = []
+    print(f"{'Function':<36} {'Scale':>6} {'Units':>9} {'Seconds':>10} {'us/unit':>9} {'Exponent':>9}")
+    for name in results[scales[0]]:
+        previous = None
+        for scale in scales:
+            units, seconds = results[scale][name]
+            exponent = scaling_exponent(previous, (units, seconds)) if previous else None
+            marker = ""
+            if exponent is not None and exponent > args.max_exponent:
+                marker = "  SUPER-LINEAR"
+                flagged.append((name, scale, exponent))
+            exponent_label = f"{exponent:.2f}" if exponent is not None else "-"
+            print(
+                f"{name:<36} {scale:>5}x {units:>9,} {seconds:>10.4f} "
+                f"{seconds / units * 1e6:>9.2f} {exponent_label:>9}{marker}"
+            )
+            previous = (units, seconds)
+
+    print()
+    print(f"{'Memoized helper':<36} {'Scale':>6} {'Rows':>9} {'Calls/row':>10} {'Computed/row':>13}")
+    for scale in scales:
+        for name, (rows, calls, misses) in memo[scale].items():
+            print(f"{name:<36} {scale:>5}x {rows:>9,} {calls / rows:>10.3f} {misses / rows:>13.4f}")
+
+    if flagged and args.check:
+        print(f"{len(flagged)} step(s) scaled worse than n^{args.max_exponent}.", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
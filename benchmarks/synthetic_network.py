@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import random
+import re
+import shutil
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / "scripts"))
+
+from build_site import INPUT_FILES, LINE_COLS  # noqa: E402
+
+SCALES = (1, 10, 100, 1000)
+
+# Shape of the current WMATA data, per 1x of scale.
+BASE_STATION_COUNT = 102
+BASE_SPLIT_LEVEL_PAIRS = 4
+EGRESSES_PER_STATION = 4
+EXIT_SHARE = 0.7
+
+SYNTHETIC_CODE_RE = re.compile(r"[A-Z]{2}[0-9]{5}")
+PLATFORM_TYPES = ["Island", "Island", "Island", "Side", "Gap Island", "Terminus WB", "Terminus EB"]
+LINE_CODES = list(LINE_COLS)
+ICONS = ["esc", "esc", "el", "stair", "exit"]
+STREETS = ["Main St", "Park Ave", "Market Sq", "1st St NW", "Library", "Parking Garage", "Bus Bays"]
+
+
+def read_headers(path):
+    with path.open(newline="") as handle:
+        return next(csv.reader(handle))
+
+
+def write_rows(path, headers, rows):
+    with path.open("w", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=headers)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def platform_x(rng):
+    return f"{rng.randint(4, 142) / 2:g}"
+
+
+def line_flags(lines):
+    return {col: "TRUE" if code in lines else "" for code, col in LINE_COLS.items()}
+
+
+def station_code(index):
+    letters = chr(ord("A") + index // 2600000 % 26) + chr(ord("A") + index // 100000 % 26)
+    return f"{letters}{index % 100000:05d}"
+
+
+def station_row(name, lines, rng, platform_type=None):
+    return {
+        "nameStd": name,
+        "nameAlt": name.replace("Station", "Stn") if rng.random() < 0.3 else "",
+        "subtitile": rng.choice(STREETS) if rng.random() < 0.25 else "",
+        **line_flags(lines),
+        "platformType": platform_type or rng.choice(PLATFORM_TYPES),
+        "WBDir": f"Terminal {rng.randint(1, 40)}",
+        "EBDir": f"Terminal {rng.randint(41, 80)}",
+        "compassN": rng.choice(["n", "s", "e", "w"]),
+    }
+
+
+def egress_rows_for(name, exit_labels, rng, count):
+    rows = []
+    for _ in range(count):
+        rows.append({
+            "nameStd": name,
+            "icon": rng.choice(ICONS),
+            "y": str(rng.randint(1, 3)),
+            "x": platform_x(rng),
+            "dir": rng.choice(["nw", "ne"]),
+            "zDir": rng.choice(["u", "d"]),
+            "pref": "TRUE" if rng.random() < 0.1 else "",
+            "x2": "",
+            "exitLabel": rng.choice(exit_labels) if exit_labels and rng.random() < 0.6 else "",
+            "group": str(rng.randint(1, 4)),
+        })
+    return rows
+
+
+def generate_network(out_dir, scale, seed=2025):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(f"{seed}-{scale}")
+    input_files = {key: out_dir / path.name for key, path in INPUT_FILES.items()}
+    shutil.copyfile(INPUT_FILES["meta"], input_files["meta"])
+    shutil.copyfile(INPUT_FILES["doors"], input_files["doors"])
+
+    station_rows = []
+    exit_rows = []
+    egress_rows = []
+    station_codes = {}
+
+    def add_station(row, exits):
+        station_codes[row["nameStd"]] = station_code(len(station_codes))
+        station_rows.append(row)
+        labels = []
+        for label, description in enumerate(exits, start=1):
+            exit_rows.append({"nameStd": row["nameStd"], "exitLabel": str(label), "description": description})
+            labels.append(str(label))
+        reference = row["nameAlt"] or row["nameStd"]
+        egress = egress_rows_for(reference, labels, rng, EGRESSES_PER_STATION)
+        egress_rows.extend(egress)
+
+    pair_count = BASE_SPLIT_LEVEL_PAIRS * scale
+    for pair in range(pair_count):
+        upper_lines = sorted(rng.sample(LINE_CODES[:2], 1))
+        lower_lines = sorted(rng.sample(LINE_CODES[2:], rng.randint(1, 3)))
+        base_name = f"Hub {pair:06d}"
+        transfer = f"{'/'.join(lower_lines)} Trains to Terminal {rng.randint(1, 80)}, Stairs at center"
+        add_station(station_row(f"{base_name} (Upper Level)", upper_lines, rng, "Side"), [transfer])
+        # Every other lower level has no transfer description, so it takes the
+        # add_split_level_transfer_fallbacks() path.
+        lower_exits = [f"{'/'.join(upper_lines)} Trains to Terminal {rng.randint(1, 80)}"] if pair % 2 else []
+        add_station(station_row(f"{base_name} (Lower Level)", lower_lines, rng, "Island"), lower_exits)
+
+    for index in range(BASE_STATION_COUNT * scale - 2 * pair_count):
+        lines = rng.sample(LINE_CODES, rng.randint(1, 3))
+        exits = [rng.choice(STREETS) for _ in range(rng.randint(1, 2))] if rng.random() < EXIT_SHARE else []
+        add_station(station_row(f"Synthetic Station {index:07d}", lines, rng), exits)
+
+    write_rows(input_files["stations"], read_headers(INPUT_FILES["stations"]), station_rows)
+    write_rows(input_files["exits"], read_headers(INPUT_FILES["exits"]), exit_rows)
+    write_rows(input_files["egresses"], read_headers(INPUT_FILES["egresses"]), egress_rows)
+    return input_files, station_codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic Stations/Exits/Egresses/Doors CSVs.")
+    parser.add_argument("out_dir", help="directory to write the CSVs into")
+    parser.add_argument("--scale", type=int, default=1, help="multiple of the current WMATA network size")
+    parser.add_argument("--seed", type=int, default=2025)
+    args = parser.parse_args()
+    input_files, station_codes = generate_network(args.out_dir, args.scale, args.seed)
+    print(f"Wrote {len(station_codes):,} stations to {Path(args.out_dir)}")
+
+
+if __name__ == "__main__":
+    main()
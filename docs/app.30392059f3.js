@@ -0,0 +1,1307 @@
+const DATA = JSON.parse(document.getElementById("app-data").textContent);
+    const stationInput = document.getElementById("stationInput");
+    const stationSuggestions = document.getElementById("stationSuggestions");
+    const clearStation = document.getElementById("clearStation");
+    const lineSelect = document.getElementById("lineSelect");
+    const lineStatic = document.getElementById("lineStatic");
+    const directionSelect = document.getElementById("directionSelect");
+    const results = document.getElementById("results");
+    const resultsTitle = document.getElementById("resultsTitle");
+    const resultsSub = document.getElementById("resultsSub");
+    const copyBtn = document.getElementById("copyBtn");
+    const copyFeedback = document.getElementById("copyFeedback");
+    const lineTags = document.getElementById("lineTags");
+    const platformNote = document.getElementById("platformNote");
+    const exampleButtons = document.querySelectorAll("[data-station-example]");
+    const editionField = document.getElementById("editionField");
+    const editionSelect = document.getElementById("editionSelect");
+    const destinationField = document.getElementById("destinationField");
+    const destinationInput = document.getElementById("destinationInput");
+    const destinationSuggestions = document.getElementById("destinationSuggestions");
+    const clearDestination = document.getElementById("clearDestination");
+
+    let selectedStation = null;
+    let selectedDestination = null;
+    let copyFeedbackTimer = null;
+    const SHARED_PLATFORM_NOTE = "At shared-platform stations, recommendations are based on platform direction; changing line may not change the result.";
+    const SHARD_ERROR = "Could not load this station. Check your connection and try again.";
+    const NO_TRIP_ROUTE = "No route on one line or through a split-level transfer station.";
+    const NO_TRIP_SAME_STATION = "Origin and destination are the same station.";
+
+    const normalize = (value) => String(value || "")
+      .toLowerCase()
+      .replace(/[^a-z0-9]+/g, " ")
+      .trim();
+
+    const lineName = (code) => (DATA.lines[code] ? DATA.lines[code].name : code);
+
+    const findLineCode = (station, value) => {
+      const requested = normalize(value);
+      if (!station || !requested) {
+        return "";
+      }
+      return station.lines.find((code) => (
+        normalize(code) === requested || normalize(lineName(code)) === requested
+      )) || "";
+    };
+
+    // Stations are referenced by their position in DATA.stations.
+    const createStationSearch = (stations, SEARCH) => {
+      stations.forEach((station, index) => {
+        const tokens = [
+          station.name,
+          station.alt || "",
+          station.subtitle || "",
+          station.station_code || "",
+        ].join(" ");
+        station.tableIndex = index;
+        station.search = normalize(tokens);
+        station.nameLower = station.name.toLowerCase();
+        station.altLower = (station.alt || "").toLowerCase();
+        station.codeLower = (station.station_code || "").toLowerCase();
+      });
+
+      // Positions are packed as SEARCH.width base-36 digits each; a trigram
+      // posting's key lists its stations and its value the trigrams, three
+      // characters apiece, that share it. Small networks ship no trigrams.
+      const unpackPosition = (packed, start) => parseInt(packed.slice(start, start + SEARCH.width), 36);
+      const trigrams = SEARCH.trigrams ? new Map() : null;
+      Object.entries(SEARCH.trigrams || {}).forEach(([packed, grams]) => {
+        const posting = [];
+        for (let i = 0; i < packed.length; i += SEARCH.width) {
+          posting.push(unpackPosition(packed, i));
+        }
+        for (let i = 0; i < grams.length; i += 3) {
+          trigrams.set(grams.slice(i, i + 3), posting);
+        }
+      });
+
+      const prefixMatches = (order, field, value) => {
+        let low = 0;
+        let high = order.length;
+        while (low < high) {
+          const mid = (low + high) >> 1;
+          if (stations[order[mid]][field] < value) {
+            low = mid + 1;
+          } else {
+            high = mid;
+          }
+        }
+        const matches = [];
+        for (let i = low; i < order.length && stations[order[i]][field].startsWith(value); i += 1) {
+          matches.push(stations[order[i]]);
+        }
+        return matches;
+      };
+
+      const intersectSorted = (left, right) => {
+        const both = [];
+        let i = 0;
+        let j = 0;
+        while (i < left.length && j < right.length) {
+          if (left[i] === right[j]) {
+            both.push(left[i]);
+            i += 1;
+            j += 1;
+          } else if (left[i] < right[j]) {
+            i += 1;
+          } else {
+            j += 1;
+          }
+        }
+        return both;
+      };
+
+      // Stations whose normalized search text contains `q`. Queries shorter
+      // than a trigram, or networks without trigrams, fall back to a scan.
+      const substringMatches = (q) => {
+        if (q.length < 3 || !trigrams) {
+          return stations.filter((station) => station.search.includes(q));
+        }
+        let candidates = null;
+        for (let i = 0; i + 3 <= q.length; i += 1) {
+          const posting = trigrams.get(q.slice(i, i + 3));
+          if (!posting) {
+            return [];
+          }
+          candidates = candidates ? intersectSorted(candidates, posting) : posting;
+        }
+        return candidates
+          .map((index) => stations[index])
+          .filter((station) => station.search.includes(q));
+      };
+
+      const findStationByParam = (stationValue, lineValue) => {
+        const requested = normalize(stationValue);
+        if (!requested) {
+          return null;
+        }
+        const scores = new Map();
+        substringMatches(requested).forEach((station) => scores.set(station, 1));
+        if (Object.prototype.hasOwnProperty.call(SEARCH.aliases, requested)) {
+          const hits = SEARCH.aliases[requested];
+          for (let i = 0; i < hits.length; i += SEARCH.width + 1) {
+            scores.set(stations[unpackPosition(hits, i)], Number(hits[i + SEARCH.width]));
+          }
+        }
+        const matches = Array.from(scores, ([station, score]) => ({ station, score }));
+        if (!matches.length) {
+          return null;
+        }
+
+        const lineMatches = lineValue
+          ? matches.filter((entry) => findLineCode(entry.station, lineValue))
+          : [];
+        const candidates = lineMatches.length ? lineMatches : matches;
+        candidates.sort((a, b) => {
+          if (b.score !== a.score) {
+            return b.score - a.score;
+          }
+          return a.station.name.localeCompare(b.station.name);
+        });
+        return candidates[0].station;
+      };
+
+      const findSuggestions = (query) => {
+        const q = normalize(query);
+        if (!q) {
+          return [];
+        }
+        const lower = query.toLowerCase();
+        const candidates = new Set([
+          ...prefixMatches(SEARCH.prefix.name, "nameLower", lower),
+          ...prefixMatches(SEARCH.prefix.alt, "altLower", lower),
+          ...prefixMatches(SEARCH.prefix.code, "codeLower", lower),
+          ...substringMatches(q),
+        ]);
+        const results = Array.from(candidates, (station) => {
+          let score = 0;
+          if (station.nameLower.startsWith(lower)) {
+            score += 3;
+          }
+          if (station.altLower && station.altLower.startsWith(lower)) {
+            score += 2;
+          }
+          if (station.codeLower && station.codeLower.startsWith(lower)) {
+            score += 2;
+          }
+          if (station.search.includes(q)) {
+            score += 1;
+          }
+          return { station, score };
+        }).filter((entry) => entry.score > 0);
+
+        results.sort((a, b) => {
+          if (b.score !== a.score) {
+            return b.score - a.score;
+          }
+          return a.station.name.localeCompare(b.station.name);
+        });
+
+        return results.slice(0, 8).map((entry) => entry.station);
+      };
+
+      return { findStationByParam, findSuggestions };
+    };
+
+    // Answers one request from the page: station suggestions and URL matches as
+    // indexes into DATA.stations (-1 for no match), station details as stored.
+    const answerSearchRequest = (search, details, message) => {
+      if (message.type === "suggest") {
+        return search.findSuggestions(message.query).map((station) => station.tableIndex);
+      }
+      if (message.type === "match") {
+        const station = search.findStationByParam(message.station, message.line);
+        return station ? station.tableIndex : -1;
+      }
+      return details[message.code] || null;
+    };
+
+    const stations = DATA.stations;
+    stations.forEach((station, index) => {
+      station.tableIndex = index;
+      station.nameLower = station.name.toLowerCase();
+    });
+
+    const levelLineHint = (station) => {
+      if (!/\((Lower|Upper) Level\)$/.test(station.name)) {
+        return "";
+      }
+      return ` [${station.lines.map(lineName).join(", ")}]`;
+    };
+
+    const findDirectionKey = (station, value) => {
+      const requested = normalize(value);
+      if (!station || !requested) {
+        return "";
+      }
+      const match = station.directions.find((dir) => (
+        normalize(dir.key) === requested ||
+        normalize(dir.label) === requested ||
+        normalize(dir.label.replace(/^Toward\s+/i, "")) === requested
+      ));
+      return match ? match.key : "";
+    };
+
+    const renderLineTags = (station) => {
+      lineTags.innerHTML = "";
+      if (!station) {
+        return;
+      }
+      station.lines.forEach((code) => {
+        const tag = document.createElement("span");
+        tag.className = "tag";
+        tag.style.background = DATA.lines[code] ? DATA.lines[code].color : "#202a3b";
+        tag.style.color = ["RD", "BL"].includes(code) ? "#fff" : "#111";
+        tag.textContent = lineName(code);
+        lineTags.appendChild(tag);
+      });
+    };
+
+    // Counts of the DOM writes made by the render in progress; see
+    // measureRender().
+    let renderStats = null;
+
+    const countRender = (field) => {
+      if (renderStats) {
+        renderStats[field] += 1;
+      }
+    };
+
+    // Runs `render` and records a User Timing measure named `name` whose
+    // detail counts the nodes it built and reused, the nodes it inserted,
+    // moved, or removed, and the text it changed. Only those writes invalidate
+    // layout, so a render that makes none of them causes no reflow; read the
+    // counts with performance.getEntriesByName("results-render").
+    const measureRender = (name, render) => {
+      const stats = { built: 0, reused: 0, inserted: 0, removed: 0, textChanges: 0 };
+      const start = performance.now();
+      renderStats = stats;
+      try {
+        render();
+      } finally {
+        renderStats = null;
+      }
+      try {
+        performance.measure(name, { start, end: performance.now(), detail: stats });
+      } catch (error) {
+        // Browsers without User Timing Level 3 take only mark names here.
+      }
+    };
+
+    const setText = (element, text) => {
+      if (element.textContent !== text) {
+        element.textContent = text;
+        countRender("textChanges");
+      }
+    };
+
+    const cachedNode = (cache, key, build) => {
+      if (cache.has(key)) {
+        countRender("reused");
+        return cache.get(key);
+      }
+      const node = build();
+      cache.set(key, node);
+      countRender("built");
+      return node;
+    };
+
+    // Makes `nodes` the children of `container` in order, inserting or moving
+    // only the ones not already in place and removing the rest.
+    const reconcileChildren = (container, nodes) => {
+      nodes.forEach((node, index) => {
+        const current = container.childNodes[index] || null;
+        if (current !== node) {
+          container.insertBefore(node, current);
+          countRender("inserted");
+        }
+      });
+      while (container.childNodes.length > nodes.length) {
+        container.removeChild(container.lastChild);
+        countRender("removed");
+      }
+    };
+
+    const buildSuggestionButton = (station, onSelect) => {
+      const button = document.createElement("button");
+      const subtitle = station.subtitle ? ` - ${station.subtitle}` : "";
+      button.textContent = `${station.name}${levelLineHint(station)}${subtitle}`;
+      button.type = "button";
+      button.addEventListener("click", () => onSelect(station));
+      return button;
+    };
+
+    // `buttons` keeps each station's button for this container by station
+    // code, so typing reorders existing buttons instead of rebuilding them.
+    const showSuggestions = (container, items, onSelect, buttons) => measureRender("suggestions-render", () => {
+      reconcileChildren(container, items.map((station) => (
+        cachedNode(buttons, station.station_code, () => buildSuggestionButton(station, onSelect))
+      )));
+      container.hidden = !items.length;
+    });
+
+    // #station-data holds the search index and, unless stations come from
+    // shards or binary tables, each station's egresses and transfers. A worker
+    // parses it and answers small requests (see answerSearchRequest()), so the
+    // main thread only parses the #app-data index. Without worker support the
+    // page parses it here instead.
+    const stationDataText = document.getElementById("station-data").textContent;
+    let stationSearch = null;
+    let stationDetails = null;
+    const useStationData = () => {
+      if (stationSearch) {
+        return;
+      }
+      const stationData = JSON.parse(stationDataText);
+      stationSearch = createStationSearch(stations, stationData.search);
+      stationDetails = stationData.stations || {};
+      stations.forEach((station) => Object.assign(station, stationDetails[station.station_code]));
+    };
+
+    const searchRequests = new Map();
+    let nextSearchRequest = 0;
+    let searchWorker = null;
+    if (typeof Worker !== "undefined") {
+      try {
+        searchWorker = new Worker("./search-worker.c882420a1d.js");
+        searchWorker.postMessage({
+          type: "load",
+          appData: document.getElementById("app-data").textContent,
+          stationData: stationDataText,
+        });
+        searchWorker.addEventListener("message", (event) => {
+          const request = searchRequests.get(event.data.id);
+          searchRequests.delete(event.data.id);
+          if (request) {
+            request.resolve(event.data.result);
+          }
+        });
+        searchWorker.addEventListener("error", () => {
+          searchWorker.terminate();
+          searchWorker = null;
+          useStationData();
+          searchRequests.forEach(({ message, resolve }) => {
+            resolve(answerSearchRequest(stationSearch, stationDetails, message));
+          });
+          searchRequests.clear();
+        });
+      } catch (error) {
+        searchWorker = null;
+      }
+    }
+    if (!searchWorker) {
+      useStationData();
+    }
+
+    const askSearch = (message) => {
+      if (!searchWorker) {
+        return Promise.resolve(answerSearchRequest(stationSearch, stationDetails, message));
+      }
+      nextSearchRequest += 1;
+      const id = nextSearchRequest;
+      return new Promise((resolve) => {
+        searchRequests.set(id, { message, resolve });
+        searchWorker.postMessage({ ...message, id });
+      });
+    };
+
+    const findSuggestions = (query) => askSearch({ type: "suggest", query })
+      .then((indexes) => indexes.map((index) => stations[index]));
+
+    const findStationByParam = (stationValue, lineValue) => askSearch({ type: "match", station: stationValue, line: lineValue })
+      .then((index) => (index < 0 ? null : stations[index]));
+
+    // Shows suggestions for the latest query only; answers to earlier
+    // keystrokes that arrive late are dropped.
+    const suggestionsFor = (container, onSelect) => {
+      const buttons = new Map();
+      let latest = 0;
+      return (query) => {
+        latest += 1;
+        const current = latest;
+        findSuggestions(query).then((items) => {
+          if (current === latest) {
+            showSuggestions(container, items, onSelect, buttons);
+          }
+        });
+      };
+    };
+
+    const fillSelect = (select, options, placeholder) => {
+      select.innerHTML = "";
+      if (placeholder) {
+        const opt = document.createElement("option");
+        opt.value = "";
+        opt.textContent = placeholder;
+        select.appendChild(opt);
+      }
+      options.forEach((item) => {
+        const opt = document.createElement("option");
+        opt.value = item.value;
+        opt.textContent = item.label;
+        select.appendChild(opt);
+      });
+    };
+
+    const hasSharedPlatformLineChoice = (station) => {
+      return Boolean(station && station.lines.length > 1);
+    };
+
+    const showLineDropdown = () => {
+      lineSelect.hidden = false;
+      lineStatic.hidden = true;
+      lineStatic.textContent = "";
+    };
+
+    const showStaticLine = (lineCode) => {
+      lineSelect.hidden = true;
+      lineSelect.disabled = true;
+      lineStatic.textContent = lineCode ? `${lineName(lineCode)} Line` : "";
+      lineStatic.hidden = false;
+    };
+
+    const directionOptionsForLine = (station, lineCode) => {
+      // The source data gives platform direction geometry. At shared-platform
+      // stations, a selected line labels the trip, but it does not create a
+      // separate line-specific door recommendation.
+      const sharedPlatform = hasSharedPlatformLineChoice(station);
+      return station.directions.map((dir) => ({
+        value: dir.key,
+        label: sharedPlatform ? `${dir.label} (platform direction)` : dir.label,
+      }));
+    };
+
+    const renderPlatformNote = () => {
+      if (!hasSharedPlatformLineChoice(selectedStation)) {
+        platformNote.textContent = "";
+        platformNote.hidden = true;
+        return;
+      }
+      platformNote.textContent = SHARED_PLATFORM_NOTE;
+      platformNote.hidden = false;
+    };
+
+    const renderDirectionSelector = (preferredDirection) => {
+      const lineCode = lineSelect.value || selectedStation.lines[0] || "";
+      const dirOptions = directionOptionsForLine(selectedStation, lineCode);
+      fillSelect(directionSelect, dirOptions, "Select a direction");
+      directionSelect.disabled = false;
+      const requestedDirection = findDirectionKey(selectedStation, preferredDirection);
+      directionSelect.value = requestedDirection || (dirOptions.length ? dirOptions[0].value : "");
+      renderPlatformNote();
+    };
+
+    const renderSelectors = (preferredLine, preferredDirection) => {
+      if (!selectedStation) {
+        lineSelect.disabled = true;
+        directionSelect.disabled = true;
+        showLineDropdown();
+        fillSelect(lineSelect, [], "Select a station first");
+        fillSelect(directionSelect, [], "Select a station first");
+        renderLineTags(null);
+        renderPlatformNote();
+        return;
+      }
+
+      const lineOptions = selectedStation.lines.map((code) => ({
+        value: code,
+        label: `${lineName(code)} Line`,
+      }));
+
+      const requestedLine = findLineCode(selectedStation, preferredLine);
+      const selectedLine = requestedLine || (lineOptions.length ? lineOptions[0].value : "");
+
+      fillSelect(
+        lineSelect,
+        lineOptions,
+        selectedStation.lines.length > 1 ? "Select a line" : ""
+      );
+      lineSelect.value = selectedLine;
+      if (selectedStation.lines.length === 1) {
+        showStaticLine(selectedLine);
+      } else {
+        showLineDropdown();
+        lineSelect.disabled = false;
+      }
+
+      renderDirectionSelector(preferredDirection);
+
+      renderLineTags(selectedStation);
+
+      // A trip fixes the line and direction of its first leg.
+      const legs = currentTrip();
+      if (legs) {
+        if (legs[0].from === selectedStation) {
+          lineSelect.value = legs[0].line;
+          directionSelect.value = legs[0].boardKey;
+        }
+        lineSelect.disabled = true;
+        directionSelect.disabled = true;
+      }
+    };
+
+    const doorByIndex = new Map((DATA.meta.doors || []).map((door) => [door.door_index, door]));
+
+    const resolveDoors = (doorRefs) => doorRefs.map((index) => doorByIndex.get(index));
+
+    const jsonEntries = {
+      list: (station, directionKey, groupKey) => {
+        if (groupKey === "transfers") {
+          return station.transfers_by_dir ? (station.transfers_by_dir[directionKey] || []) : [];
+        }
+        const egressForDir = station.egress_by_dir[directionKey] || {};
+        return egressForDir[groupKey] || [];
+      },
+      label: (egress) => egress.label,
+      note: (egress) => egress.note,
+      delta: (egress) => egress.delta,
+      doors: (egress) => resolveDoors(egress.doors),
+      targetLines: (egress) => egress.target_lines || [],
+    };
+
+    // --binary builds ship door, egress, and transfer tables as packed
+    // little-endian arrays. Entries are plain indexes into typed-array views
+    // over the fetched buffer; strings are decoded only when rendered.
+    const BINARY_MAGIC = 0x424d4344;
+    const BINARY_NO_STRING = 0xffffffff;
+    const BINARY_LAYOUT = DATA.meta.binary;
+    let binaryTables = null;
+    let binaryRequest = null;
+
+    const decodeBinaryTables = (buffer) => {
+      const header = new DataView(buffer);
+      if (header.getUint32(0, true) !== BINARY_MAGIC || header.getUint16(4, true) !== 1) {
+        throw new Error("Unrecognized station data file.");
+      }
+      const doorCount = header.getUint32(8, true);
+      const stationCount = header.getUint32(12, true);
+      const entryCount = header.getUint32(16, true);
+      const doorRefCount = header.getUint32(20, true);
+      const stringCount = header.getUint32(24, true);
+      const stringBytes = header.getUint32(28, true);
+      const rangeCount = stationCount * BINARY_LAYOUT.directions.length * BINARY_LAYOUT.groups.length * 2;
+      let offset = 32;
+      const take = (ArrayType, length) => {
+        const view = new ArrayType(buffer, offset, length);
+        offset += view.byteLength;
+        return view;
+      };
+      return {
+        entryX: take(Float64Array, entryCount),
+        entryDelta: take(Float64Array, entryCount),
+        ranges: take(Uint32Array, rangeCount),
+        platformTypes: take(Uint32Array, stationCount),
+        entryLabel: take(Uint32Array, entryCount),
+        entryNote: take(Uint32Array, entryCount),
+        entryTargetLines: take(Uint32Array, entryCount),
+        entryDoorStart: take(Uint32Array, entryCount),
+        stringOffsets: take(Uint32Array, stringCount + 1),
+        doors: take(Uint16Array, doorCount * 3),
+        doorRefs: take(Uint16Array, doorRefCount),
+        entryType: take(Uint8Array, entryCount),
+        entryDoorCount: take(Uint8Array, entryCount),
+        stringBytes: take(Uint8Array, stringBytes),
+        strings: new Array(stringCount),
+        textDecoder: new TextDecoder(),
+      };
+    };
+
+    const readBinaryString = (stringId) => {
+      if (stringId === BINARY_NO_STRING) {
+        return "";
+      }
+      const tables = binaryTables;
+      if (tables.strings[stringId] === undefined) {
+        tables.strings[stringId] = tables.textDecoder.decode(
+          tables.stringBytes.subarray(tables.stringOffsets[stringId], tables.stringOffsets[stringId + 1])
+        );
+      }
+      return tables.strings[stringId];
+    };
+
+    const binaryEntries = {
+      list: (station, directionKey, groupKey) => {
+        const dirIndex = BINARY_LAYOUT.directions.indexOf(directionKey);
+        const groupIndex = BINARY_LAYOUT.groups.indexOf(groupKey);
+        if (dirIndex < 0 || groupIndex < 0) {
+          return [];
+        }
+        const slot = ((station.tableIndex * BINARY_LAYOUT.directions.length + dirIndex)
+          * BINARY_LAYOUT.groups.length + groupIndex) * 2;
+        const start = binaryTables.ranges[slot];
+        const indexes = [];
+        for (let i = 0; i < binaryTables.ranges[slot + 1]; i += 1) {
+          indexes.push(start + i);
+        }
+        return indexes;
+      },
+      label: (entry) => readBinaryString(binaryTables.entryLabel[entry]),
+      note: (entry) => readBinaryString(binaryTables.entryNote[entry]),
+      delta: (entry) => {
+        const delta = binaryTables.entryDelta[entry];
+        return Number.isNaN(delta) ? null : delta;
+      },
+      doors: (entry) => {
+        const start = binaryTables.entryDoorStart[entry];
+        const doors = [];
+        for (let i = 0; i < binaryTables.entryDoorCount[entry]; i += 1) {
+          const row = binaryTables.doorRefs[start + i] * 3;
+          doors.push({
+            door_index: binaryTables.doors[row],
+            car_index: binaryTables.doors[row + 1],
+            door_in_car: binaryTables.doors[row + 2],
+          });
+        }
+        return doors;
+      },
+      targetLines: (entry) => readBinaryString(binaryTables.entryTargetLines[entry]).split("/").filter(Boolean),
+    };
+
+    const entries = BINARY_LAYOUT ? binaryEntries : jsonEntries;
+
+    const loadBinaryTables = () => {
+      if (!binaryRequest) {
+        binaryRequest = fetch(BINARY_LAYOUT.path)
+          .then((response) => {
+            if (!response.ok) {
+              throw new Error(`Station data request failed: ${response.status}`);
+            }
+            return response.arrayBuffer();
+          })
+          .then((buffer) => {
+            binaryTables = decodeBinaryTables(buffer);
+            return binaryTables;
+          })
+          .catch((error) => {
+            binaryRequest = null;
+            throw error;
+          });
+      }
+      return binaryRequest;
+    };
+
+    const formatDoorLabel = (door) => `Car ${door.car_index}, Door ${door.door_in_car}`;
+
+    const findDirectionLabel = (station, key) => {
+      for (let i = 0; i < station.directions.length; i += 1) {
+        if (station.directions[i].key === key) {
+          return station.directions[i].label;
+        }
+      }
+      return "";
+    };
+
+    // DATA.trips is built by build_trip_index() in build_site.py. A train keeps
+    // its door numbering for the whole ride, so the door to board at the origin
+    // is the door nearest the chosen egress where the leg ends.
+    const TRIPS = DATA.trips;
+
+    const tripLeg = (route, from, to) => {
+      const start = route.stations.indexOf(from.tableIndex);
+      const end = route.stations.indexOf(to.tableIndex);
+      if (start < 0 || end < 0 || start === end) {
+        return null;
+      }
+      const toward = end > start ? 1 : 0;
+      return {
+        line: route.line,
+        heading: route.ends[toward],
+        from,
+        to,
+        stops: Math.abs(end - start),
+        boardKey: `${route.keys[toward][start]}B`,
+        arriveKey: `${route.keys[toward][end]}B`,
+      };
+    };
+
+    const bestLeg = (fromStations, toStations) => {
+      let best = null;
+      TRIPS.routes.forEach((route) => {
+        fromStations.forEach((from) => {
+          toStations.forEach((to) => {
+            const leg = tripLeg(route, from, to);
+            if (leg && (!best || leg.stops < best.stops)) {
+              best = leg;
+            }
+          });
+        });
+      });
+      return best;
+    };
+
+    const stationLevels = (station) => {
+      const levels = [station];
+      TRIPS.transfers.forEach(([first, second]) => {
+        if (first === station.tableIndex) {
+          levels.push(stations[second]);
+        } else if (second === station.tableIndex) {
+          levels.push(stations[first]);
+        }
+      });
+      return levels;
+    };
+
+    // One leg when origin and destination share a line, otherwise two legs
+    // through the split-level station with the fewest total stops.
+    const findTrip = (origin, destination) => {
+      const origins = stationLevels(origin);
+      const destinations = stationLevels(destination);
+      if (origins.includes(destination)) {
+        return null;
+      }
+      const direct = bestLeg(origins, destinations);
+      if (direct) {
+        return [direct];
+      }
+      let best = null;
+      TRIPS.transfers.forEach(([first, second]) => {
+        [[first, second], [second, first]].forEach(([arrive, depart]) => {
+          const legs = [
+            bestLeg(origins, [stations[arrive]]),
+            bestLeg([stations[depart]], destinations),
+          ];
+          if (legs[0] && legs[1] && (!best || legs[0].stops + legs[1].stops < best[0].stops + best[1].stops)) {
+            best = legs;
+          }
+        });
+      });
+      return best;
+    };
+
+    const currentTrip = () => (
+      selectedStation && selectedDestination ? findTrip(selectedStation, selectedDestination) : null
+    );
+
+    const tripStations = (legs) => legs.map((leg) => leg.to);
+
+    const describeLeg = (leg) => `${lineName(leg.line)} Line toward ${leg.heading} from ${leg.from.name}`;
+
+    // Transfer entries at the end of `leg` toward the next leg's line, narrowed
+    // to the next leg's heading when the labels name one.
+    const tripTransferEntries = (leg, nextLeg) => {
+      const headingNames = nextLeg.heading.split("/");
+      const toLine = entries.list(leg.to, leg.arriveKey, "transfers")
+        .filter((entry) => entries.targetLines(entry).includes(nextLeg.line));
+      const toHeading = toLine.filter((entry) => {
+        const match = / toward (.+)$/.exec(entries.label(entry));
+        return Boolean(match) && match[1].split("/").some((name) => headingNames.includes(name));
+      });
+      return toHeading.length ? toHeading : toLine;
+    };
+
+    const resultGroups = [
+      { key: "transfers", label: "Transfers" },
+      { key: "escalator", label: "Escalators" },
+      { key: "stairs", label: "Stairs" },
+      { key: "elevator", label: "Elevators" },
+      { key: "other", label: "Other" },
+    ];
+
+    const resultBlocks = (legs) => {
+      if (!legs) {
+        const directionKey = directionSelect.value || selectedStation.directions[0].key;
+        return resultGroups.map((group) => ({
+          key: `${selectedStation.station_code}/${directionKey}/${group.key}`,
+          label: group.label,
+          list: entries.list(selectedStation, directionKey, group.key),
+        }));
+      }
+      const last = legs[legs.length - 1];
+      const blocks = legs.slice(0, -1).map((leg, index) => ({
+        key: `${leg.to.station_code}/${leg.arriveKey}/transfers to ${legs[index + 1].line} ${legs[index + 1].heading}`,
+        label: `Transfer at ${leg.to.name}`,
+        list: tripTransferEntries(leg, legs[index + 1]),
+      }));
+      return blocks.concat(resultGroups.slice(1).map((group) => ({
+        key: `${last.to.station_code}/${last.arriveKey}/${group.key} on arrival`,
+        label: `${group.label} at ${last.to.name}`,
+        list: entries.list(last.to, last.arriveKey, group.key),
+      })));
+    };
+
+    const formatDoorIndex = (doors) => {
+      if (doors.length === 1) {
+        return `Door index ${doors[0].door_index}`;
+      }
+      const first = doors[0].door_index;
+      const last = doors[doors.length - 1].door_index;
+      return `Door index ${first}-${last}`;
+    };
+
+    const buildResultItem = (egress, index) => {
+      const wrapper = document.createElement("div");
+      wrapper.className = "egress-item";
+
+      const title = document.createElement("strong");
+      title.textContent = entries.label(egress) || `Egress ${index + 1}`;
+
+      const doorLine = document.createElement("div");
+      const doors = entries.doors(egress);
+      const doorLabels = doors.map(formatDoorLabel);
+      doorLine.textContent = doorLabels.length > 1
+        ? `${doorLabels.join(" or ")}`
+        : doorLabels[0];
+
+      const details = document.createElement("div");
+      details.className = "muted";
+      const egressDelta = entries.delta(egress);
+      const delta = egressDelta != null ? `, delta ${egressDelta}` : "";
+      details.textContent = `${formatDoorIndex(doors)}${delta}`;
+
+      wrapper.appendChild(title);
+      const egressNote = entries.note(egress);
+      if (egressNote) {
+        const note = document.createElement("div");
+        note.className = "muted";
+        note.textContent = egressNote;
+        wrapper.appendChild(note);
+      }
+      wrapper.appendChild(doorLine);
+      wrapper.appendChild(details);
+      return wrapper;
+    };
+
+    const clearCopyFeedback = () => {
+      if (copyFeedbackTimer) {
+        window.clearTimeout(copyFeedbackTimer);
+        copyFeedbackTimer = null;
+      }
+      setText(copyFeedback, "");
+    };
+
+    const showCopyFeedback = (message) => {
+      copyFeedback.textContent = message;
+      if (copyFeedbackTimer) {
+        window.clearTimeout(copyFeedbackTimer);
+      }
+      copyFeedbackTimer = window.setTimeout(() => {
+        copyFeedback.textContent = "";
+        copyFeedbackTimer = null;
+      }, 2500);
+    };
+
+    const updateUrlFromSelection = () => {
+      if (!window.history || !window.history.replaceState) {
+        return;
+      }
+      const params = new URLSearchParams();
+      if (selectedStation) {
+        params.set("station", selectedStation.name);
+        if (lineSelect.value) {
+          params.set("line", lineSelect.value);
+        }
+        if (directionSelect.value) {
+          params.set("direction", directionSelect.value);
+        }
+      }
+      if (selectedDestination) {
+        params.set("to", selectedDestination.name);
+      }
+      const query = params.toString();
+      const nextUrl = `${window.location.pathname}${query ? `?${query}` : ""}${window.location.hash}`;
+      window.history.replaceState(null, "", nextUrl);
+    };
+
+    const stationDetailsLoaded = (station) => (
+      BINARY_LAYOUT ? Boolean(binaryTables) : Boolean(station.egress_by_dir)
+    );
+
+    const loadStationDetails = (station) => {
+      if (stationDetailsLoaded(station)) {
+        return Promise.resolve(station);
+      }
+      if (BINARY_LAYOUT) {
+        return loadBinaryTables().then(() => station);
+      }
+      if (!DATA.meta.shard_path) {
+        return askSearch({ type: "details", code: station.station_code }).then((details) => {
+          Object.assign(station, details);
+          return station;
+        });
+      }
+      if (!station.shardRequest) {
+        station.shardRequest = fetch(`${DATA.meta.shard_path}${station.shard}`)
+          .then((response) => {
+            if (!response.ok) {
+              throw new Error(`Station data request failed: ${response.status}`);
+            }
+            return response.json();
+          })
+          .then((shard) => {
+            station.egress_by_dir = shard.egress_by_dir;
+            station.transfers_by_dir = shard.transfers_by_dir;
+            return station;
+          })
+          .catch((error) => {
+            station.shardRequest = null;
+            throw error;
+          });
+      }
+      return station.shardRequest;
+    };
+
+    // Result blocks by station code, direction, and entry type (plus the next
+    // leg for trip transfers), each built once with its items in entry order.
+    // Entries never change after they load, so switching line, direction, or
+    // station back to one already shown reattaches its nodes as they were.
+    const resultBlockNodes = new Map();
+
+    const buildResultBlock = (group) => {
+      const block = document.createElement("div");
+      block.className = "egress-block";
+
+      const header = document.createElement("h3");
+      header.textContent = group.label;
+      block.appendChild(header);
+
+      if (!group.list.length) {
+        const empty = document.createElement("div");
+        empty.className = "empty";
+        empty.textContent = "No entries.";
+        block.appendChild(empty);
+      } else {
+        group.list.forEach((egress, idx) => {
+          block.appendChild(buildResultItem(egress, idx));
+        });
+      }
+      return block;
+    };
+
+    const showResultBlocks = (groups) => {
+      reconcileChildren(results, groups.map((group) => (
+        cachedNode(resultBlockNodes, group.key, () => buildResultBlock(group))
+      )));
+      results.classList.toggle("animate", groups.length > 0);
+    };
+
+    const updateResults = (options) => {
+      const shouldUpdateUrl = options.updateUrl !== false;
+      clearCopyFeedback();
+
+      if (!selectedStation) {
+        showResultBlocks([]);
+        setText(resultsTitle, "Select a station to see results.");
+        setText(resultsSub, "");
+        copyBtn.disabled = true;
+        if (shouldUpdateUrl) {
+          updateUrlFromSelection();
+        }
+        return;
+      }
+
+      const legs = currentTrip();
+      const title = selectedDestination
+        ? `${selectedStation.name} to ${selectedDestination.name}`
+        : selectedStation.name;
+      if (selectedDestination && !legs) {
+        showResultBlocks([]);
+        setText(resultsTitle, title);
+        setText(resultsSub, stationLevels(selectedStation).includes(selectedDestination)
+          ? NO_TRIP_SAME_STATION
+          : NO_TRIP_ROUTE);
+        copyBtn.disabled = true;
+        if (shouldUpdateUrl) {
+          updateUrlFromSelection();
+        }
+        return;
+      }
+
+      if (!(legs ? tripStations(legs) : [selectedStation]).every(stationDetailsLoaded)) {
+        showResultBlocks([]);
+        setText(resultsTitle, `${title} - loading station data...`);
+        setText(resultsSub, "");
+        copyBtn.disabled = true;
+        if (shouldUpdateUrl) {
+          updateUrlFromSelection();
+        }
+        return;
+      }
+
+      if (legs) {
+        setText(resultsTitle, title);
+        setText(resultsSub, legs.map(describeLeg).join(", then "));
+      } else {
+        const lineCode = lineSelect.value || selectedStation.lines[0];
+        const directionKey = directionSelect.value || selectedStation.directions[0].key;
+        setText(resultsTitle, `${title} - ${lineName(lineCode)} Line`);
+        setText(resultsSub, findDirectionLabel(selectedStation, directionKey));
+      }
+      copyBtn.disabled = false;
+
+      showResultBlocks(resultBlocks(legs));
+      if (shouldUpdateUrl) {
+        updateUrlFromSelection();
+      }
+    };
+
+    const renderResults = (options = {}) => measureRender("results-render", () => updateResults(options));
+
+    const selectStation = (station, options = {}) => {
+      if (!station) {
+        return false;
+      }
+      selectedStation = station;
+      stationInput.value = station.name;
+      stationSuggestions.hidden = true;
+      renderSelectors(options.line, options.direction);
+      renderResults({ updateUrl: options.updateUrl !== false });
+      if (!stationDetailsLoaded(station)) {
+        loadStationDetails(station).then(() => {
+          if (selectedStation === station) {
+            renderResults({ updateUrl: false });
+          }
+        }).catch(() => {
+          if (selectedStation === station) {
+            resultsTitle.textContent = SHARD_ERROR;
+          }
+        });
+      }
+      loadTripDetails();
+      return true;
+    };
+
+    const loadTripDetails = () => {
+      const legs = currentTrip();
+      if (!legs) {
+        return;
+      }
+      const origin = selectedStation;
+      const destination = selectedDestination;
+      const isCurrent = () => selectedStation === origin && selectedDestination === destination;
+      Promise.all(tripStations(legs).map(loadStationDetails)).then(() => {
+        if (isCurrent()) {
+          renderResults({ updateUrl: false });
+        }
+      }).catch(() => {
+        if (isCurrent()) {
+          resultsTitle.textContent = SHARD_ERROR;
+        }
+      });
+    };
+
+    const selectDestination = (station, options = {}) => {
+      selectedDestination = station;
+      destinationInput.value = station ? station.name : "";
+      destinationSuggestions.hidden = true;
+      if (selectedStation) {
+        renderSelectors(lineSelect.value, directionSelect.value);
+      }
+      renderResults({ updateUrl: options.updateUrl !== false });
+      loadTripDetails();
+    };
+
+    const suggestStations = suggestionsFor(stationSuggestions, selectStation);
+    const suggestDestinations = suggestionsFor(destinationSuggestions, selectDestination);
+
+    stationInput.addEventListener("input", (event) => {
+      if (selectedStation && event.target.value.toLowerCase() !== selectedStation.nameLower) {
+        selectedStation = null;
+        renderSelectors();
+        renderResults();
+      }
+      suggestStations(event.target.value);
+    });
+
+    stationInput.addEventListener("keydown", (event) => {
+      if (event.key === "Enter") {
+        findSuggestions(event.target.value).then((suggestions) => {
+          if (suggestions.length) {
+            selectStation(suggestions[0]);
+          }
+        });
+      }
+    });
+
+    clearStation.addEventListener("click", () => {
+      stationInput.value = "";
+      selectedStation = null;
+      stationSuggestions.hidden = true;
+      renderSelectors();
+      renderResults();
+    });
+
+    destinationInput.addEventListener("input", (event) => {
+      if (selectedDestination && event.target.value.toLowerCase() !== selectedDestination.nameLower) {
+        selectedDestination = null;
+        if (selectedStation) {
+          renderSelectors(lineSelect.value, directionSelect.value);
+        }
+        renderResults();
+      }
+      suggestDestinations(event.target.value);
+    });
+
+    destinationInput.addEventListener("keydown", (event) => {
+      if (event.key === "Enter") {
+        findSuggestions(event.target.value).then((suggestions) => {
+          if (suggestions.length) {
+            selectDestination(suggestions[0]);
+          }
+        });
+      }
+    });
+
+    clearDestination.addEventListener("click", () => {
+      selectDestination(null);
+    });
+
+    lineSelect.addEventListener("change", () => {
+      renderDirectionSelector(directionSelect.value);
+      renderResults();
+    });
+    directionSelect.addEventListener("change", () => {
+      renderResults();
+    });
+
+    exampleButtons.forEach((button) => {
+      button.addEventListener("click", () => {
+        findStationByParam(button.dataset.stationExample || "", "").then((station) => {
+          if (station) {
+            selectStation(station);
+          }
+        });
+      });
+    });
+
+    const buildCopyPayload = () => {
+      if (!selectedStation) {
+        return "";
+      }
+      const legs = currentTrip();
+      if (selectedDestination && !legs) {
+        return "";
+      }
+      if (!(legs ? tripStations(legs) : [selectedStation]).every(stationDetailsLoaded)) {
+        return "";
+      }
+
+      const lines = [];
+      if (legs) {
+        lines.push(`Trip: ${selectedStation.name} to ${selectedDestination.name}`);
+        legs.forEach((leg) => lines.push(`Ride: ${describeLeg(leg)}`));
+      } else {
+        const lineCode = lineSelect.value || selectedStation.lines[0];
+        const directionKey = directionSelect.value || selectedStation.directions[0].key;
+        lines.push(`Station: ${selectedStation.name}`);
+        lines.push(`Line: ${lineName(lineCode)} Line`);
+        lines.push(`Direction: ${findDirectionLabel(selectedStation, directionKey)}`);
+      }
+      lines.push("");
+
+      resultBlocks(legs).forEach((group) => {
+        lines.push(`${group.label}:`);
+        if (!group.list.length) {
+          lines.push("- None");
+        } else {
+          group.list.forEach((egress, idx) => {
+            const label = entries.label(egress) || `Egress ${idx + 1}`;
+            const doors = entries.doors(egress);
+            const doorLabels = doors.map(formatDoorLabel).join(" or ");
+            const egressDelta = entries.delta(egress);
+            const delta = egressDelta != null ? ` (delta ${egressDelta})` : "";
+            const indexLabel = formatDoorIndex(doors);
+            const egressNote = entries.note(egress);
+            const note = egressNote ? `; ${egressNote}` : "";
+            lines.push(`- ${label}: ${doorLabels}, ${indexLabel}${delta}${note}`);
+          });
+        }
+        lines.push("");
+      });
+
+      return lines.join("\n");
+    };
+
+    copyBtn.addEventListener("click", async () => {
+      const payload = buildCopyPayload();
+      if (!payload) {
+        return;
+      }
+      if (!navigator.clipboard || !navigator.clipboard.writeText) {
+        showCopyFeedback("Copy failed; select and copy the text manually.");
+        return;
+      }
+      try {
+        await navigator.clipboard.writeText(payload);
+        showCopyFeedback("Copied.");
+      } catch (error) {
+        showCopyFeedback("Copy failed; select and copy the text manually.");
+      }
+    });
+
+    if ("serviceWorker" in navigator) {
+      let refreshingForUpdate = false;
+      const reloadOnControllerChange = Boolean(navigator.serviceWorker.controller);
+
+      navigator.serviceWorker.addEventListener("controllerchange", () => {
+        if (!reloadOnControllerChange || refreshingForUpdate) {
+          return;
+        }
+        refreshingForUpdate = true;
+        window.location.reload();
+      });
+
+      window.addEventListener("load", () => {
+        navigator.serviceWorker.register("./sw.js").then((registration) => {
+          registration.update();
+        }).catch(() => {});
+      });
+    }
+
+    // Resolves to whether the URL selected a station.
+    const initFromUrl = () => {
+      const params = new URLSearchParams(window.location.search);
+      const destinationParam = TRIPS.routes.length ? params.get("to") : null;
+      const stationParam = params.get("station");
+      const lineParam = params.get("line");
+      return Promise.all([
+        destinationParam ? findStationByParam(destinationParam, "") : null,
+        stationParam ? findStationByParam(stationParam, lineParam) : null,
+      ]).then(([destination, station]) => {
+        if (destinationParam) {
+          selectedDestination = destination;
+          destinationInput.value = destination ? destination.name : "";
+        }
+        if (!station) {
+          return false;
+        }
+        return selectStation(station, {
+          line: lineParam,
+          direction: params.get("direction"),
+          updateUrl: true,
+        });
+      });
+    };
+
+    const renderEditionSelector = () => {
+      const editions = DATA.meta.editions || [];
+      if (editions.length < 2) {
+        editionField.hidden = true;
+        return;
+      }
+      fillSelect(
+        editionSelect,
+        editions.map((edition) => ({ value: edition.path, label: edition.name })),
+        ""
+      );
+      const current = editions.find((edition) => edition.name === DATA.meta.edition);
+      editionSelect.value = current ? current.path : editions[0].path;
+      editionField.hidden = false;
+    };
+
+    editionSelect.addEventListener("change", () => {
+      window.location.href = `${editionSelect.value}${window.location.search}`;
+    });
+
+    if (BINARY_LAYOUT) {
+      loadBinaryTables().catch(() => {});
+    }
+    renderEditionSelector();
+    destinationField.hidden = !TRIPS.routes.length;
+
+    initFromUrl().then((selected) => {
+      if (!selected) {
+        renderSelectors();
+        renderResults({ updateUrl: false });
+      }
+    });
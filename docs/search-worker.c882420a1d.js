@@ -0,0 +1,204 @@
+let DATA = null;
+let stationSearch = null;
+let stationDetails = null;
+
+const normalize = (value) => String(value || "")
+  .toLowerCase()
+  .replace(/[^a-z0-9]+/g, " ")
+  .trim();
+
+const lineName = (code) => (DATA.lines[code] ? DATA.lines[code].name : code);
+
+const findLineCode = (station, value) => {
+  const requested = normalize(value);
+  if (!station || !requested) {
+    return "";
+  }
+  return station.lines.find((code) => (
+    normalize(code) === requested || normalize(lineName(code)) === requested
+  )) || "";
+};
+
+// Stations are referenced by their position in DATA.stations.
+const createStationSearch = (stations, SEARCH) => {
+  stations.forEach((station, index) => {
+    const tokens = [
+      station.name,
+      station.alt || "",
+      station.subtitle || "",
+      station.station_code || "",
+    ].join(" ");
+    station.tableIndex = index;
+    station.search = normalize(tokens);
+    station.nameLower = station.name.toLowerCase();
+    station.altLower = (station.alt || "").toLowerCase();
+    station.codeLower = (station.station_code || "").toLowerCase();
+  });
+
+  // Positions are packed as SEARCH.width base-36 digits each; a trigram
+  // posting's key lists its stations and its value the trigrams, three
+  // characters apiece, that share it. Small networks ship no trigrams.
+  const unpackPosition = (packed, start) => parseInt(packed.slice(start, start + SEARCH.width), 36);
+  const trigrams = SEARCH.trigrams ? new Map() : null;
+  Object.entries(SEARCH.trigrams || {}).forEach(([packed, grams]) => {
+    const posting = [];
+    for (let i = 0; i < packed.length; i += SEARCH.width) {
+      posting.push(unpackPosition(packed, i));
+    }
+    for (let i = 0; i < grams.length; i += 3) {
+      trigrams.set(grams.slice(i, i + 3), posting);
+    }
+  });
+
+  const prefixMatches = (order, field, value) => {
+    let low = 0;
+    let high = order.length;
+    while (low < high) {
+      const mid = (low + high) >> 1;
+      if (stations[order[mid]][field] < value) {
+        low = mid + 1;
+      } else {
+        high = mid;
+      }
+    }
+    const matches = [];
+    for (let i = low; i < order.length && stations[order[i]][field].startsWith(value); i += 1) {
+      matches.push(stations[order[i]]);
+    }
+    return matches;
+  };
+
+  const intersectSorted = (left, right) => {
+    const both = [];
+    let i = 0;
+    let j = 0;
+    while (i < left.length && j < right.length) {
+      if (left[i] === right[j]) {
+        both.push(left[i]);
+        i += 1;
+        j += 1;
+      } else if (left[i] < right[j]) {
+        i += 1;
+      } else {
+        j += 1;
+      }
+    }
+    return both;
+  };
+
+  // Stations whose normalized search text contains `q`. Queries shorter
+  // than a trigram, or networks without trigrams, fall back to a scan.
+  const substringMatches = (q) => {
+    if (q.length < 3 || !trigrams) {
+      return stations.filter((station) => station.search.includes(q));
+    }
+    let candidates = null;
+    for (let i = 0; i + 3 <= q.length; i += 1) {
+      const posting = trigrams.get(q.slice(i, i + 3));
+      if (!posting) {
+        return [];
+      }
+      candidates = candidates ? intersectSorted(candidates, posting) : posting;
+    }
+    return candidates
+      .map((index) => stations[index])
+      .filter((station) => station.search.includes(q));
+  };
+
+  const findStationByParam = (stationValue, lineValue) => {
+    const requested = normalize(stationValue);
+    if (!requested) {
+      return null;
+    }
+    const scores = new Map();
+    substringMatches(requested).forEach((station) => scores.set(station, 1));
+    if (Object.prototype.hasOwnProperty.call(SEARCH.aliases, requested)) {
+      const hits = SEARCH.aliases[requested];
+      for (let i = 0; i < hits.length; i += SEARCH.width + 1) {
+        scores.set(stations[unpackPosition(hits, i)], Number(hits[i + SEARCH.width]));
+      }
+    }
+    const matches = Array.from(scores, ([station, score]) => ({ station, score }));
+    if (!matches.length) {
+      return null;
+    }
+
+    const lineMatches = lineValue
+      ? matches.filter((entry) => findLineCode(entry.station, lineValue))
+      : [];
+    const candidates = lineMatches.length ? lineMatches : matches;
+    candidates.sort((a, b) => {
+      if (b.score !== a.score) {
+        return b.score - a.score;
+      }
+      return a.station.name.localeCompare(b.station.name);
+    });
+    return candidates[0].station;
+  };
+
+  const findSuggestions = (query) => {
+    const q = normalize(query);
+    if (!q) {
+      return [];
+    }
+    const lower = query.toLowerCase();
+    const candidates = new Set([
+      ...prefixMatches(SEARCH.prefix.name, "nameLower", lower),
+      ...prefixMatches(SEARCH.prefix.alt, "altLower", lower),
+      ...prefixMatches(SEARCH.prefix.code, "codeLower", lower),
+      ...substringMatches(q),
+    ]);
+    const results = Array.from(candidates, (station) => {
+      let score = 0;
+      if (station.nameLower.startsWith(lower)) {
+        score += 3;
+      }
+      if (station.altLower && station.altLower.startsWith(lower)) {
+        score += 2;
+      }
+      if (station.codeLower && station.codeLower.startsWith(lower)) {
+        score += 2;
+      }
+      if (station.search.includes(q)) {
+        score += 1;
+      }
+      return { station, score };
+    }).filter((entry) => entry.score > 0);
+
+    results.sort((a, b) => {
+      if (b.score !== a.score) {
+        return b.score - a.score;
+      }
+      return a.station.name.localeCompare(b.station.name);
+    });
+
+    return results.slice(0, 8).map((entry) => entry.station);
+  };
+
+  return { findStationByParam, findSuggestions };
+};
+
+// Answers one request from the page: station suggestions and URL matches as
+// indexes into DATA.stations (-1 for no match), station details as stored.
+const answerSearchRequest = (search, details, message) => {
+  if (message.type === "suggest") {
+    return search.findSuggestions(message.query).map((station) => station.tableIndex);
+  }
+  if (message.type === "match") {
+    const station = search.findStationByParam(message.station, message.line);
+    return station ? station.tableIndex : -1;
+  }
+  return details[message.code] || null;
+};
+
+self.addEventListener("message", (event) => {
+  const message = event.data;
+  if (message.type === "load") {
+    DATA = JSON.parse(message.appData);
+    const stationData = JSON.parse(message.stationData);
+    stationSearch = createStationSearch(DATA.stations, stationData.search);
+    stationDetails = stationData.stations || {};
+    return;
+  }
+  self.postMessage({ id: message.id, result: answerSearchRequest(stationSearch, stationDetails, message) });
+});
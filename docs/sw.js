@@ -1,40 +1,190 @@
-const CACHE_VERSION = "bf3d348d81";
-const CACHE_NAME = `metro-exit-${CACHE_VERSION}`;
+// CACHE_VERSION changes whenever the build output does, so a new page always
+// installs a new worker; the caches themselves are keyed by content-hashed
+// file names.
+const CACHE_VERSION = "5200ca5e31";
+const CACHE_PREFIX = "metro-exit-";
+const PAGE_CACHE = `${CACHE_PREFIX}page`;
+const ASSET_CACHE = `${CACHE_PREFIX}assets`;
+// Holds this build's page from install until activate moves it to PAGE_CACHE.
+const STAGED_PAGE_CACHE = `${CACHE_PREFIX}page-${CACHE_VERSION}`;
+// Precached on install.
 const ASSETS = [
-  "./",
-  "./index.html",
-  "./app.js",
-  "./manifest.webmanifest",
-  "./sw.js",
-  "./social-preview.svg",
-  "./icons/icon-192.svg",
-  "./icons/icon-512.svg",
+  "./app.30392059f3.js",
+  "./icons/icon-192.6cbf9dcb6f.svg",
+  "./icons/icon-512.0eddb746ff.svg",
+  "./manifest.4cf096f6c8.webmanifest",
+  "./search-worker.c882420a1d.js"
 ];
+// Station shards or binary tables, cached the first time they are fetched.
+const DATA_FILES = [];
+// Cache versions of earlier pages with a patch to this one in ./patches/.
+const PATCHES = [];
+const PAGE_VERSION_RE = /<meta name="cache-version" content="([0-9a-f]+)">/;
 
+const scopeUrl = (path) => new URL(path, self.location).href;
+const PAGE_URL = scopeUrl("./");
+const PAGE_URLS = new Set([PAGE_URL, scopeUrl("./index.html")]);
+const CURRENT_ASSETS = new Set([...ASSETS, ...DATA_FILES].map(scopeUrl));
+
+const pageResponse = (bytes) => new Response(bytes, {
+  headers: { "Content-Type": "text/html; charset=utf-8" },
+});
+
+const toHex = (buffer) => Array.from(new Uint8Array(buffer), (byte) => byte.toString(16).padStart(2, "0")).join("");
+
+// A patch is a list of [start, end) byte ranges to copy from the cached page
+// and literal strings; the result must hash to the new page's SHA-256.
+const applyPatch = (old, patch) => {
+  const encoder = new TextEncoder();
+  const parts = patch.ops.map((op) => (typeof op === "string" ? encoder.encode(op) : old.subarray(op[0], op[1])));
+  const page = new Uint8Array(parts.reduce((size, part) => size + part.length, 0));
+  parts.reduce((offset, part) => {
+    page.set(part, offset);
+    return offset + part.length;
+  }, 0);
+  return crypto.subtle.digest("SHA-256", page)
+    .then((digest) => (toHex(digest) === patch.sha256 ? pageResponse(page) : null));
+};
+
+// This build's page from the cached one, or null when it must be fetched.
+const patchCachedPage = (cached) => cached.arrayBuffer().then((buffer) => {
+  const old = new Uint8Array(buffer);
+  const version = pageVersion(old);
+  if (version === CACHE_VERSION) {
+    return pageResponse(old);
+  }
+  if (!PATCHES.includes(version)) {
+    return null;
+  }
+  return fetch(`./patches/${version}.json`)
+    .then((response) => (response.ok ? response.json() : null))
+    .then((patch) => (patch ? applyPatch(old, patch) : null));
+});
+
+const pageVersion = (bytes) => {
+  const match = new TextDecoder().decode(bytes.subarray(0, 4096)).match(PAGE_VERSION_RE);
+  return match && match[1];
+};
+
+// A page a navigation refresh already downloaded for this build, else the
+// cached page patched, else a fresh download.
+const loadPage = () => caches.open(STAGED_PAGE_CACHE).then((staged) => staged.match(PAGE_URL))
+  .then((page) => page || caches.open(PAGE_CACHE).then((cache) => cache.match(PAGE_URL))
+    .then((cached) => (cached ? patchCachedPage(cached) : null)))
+  .catch(() => null)
+  .then((page) => page || fetch(new Request(PAGE_URL, { cache: "reload" })))
+  .then((page) => {
+    if (!page.ok) {
+      throw new Error(`Page request failed: ${page.status}`);
+    }
+    return page;
+  });
+
+const precacheAssets = () => caches.open(ASSET_CACHE).then((cache) => Promise.all(
+  ASSETS.map((asset) => cache.match(asset).then((cached) => cached || cache.add(asset)))
+));
+
+// The shared page cache is only written on activate, once every asset the new
+// page loads is cached: a failed install leaves the old page (and the old
+// worker serving it) untouched.
 self.addEventListener("install", (event) => {
   self.skipWaiting();
   event.waitUntil(
-    caches.open(CACHE_NAME).then((cache) => cache.addAll(ASSETS))
+    Promise.all([precacheAssets(), loadPage()])
+      .then(([, page]) => caches.open(STAGED_PAGE_CACHE).then((cache) => cache.put(PAGE_URL, page)))
   );
 });
 
+const promoteStagedPage = () => caches.open(STAGED_PAGE_CACHE)
+  .then((staged) => staged.match(PAGE_URL))
+  .then((page) => (page ? caches.open(PAGE_CACHE).then((cache) => cache.put(PAGE_URL, page)) : null));
+
+// Hashed assets this build no longer lists are evicted; unchanged ones stay.
+const evictStaleAssets = () => caches.open(ASSET_CACHE).then((cache) => cache.keys().then((requests) => Promise.all(
+  requests
+    .filter((request) => !CURRENT_ASSETS.has(request.url))
+    .map((request) => cache.delete(request))
+)));
+
 self.addEventListener("activate", (event) => {
   event.waitUntil(
-    caches.keys()
-      .then((keys) => Promise.all(
-        keys.filter((key) => key !== CACHE_NAME).map((key) => caches.delete(key))
-      ))
-      .then(() => self.clients.claim())
+    Promise.all([
+      // Navigations revalidate through the preload request the browser starts
+      // while this worker boots.
+      self.registration.navigationPreload ? self.registration.navigationPreload.enable() : null,
+      promoteStagedPage().then(() => caches.keys()).then((keys) => Promise.all(
+        keys
+          .filter((key) => key.startsWith(CACHE_PREFIX) && key !== PAGE_CACHE && key !== ASSET_CACHE)
+          .map((key) => caches.delete(key))
+      )),
+      evictStaleAssets(),
+    ]).then(() => self.clients.claim())
   );
 });
 
+const isPageNavigation = (request) => (
+  request.mode === "navigate" && PAGE_URLS.has(request.url.split("?")[0])
+);
+
+// Stores a refreshed page. A page for this build replaces the cached one; a
+// newer build's page is staged where that build's worker looks for it on
+// install (so it is not downloaded twice) and the update check runs now. The
+// shared page cache never holds a page whose assets are not cached yet.
+const storeRefreshedPage = (cache, response) => response.clone().arrayBuffer().then((buffer) => {
+  const version = pageVersion(new Uint8Array(buffer));
+  if (!version || version === CACHE_VERSION) {
+    return cache.put(PAGE_URL, response);
+  }
+  return caches.open(`${CACHE_PREFIX}page-${version}`)
+    .then((staged) => staged.put(PAGE_URL, response))
+    .then(() => self.registration.update());
+});
+
+// The navigation preload response, or a network request without one.
+const fetchPage = (event) => Promise.resolve(event.preloadResponse)
+  .then((preloaded) => preloaded || fetch(event.request));
+
+// Revalidates the cached page. When this build has a patch from the cached
+// page's version, the patch is applied instead of using the full preload
+// download.
+const revalidatePage = (event, cache, cached) => cached.clone().arrayBuffer().then((buffer) => {
+  if (PATCHES.includes(pageVersion(new Uint8Array(buffer)))) {
+    return patchCachedPage(cached).then((page) => (page ? cache.put(PAGE_URL, page) : null));
+  }
+  return fetchPage(event).then((response) => (response.ok ? storeRefreshedPage(cache, response) : null));
+});
+
+// Stale-while-revalidate: answer from the cached page at once and refresh it
+// in the background; without a cached page, answer from the network.
+const staleWhileRevalidate = (event) => caches.open(PAGE_CACHE).then((cache) => cache.match(PAGE_URL).then((cached) => {
+  if (cached) {
+    event.waitUntil(revalidatePage(event, cache, cached.clone()).catch(() => null));
+    return cached;
+  }
+  return fetchPage(event).then((response) => {
+    if (response.ok) {
+      event.waitUntil(storeRefreshedPage(cache, response.clone()).catch(() => null));
+    }
+    return response;
+  });
+}));
+
+const cacheFirst = (request) => caches.open(ASSET_CACHE).then((cache) => cache.match(request).then((cached) => {
+  if (cached) {
+    return cached;
+  }
+  return fetch(request).then((response) => {
+    if (response.ok) {
+      cache.put(request, response.clone());
+    }
+    return response;
+  });
+}));
+
 self.addEventListener("fetch", (event) => {
-  event.respondWith(
-    caches.match(event.request).then((cached) => {
-      if (cached) {
-        return cached;
-      }
-      return fetch(event.request);
-    })
-  );
+  if (isPageNavigation(event.request)) {
+    event.respondWith(staleWhileRevalidate(event));
+  } else if (event.request.method === "GET" && CURRENT_ASSETS.has(event.request.url)) {
+    event.respondWith(cacheFirst(event.request));
+  }
 });
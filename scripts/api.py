@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import gc
+import gzip
+import json
+import sys
+import time
+import types
+import weakref
+from functools import lru_cache
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from build_site import (
+    INPUT_FILES,
+    SHARD_STATION_KEYS,
+    WATCH_INTERVAL,
+    ParseCache,
+    StationCache,
+    expand_door_refs,
+    watched_mtimes,
+)
+from network import Network, QueryError, Recommender, dump_answer, load_network
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+RESPONSE_CACHE_SIZE = 4096
+MAX_BODY_BYTES = 1024 * 1024
+MAX_BATCH_SIZE = 1000
+KEEPALIVE_TIMEOUT = 15
+GZIP_MIN_BYTES = 256
+STATUS_TEXT = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+}
+SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+
+
+def json_body(value):
+    return dump_answer(value).encode("utf-8")
+
+
+# Bytes reachable from `root`, leaving out the modules, classes, and functions
+# it shares with the rest of the process.
+def deep_size(root):
+    seen = set()
+    pending = [root]
+    size = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return size
+
+
+def format_size(size):
+    return f"{size / (1024 * 1024):.1f} MiB"
+
+
+# Everything the API answers from one built payload: an immutable snapshot
+# that is never changed after construction, so a rebuild makes a new one and
+# requests already holding the old one finish against it. GET responses are
+# cached per path and sorted query in an LRU, already encoded. A station's
+# ETag is its content hash, so it survives rebuilds that leave the station
+# alone; every other ETag is the build's cache version.
+class Api:
+    def __init__(self, network, cache_size=RESPONSE_CACHE_SIZE):
+        self.cache_version = network.cache_version
+        self.station_hashes = network.station_hashes
+        self.recommender = Recommender(network)
+        # Keys sorted so a station's body (and its content-hash ETag) is the
+        # same whether the payload came from docs/ or an in-memory rebuild.
+        self.stations = {
+            station["station_code"]: dict(sorted(station.items()))
+            for station in expand_door_refs(network.app_data)["stations"]
+        }
+        self.get = lru_cache(maxsize=cache_size)(self._get)
+
+    def _get(self, path, query):
+        params = dict(query)
+        if path == "/stations":
+            return 200, json_body([
+                {**{key: station[key] for key in SHARD_STATION_KEYS}, "hash": self.station_hashes[code]}
+                for code, station in self.stations.items()
+            ]), self.cache_version
+        if path.startswith("/stations/"):
+            code = unquote(path.removeprefix("/stations/")).upper()
+            station = self.stations.get(code)
+            if station is None:
+                return 404, json_body({"error": "Unknown station code."}), None
+            return 200, json_body(station), self.station_hashes[code]
+        if path == "/recommend":
+            try:
+                answer = self.recommender.recommend(
+                    params.get("station"),
+                    params.get("line"),
+                    params.get("direction"),
+                )
+            except QueryError as error:
+                return 400, json_body({"error": str(error)}), None
+            return 200, json_body(answer), self.cache_version
+        return 404, json_body({"error": "Not found."}), None
+
+    # A JSON array of {"station", "line", "direction", "id"} requests in,
+    # an array of answers (or {"error": ...}) out, in order.
+    def batch(self, body):
+        try:
+            requests = json.loads(body)
+        except ValueError as error:
+            return 400, json_body({"error": f"Invalid JSON: {error}"})
+        if not isinstance(requests, list):
+            return 400, json_body({"error": "Batch body must be a JSON array."})
+        if len(requests) > MAX_BATCH_SIZE:
+            return 413, json_body({"error": f"Batches are limited to {MAX_BATCH_SIZE} requests."})
+        answers = []
+        for request in requests:
+            if not isinstance(request, dict):
+                answers.append(dump_answer({"error": "Request is not a JSON object."}))
+                continue
+            answer = self.recommender.answer_json(
+                str(request.get("station") or ""),
+                str(request.get("line") or ""),
+                str(request.get("direction") or ""),
+            )
+            if "id" in request:
+                answer = f'{{"id":{dump_answer(request["id"])},{answer[1:]}'
+            answers.append(answer)
+        return 200, f"[{','.join(answers)}]".encode("utf-8")
+
+    # (status, payload, etag); responses without an ETag are not cacheable.
+    def respond(self, method, target, headers, body):
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        if method == "POST" and path == "/recommend":
+            return self.batch(body) + (None,)
+        if method not in ("GET", "HEAD"):
+            return 405, json_body({"error": "Method not allowed."}), None
+        return self.get(path, tuple(sorted(parse_qsl(url.query))))
+
+
+def gzip_body(payload):
+    return gzip.compress(payload, compresslevel=6, mtime=0)
+
+
+gzip_cached = lru_cache(maxsize=RESPONSE_CACHE_SIZE)(gzip_body)
+
+
+def accepts_gzip(headers):
+    return any(
+        part.split(";")[0].strip() in ("gzip", "*")
+        for part in headers.get("accept-encoding", "").split(",")
+    )
+
+
+# Either encoding of the current response is still current.
+def etag_matches(headers, etag):
+    for tag in headers.get("if-none-match", "").split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag == "*" or tag.removesuffix("-gzip") == etag:
+            return True
+    return False
+
+
+def encode_response(method, status, payload, etag, headers, keep_alive):
+    response_headers = {"Content-Type": "application/json; charset=utf-8", "Vary": "Accept-Encoding"}
+    compress = len(payload) >= GZIP_MIN_BYTES and accepts_gzip(headers)
+    if etag:
+        response_headers["ETag"] = f'"{etag}-gzip"' if compress else f'"{etag}"'
+        response_headers["Cache-Control"] = "no-cache"
+        if etag_matches(headers, etag):
+            status, payload, compress = 304, b"", False
+    else:
+        response_headers["Cache-Control"] = "no-store"
+    if compress:
+        payload = gzip_cached(payload) if etag else gzip_body(payload)
+        response_headers["Content-Encoding"] = "gzip"
+    response_headers["Content-Length"] = str(len(payload))
+    response_headers["Connection"] = "keep-alive" if keep_alive else "close"
+    head = f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in response_headers.items())
+    return (head + "\r\n").encode("latin-1") + (b"" if method == "HEAD" else payload)
+
+
+async def read_request(reader):
+    request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+    if not request_line.strip():
+        return None
+    method, target, version = request_line.decode("latin-1").split()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise ValueError("Request body too large.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, version, headers, body
+
+
+# Rebuilds the payload from the source CSVs in memory and loads it as a new
+# snapshot; docs/ is left alone. Runs off the event loop.
+def build_snapshot(parse_cache, station_store, cache_size):
+    network = Network(parse_cache=parse_cache)
+    try:
+        network.rebuild_payload(StationCache(station_store))
+    finally:
+        parse_cache.hits.clear()
+        parse_cache.misses.clear()
+        parse_cache.file_hashes.clear()
+    api = Api(network, cache_size)
+    return api, deep_size(api)
+
+
+class ApiServer:
+    def __init__(self, api, cache_size=RESPONSE_CACHE_SIZE):
+        self.api = api
+        self.cache_size = cache_size
+        self.retired = []
+
+    def track(self, api):
+        weakref.finalize(api, print, f"Released snapshot {api.cache_version}.")
+
+    # Requests read self.api once, so the swap is a single assignment on the
+    # event loop; the old snapshot is freed once its last request finishes.
+    def swap(self, api, size):
+        old = self.api
+        old_size = deep_size(old)
+        self.api = api
+        self.track(api)
+        self.retired.append(weakref.ref(old))
+        print(
+            f"Swapped snapshot {old.cache_version} ({format_size(old_size)}) "
+            f"for {api.cache_version} ({format_size(size)})."
+        )
+        del old
+        self.release_retired()
+
+    def release_retired(self):
+        # Snapshots hold reference cycles through their LRU wrappers.
+        gc.collect()
+        self.retired = [ref for ref in self.retired if ref() is not None]
+
+    # Only the source CSVs are watched: the running process keeps the
+    # build_site.py it started with, so template edits need a restart.
+    async def reload_on_change(self):
+        parse_cache = ParseCache()
+        station_store = {}
+        sources = set(INPUT_FILES.values())
+        mtimes = None
+        while True:
+            current = {path: mtime for path, mtime in watched_mtimes().items() if path in sources}
+            if mtimes is not None and current != mtimes:
+                started = time.perf_counter()
+                try:
+                    api, size = await asyncio.to_thread(
+                        build_snapshot, parse_cache, station_store, self.cache_size
+                    )
+                except SystemExit:
+                    print(f"Rebuild failed; still serving snapshot {self.api.cache_version}.")
+                else:
+                    print(f"Rebuilt in {(time.perf_counter() - started) * 1000:.0f} ms.")
+                    self.swap(api, size)
+            mtimes = current
+            await asyncio.sleep(WATCH_INTERVAL)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                status, payload, etag = self.api.respond(method, target, headers, body)
+                writer.write(encode_response(method, status, payload, etag, headers, keep_alive))
+                await writer.drain()
+                if self.retired:
+                    self.release_retired()
+                if not keep_alive:
+                    break
+        except ValueError as error:
+            writer.write(encode_response("GET", 400, json_body({"error": str(error)}), None, {}, False))
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, reload=False):
+        server = await asyncio.start_server(self.handle, host, port)
+        size = deep_size(self.api)
+        self.track(self.api)
+        print(
+            f"Serving the recommendation API for snapshot {self.api.cache_version} "
+            f"({format_size(size)}) at http://{host}:{port}/"
+        )
+        if reload:
+            print("Watching the source CSVs; changes rebuild the payload in memory and swap in a new snapshot.")
+            reloader = asyncio.create_task(self.reload_on_change())
+        async with server:
+            await server.serve_forever()
+        if reload:
+            reloader.cancel()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve door recommendations from the built docs/ payload over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"interface to listen on (default {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default {DEFAULT_PORT})")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=RESPONSE_CACHE_SIZE,
+        help=f"GET responses kept in the LRU cache (default {RESPONSE_CACHE_SIZE})",
+    )
+    parser.add_argument(
+        "--reload",
+        action="store_true",
+        help="rebuild the payload in memory when the sources change and swap in the new data without a restart",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        server = ApiServer(Api(load_network(), args.cache_size), args.cache_size)
+        asyncio.run(server.serve(args.host, args.port, reload=args.reload))
+    except KeyboardInterrupt:
+        pass
@@ -1,16 +1,78 @@
 #!/usr/bin/env python3
+import argparse
 import csv
+import gzip
 import hashlib
+import inspect
 import json
 import os
 import re
+import struct
 import sys
-from collections import Counter, defaultdict
+import textwrap
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from itertools import repeat
 from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 DOCS_DIR = BASE_DIR / "docs"
 ICONS_DIR = DOCS_DIR / "icons"
+SHARDS_DIR = DOCS_DIR / "data"
+EDITIONS_DIR = DOCS_DIR / "editions"
+EDITION_NAME_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+DEFAULT_CACHE_PREFIX = "metro-exit-"
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+SHARD_STATION_KEYS = ("name", "alt", "subtitle", "station_code", "lines", "directions")
+BINARY_TABLES_NAME = "tables.bin"
+STATION_HASHES_NAME = "station-hashes.json"
+ASSET_HASH_LENGTH = 10
+PAGE_HISTORY_DIR = BASE_DIR / "page-history"
+# Recent pages kept for patching; older installs fetch the full page.
+PAGE_HISTORY_SIZE = 8
+PATCHES_DIR_NAME = "patches"
+# A patch larger than this share of the page is not worth shipping.
+PATCH_MAX_RATIO = 0.5
+APP_DATA_RE = re.compile(r'<script id="app-data" type="application/json">(.*?)</script>', re.S)
+STATION_DATA_RE = re.compile(r'<script id="station-data" type="application/json">(.*?)</script>', re.S)
+PAGE_DATA_RE = re.compile(r'<script id="(app-data|station-data)" type="application/json">(.*?)</script>', re.S)
+HASHED_ASSET_RE = re.compile(r"^[\w-]+\.[0-9a-f]{%d}\.\w+(\.gz|\.br)?$" % ASSET_HASH_LENGTH)
+BINARY_MAGIC = b"DCMB"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sHH6I")
+BINARY_NO_STRING = 0xFFFFFFFF
+BINARY_DIRECTIONS = ("WB", "EB")
+BINARY_GROUPS = ("transfers", "escalator", "stairs", "elevator", "other")
+BINARY_ENTRY_TYPES = ("stairs", "escalator", "elevator", "other")
+CACHE_DIR = BASE_DIR / ".cache"
+BUILD_MANIFEST_PATH = CACHE_DIR / "build-manifest.json"
+BUILD_MANIFEST_VERSION = 1
+PARSE_CACHE_DIR = CACHE_DIR / "parse"
+PARSE_CACHE_KEEP = 8
+WATCH_INTERVAL = 0.5
+PREVIEW_PORT = 8000
+LIVERELOAD_PATH = "/__livereload"
+LIVERELOAD_KEEPALIVE = 15
+HTML_VERBATIM_RE = re.compile(r"(<(script|pre|textarea)\b.*?</\2>)", re.S | re.I)
+HTML_STYLE_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style>)", re.S | re.I)
+HTML_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+CSS_STRING_RE = re.compile(r"(\"[^\"]*\"|'[^']*')")
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,])\s*")
 
 INPUT_FILES = {
     "meta": BASE_DIR / "meta.csv",
@@ -18,7 +80,11 @@ INPUT_FILES = {
     "stations": BASE_DIR / "Stations.csv",
     "exits": BASE_DIR / "Exits.csv",
     "egresses": BASE_DIR / "Egresses.csv",
+    "routes": BASE_DIR / "Routes.csv",
 }
+# Without a Routes.csv (synthetic benchmark networks) the payload ships no
+# trip routes.
+OPTIONAL_INPUTS = {"routes"}
 
 LINE_DEFS = [
     ("RD", "Red", "#c60c30"),
@@ -28,6 +94,8 @@ LINE_DEFS = [
     ("OR", "Orange", "#f29330"),
     ("SV", "Silver", "#a2a4a3"),
 ]
+LINE_ORDER = {code: index for index, (code, _name, _color) in enumerate(LINE_DEFS)}
+LINE_NAMES = {code: name for code, name, _color in LINE_DEFS}
 
 LINE_COLS = {
     "RD": "hasRD",
@@ -38,6 +106,8 @@ LINE_COLS = {
     "SV": "hasSV",
 }
 
+TERMINUS_DIRECTIONS = {"terminus wb": "WB", "terminus eb": "EB"}
+
 STATION_REFERENCE_TRANSLATION = str.maketrans(
     {
         "\u2018": "'",
@@ -200,6 +270,8 @@ WMATA_STATION_CODES = {
     "Woodley Park": "A04",
 }
 
+STATION_CODE_RE = re.compile(r"[A-Z][0-9]{2}")
+
 EGRESS_TYPE_MAP = {
     "esc": "escalator",
     "el": "elevator",
@@ -214,7 +286,17 @@ ACCESS_LABELS = {
 }
 
 REVERSE_DOORS_FOR_DIR = "EB"
+# meta.csv: x is a multiple of 0.5 between 2 and 71 on a 0.5-72.5 platform.
+PLATFORM_X_MIN = 0.5
+PLATFORM_X_MAX = 72.5
+PLATFORM_X_STEP = 0.5
 LEVEL_SUFFIX_RE = re.compile(r" \((Lower|Upper) Level\)$")
+SEARCH_NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+SEARCH_PREFIX_FIELDS = (("name", "name"), ("alt", "alt"), ("code", "station_code"))
+# Below this many stations a substring scan is as fast as intersecting trigram
+# postings, so the build leaves the trigrams out of the search index.
+SEARCH_TRIGRAM_MIN_STATIONS = 500
+BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
 TRANSFER_LINE_RE = re.compile(
     r"\b(?:All\s+)?((?:RD|GR|YL|BL|OR|SV)(?:/(?:RD|GR|YL|BL|OR|SV))*)\s+Trains\b"
 )
@@ -237,6 +319,7 @@ REQUIRED_COLUMNS = {
         "EBDir",
     ],
     "Exits": ["nameStd", "exitLabel", "description"],
+    "Routes": ["line", "firstEnd", "lastEnd", "nameStd"],
     "Egresses": [
         "nameStd",
         "icon",
@@ -251,10 +334,205 @@ REQUIRED_COLUMNS = {
     ],
 }
 
+# Station search, shared by the page (when workers are unavailable) and the
+# search worker. Both run it after DATA holds the parsed #app-data index;
+# createStationSearch() takes the stations and the search index from
+# #station-data, built by build_search_index().
+SEARCH_SCRIPT = """const normalize = (value) => String(value || "")
+  .toLowerCase()
+  .replace(/[^a-z0-9]+/g, " ")
+  .trim();
+
+const lineName = (code) => (DATA.lines[code] ? DATA.lines[code].name : code);
+
+const findLineCode = (station, value) => {
+  const requested = normalize(value);
+  if (!station || !requested) {
+    return "";
+  }
+  return station.lines.find((code) => (
+    normalize(code) === requested || normalize(lineName(code)) === requested
+  )) || "";
+};
+
+// Stations are referenced by their position in DATA.stations.
+const createStationSearch = (stations, SEARCH) => {
+  stations.forEach((station, index) => {
+    const tokens = [
+      station.name,
+      station.alt || "",
+      station.subtitle || "",
+      station.station_code || "",
+    ].join(" ");
+    station.tableIndex = index;
+    station.search = normalize(tokens);
+    station.nameLower = station.name.toLowerCase();
+    station.altLower = (station.alt || "").toLowerCase();
+    station.codeLower = (station.station_code || "").toLowerCase();
+  });
+
+  // Positions are packed as SEARCH.width base-36 digits each; a trigram
+  // posting's key lists its stations and its value the trigrams, three
+  // characters apiece, that share it. Small networks ship no trigrams.
+  const unpackPosition = (packed, start) => parseInt(packed.slice(start, start + SEARCH.width), 36);
+  const trigrams = SEARCH.trigrams ? new Map() : null;
+  Object.entries(SEARCH.trigrams || {}).forEach(([packed, grams]) => {
+    const posting = [];
+    for (let i = 0; i < packed.length; i += SEARCH.width) {
+      posting.push(unpackPosition(packed, i));
+    }
+    for (let i = 0; i < grams.length; i += 3) {
+      trigrams.set(grams.slice(i, i + 3), posting);
+    }
+  });
+
+  const prefixMatches = (order, field, value) => {
+    let low = 0;
+    let high = order.length;
+    while (low < high) {
+      const mid = (low + high) >> 1;
+      if (stations[order[mid]][field] < value) {
+        low = mid + 1;
+      } else {
+        high = mid;
+      }
+    }
+    const matches = [];
+    for (let i = low; i < order.length && stations[order[i]][field].startsWith(value); i += 1) {
+      matches.push(stations[order[i]]);
+    }
+    return matches;
+  };
+
+  const intersectSorted = (left, right) => {
+    const both = [];
+    let i = 0;
+    let j = 0;
+    while (i < left.length && j < right.length) {
+      if (left[i] === right[j]) {
+        both.push(left[i]);
+        i += 1;
+        j += 1;
+      } else if (left[i] < right[j]) {
+        i += 1;
+      } else {
+        j += 1;
+      }
+    }
+    return both;
+  };
+
+  // Stations whose normalized search text contains `q`. Queries shorter
+  // than a trigram, or networks without trigrams, fall back to a scan.
+  const substringMatches = (q) => {
+    if (q.length < 3 || !trigrams) {
+      return stations.filter((station) => station.search.includes(q));
+    }
+    let candidates = null;
+    for (let i = 0; i + 3 <= q.length; i += 1) {
+      const posting = trigrams.get(q.slice(i, i + 3));
+      if (!posting) {
+        return [];
+      }
+      candidates = candidates ? intersectSorted(candidates, posting) : posting;
+    }
+    return candidates
+      .map((index) => stations[index])
+      .filter((station) => station.search.includes(q));
+  };
+
+  const findStationByParam = (stationValue, lineValue) => {
+    const requested = normalize(stationValue);
+    if (!requested) {
+      return null;
+    }
+    const scores = new Map();
+    substringMatches(requested).forEach((station) => scores.set(station, 1));
+    if (Object.prototype.hasOwnProperty.call(SEARCH.aliases, requested)) {
+      const hits = SEARCH.aliases[requested];
+      for (let i = 0; i < hits.length; i += SEARCH.width + 1) {
+        scores.set(stations[unpackPosition(hits, i)], Number(hits[i + SEARCH.width]));
+      }
+    }
+    const matches = Array.from(scores, ([station, score]) => ({ station, score }));
+    if (!matches.length) {
+      return null;
+    }
+
+    const lineMatches = lineValue
+      ? matches.filter((entry) => findLineCode(entry.station, lineValue))
+      : [];
+    const candidates = lineMatches.length ? lineMatches : matches;
+    candidates.sort((a, b) => {
+      if (b.score !== a.score) {
+        return b.score - a.score;
+      }
+      return a.station.name.localeCompare(b.station.name);
+    });
+    return candidates[0].station;
+  };
+
+  const findSuggestions = (query) => {
+    const q = normalize(query);
+    if (!q) {
+      return [];
+    }
+    const lower = query.toLowerCase();
+    const candidates = new Set([
+      ...prefixMatches(SEARCH.prefix.name, "nameLower", lower),
+      ...prefixMatches(SEARCH.prefix.alt, "altLower", lower),
+      ...prefixMatches(SEARCH.prefix.code, "codeLower", lower),
+      ...substringMatches(q),
+    ]);
+    const results = Array.from(candidates, (station) => {
+      let score = 0;
+      if (station.nameLower.startsWith(lower)) {
+        score += 3;
+      }
+      if (station.altLower && station.altLower.startsWith(lower)) {
+        score += 2;
+      }
+      if (station.codeLower && station.codeLower.startsWith(lower)) {
+        score += 2;
+      }
+      if (station.search.includes(q)) {
+        score += 1;
+      }
+      return { station, score };
+    }).filter((entry) => entry.score > 0);
+
+    results.sort((a, b) => {
+      if (b.score !== a.score) {
+        return b.score - a.score;
+      }
+      return a.station.name.localeCompare(b.station.name);
+    });
+
+    return results.slice(0, 8).map((entry) => entry.station);
+  };
+
+  return { findStationByParam, findSuggestions };
+};
+
+// Answers one request from the page: station suggestions and URL matches as
+// indexes into DATA.stations (-1 for no match), station details as stored.
+const answerSearchRequest = (search, details, message) => {
+  if (message.type === "suggest") {
+    return search.findSuggestions(message.query).map((station) => station.tableIndex);
+  }
+  if (message.type === "match") {
+    const station = search.findStationByParam(message.station, message.line);
+    return station ? station.tableIndex : -1;
+  }
+  return details[message.code] || null;
+};
+"""
+
 HTML_TEMPLATE = """<!DOCTYPE html>
 <html lang=\"en\">
 <head>
   <meta charset=\"utf-8\">
+  <meta name=\"cache-version\" content=\"{{CACHE_VERSION}}\">
   <meta name=\"viewport\" content=\"width=device-width, initial-scale=1\">
   <meta name=\"theme-color\" content=\"#111722\">
   <meta name=\"description\" content=\"A fast, offline-friendly DC Metro exit guide that shows the train car and door closest to station exits.\">
@@ -264,7 +542,7 @@ HTML_TEMPLATE = """<!DOCTYPE html>
   <meta property=\"og:url\" content=\"https://wherethejobsat.github.io/DCMetro/\">
   <meta property=\"og:image\" content=\"https://wherethejobsat.github.io/DCMetro/social-preview.svg\">
   <meta name=\"twitter:card\" content=\"summary_large_image\">
-  <link rel=\"manifest\" href=\"./manifest.webmanifest\">
+  <link rel=\"manifest\" href=\"./{{MANIFEST_PATH}}\">
   <title>DC Metro Exit Guide</title>
   <style>
     :root {
@@ -609,6 +887,19 @@ HTML_TEMPLATE = """<!DOCTYPE html>
         <select id=\"directionSelect\" disabled></select>
         <p id=\"platformNote\" class=\"helper\" hidden></p>
       </div>
+      <div id=\"destinationField\" class=\"field\">
+        <label for=\"destinationInput\">Destination (optional)</label>
+        <div class=\"combo\">
+          <input id=\"destinationInput\" type=\"text\" autocomplete=\"off\" placeholder=\"Where are you riding to?\">
+          <button id=\"clearDestination\" type=\"button\">Clear</button>
+        </div>
+        <div id=\"destinationSuggestions\" class=\"suggestions\" hidden></div>
+        <p class=\"helper\">Board at the door that lines up with your exit there.</p>
+      </div>
+      <div id=\"editionField\" class=\"field\" hidden>
+        <label for=\"editionSelect\">Data edition</label>
+        <select id=\"editionSelect\"></select>
+      </div>
     </section>
 
     <section class=\"card\">
@@ -637,6 +928,7 @@ HTML_TEMPLATE = """<!DOCTYPE html>
   </main>
 
   <script id=\"app-data\" type=\"application/json\">{{DATA_JSON}}</script>
+  <script id=\"station-data\" type=\"application/json\">{{STATION_DATA_JSON}}</script>
   <script>
     const DATA = JSON.parse(document.getElementById("app-data").textContent);
     const stationInput = document.getElementById("stationInput");
@@ -653,34 +945,28 @@ HTML_TEMPLATE = """<!DOCTYPE html>
     const lineTags = document.getElementById("lineTags");
     const platformNote = document.getElementById("platformNote");
     const exampleButtons = document.querySelectorAll("[data-station-example]");
+    const editionField = document.getElementById("editionField");
+    const editionSelect = document.getElementById("editionSelect");
+    const destinationField = document.getElementById("destinationField");
+    const destinationInput = document.getElementById("destinationInput");
+    const destinationSuggestions = document.getElementById("destinationSuggestions");
+    const clearDestination = document.getElementById("clearDestination");
 
     let selectedStation = null;
+    let selectedDestination = null;
     let copyFeedbackTimer = null;
     const SHARED_PLATFORM_NOTE = "At shared-platform stations, recommendations are based on platform direction; changing line may not change the result.";
-
-    const normalize = (value) => String(value || "")
-      .toLowerCase()
-      .replace(/[^a-z0-9]+/g, " ")
-      .trim();
-
-    const stations = DATA.stations.map((station) => {
-      const tokens = [
-        station.name,
-        station.alt || "",
-        station.subtitle || "",
-        station.station_code || "",
-      ].join(" ");
-      return {
-        ...station,
-        search: normalize(tokens),
-        nameLower: station.name.toLowerCase(),
-        altLower: (station.alt || "").toLowerCase(),
-        codeLower: (station.station_code || "").toLowerCase(),
-      };
+    const SHARD_ERROR = "Could not load this station. Check your connection and try again.";
+    const NO_TRIP_ROUTE = "No route on one line or through a split-level transfer station.";
+    const NO_TRIP_SAME_STATION = "Origin and destination are the same station.";
+
+{{SEARCH_SCRIPT}}
+    const stations = DATA.stations;
+    stations.forEach((station, index) => {
+      station.tableIndex = index;
+      station.nameLower = station.name.toLowerCase();
     });
 
-    const lineName = (code) => (DATA.lines[code] ? DATA.lines[code].name : code);
-
     const levelLineHint = (station) => {
       if (!/\\((Lower|Upper) Level\\)$/.test(station.name)) {
         return "";
@@ -688,18 +974,6 @@ HTML_TEMPLATE = """<!DOCTYPE html>
       return ` [${station.lines.map(lineName).join(", ")}]`;
     };
 
-    const baseStationName = (station) => station.name.replace(/ \\((Lower|Upper) Level\\)$/, "");
-
-    const findLineCode = (station, value) => {
-      const requested = normalize(value);
-      if (!station || !requested) {
-        return "";
-      }
-      return station.lines.find((code) => (
-        normalize(code) === requested || normalize(lineName(code)) === requested
-      )) || "";
-    };
-
     const findDirectionKey = (station, value) => {
       const requested = normalize(value);
       if (!station || !requested) {
@@ -713,49 +987,6 @@ HTML_TEMPLATE = """<!DOCTYPE html>
       return match ? match.key : "";
     };
 
-    const stationMatchScore = (station, value) => {
-      const requested = normalize(value);
-      if (!requested) {
-        return 0;
-      }
-      const aliases = [
-        { value: station.name, score: 6 },
-        { value: station.station_code, score: 6 },
-        { value: baseStationName(station), score: 5 },
-        { value: station.alt, score: 4 },
-        { value: station.subtitle, score: 3 },
-      ];
-      const exact = aliases.find((alias) => normalize(alias.value) === requested);
-      if (exact) {
-        return exact.score;
-      }
-      if (station.search.includes(requested)) {
-        return 1;
-      }
-      return 0;
-    };
-
-    const findStationByParam = (stationValue, lineValue) => {
-      const matches = stations
-        .map((station) => ({ station, score: stationMatchScore(station, stationValue) }))
-        .filter((entry) => entry.score > 0);
-      if (!matches.length) {
-        return null;
-      }
-
-      const lineMatches = lineValue
-        ? matches.filter((entry) => findLineCode(entry.station, lineValue))
-        : [];
-      const candidates = lineMatches.length ? lineMatches : matches;
-      candidates.sort((a, b) => {
-        if (b.score !== a.score) {
-          return b.score - a.score;
-        }
-        return a.station.name.localeCompare(b.station.name);
-      });
-      return candidates[0].station;
-    };
-
     const renderLineTags = (station) => {
       lineTags.innerHTML = "";
       if (!station) {
@@ -771,57 +1002,174 @@ HTML_TEMPLATE = """<!DOCTYPE html>
       });
     };
 
-    const buildSuggestionButton = (station) => {
+    // Counts of the DOM writes made by the render in progress; see
+    // measureRender().
+    let renderStats = null;
+
+    const countRender = (field) => {
+      if (renderStats) {
+        renderStats[field] += 1;
+      }
+    };
+
+    // Runs `render` and records a User Timing measure named `name` whose
+    // detail counts the nodes it built and reused, the nodes it inserted,
+    // moved, or removed, and the text it changed. Only those writes invalidate
+    // layout, so a render that makes none of them causes no reflow; read the
+    // counts with performance.getEntriesByName("results-render").
+    const measureRender = (name, render) => {
+      const stats = { built: 0, reused: 0, inserted: 0, removed: 0, textChanges: 0 };
+      const start = performance.now();
+      renderStats = stats;
+      try {
+        render();
+      } finally {
+        renderStats = null;
+      }
+      try {
+        performance.measure(name, { start, end: performance.now(), detail: stats });
+      } catch (error) {
+        // Browsers without User Timing Level 3 take only mark names here.
+      }
+    };
+
+    const setText = (element, text) => {
+      if (element.textContent !== text) {
+        element.textContent = text;
+        countRender("textChanges");
+      }
+    };
+
+    const cachedNode = (cache, key, build) => {
+      if (cache.has(key)) {
+        countRender("reused");
+        return cache.get(key);
+      }
+      const node = build();
+      cache.set(key, node);
+      countRender("built");
+      return node;
+    };
+
+    // Makes `nodes` the children of `container` in order, inserting or moving
+    // only the ones not already in place and removing the rest.
+    const reconcileChildren = (container, nodes) => {
+      nodes.forEach((node, index) => {
+        const current = container.childNodes[index] || null;
+        if (current !== node) {
+          container.insertBefore(node, current);
+          countRender("inserted");
+        }
+      });
+      while (container.childNodes.length > nodes.length) {
+        container.removeChild(container.lastChild);
+        countRender("removed");
+      }
+    };
+
+    const buildSuggestionButton = (station, onSelect) => {
       const button = document.createElement("button");
       const subtitle = station.subtitle ? ` - ${station.subtitle}` : "";
       button.textContent = `${station.name}${levelLineHint(station)}${subtitle}`;
       button.type = "button";
-      button.addEventListener("click", () => selectStation(station));
+      button.addEventListener("click", () => onSelect(station));
       return button;
     };
 
-    const showSuggestions = (items) => {
-      stationSuggestions.innerHTML = "";
-      if (!items.length) {
-        stationSuggestions.hidden = true;
+    // `buttons` keeps each station's button for this container by station
+    // code, so typing reorders existing buttons instead of rebuilding them.
+    const showSuggestions = (container, items, onSelect, buttons) => measureRender("suggestions-render", () => {
+      reconcileChildren(container, items.map((station) => (
+        cachedNode(buttons, station.station_code, () => buildSuggestionButton(station, onSelect))
+      )));
+      container.hidden = !items.length;
+    });
+
+    // #station-data holds the search index and, unless stations come from
+    // shards or binary tables, each station's egresses and transfers. A worker
+    // parses it and answers small requests (see answerSearchRequest()), so the
+    // main thread only parses the #app-data index. Without worker support the
+    // page parses it here instead.
+    const stationDataText = document.getElementById("station-data").textContent;
+    let stationSearch = null;
+    let stationDetails = null;
+    const useStationData = () => {
+      if (stationSearch) {
         return;
       }
-      items.forEach((station) => {
-        stationSuggestions.appendChild(buildSuggestionButton(station));
-      });
-      stationSuggestions.hidden = false;
+      const stationData = JSON.parse(stationDataText);
+      stationSearch = createStationSearch(stations, stationData.search);
+      stationDetails = stationData.stations || {};
+      stations.forEach((station) => Object.assign(station, stationDetails[station.station_code]));
     };
 
-    const findSuggestions = (query) => {
-      const q = normalize(query);
-      if (!q) {
-        return [];
+    const searchRequests = new Map();
+    let nextSearchRequest = 0;
+    let searchWorker = null;
+    if (typeof Worker !== "undefined") {
+      try {
+        searchWorker = new Worker("./{{SEARCH_WORKER_PATH}}");
+        searchWorker.postMessage({
+          type: "load",
+          appData: document.getElementById("app-data").textContent,
+          stationData: stationDataText,
+        });
+        searchWorker.addEventListener("message", (event) => {
+          const request = searchRequests.get(event.data.id);
+          searchRequests.delete(event.data.id);
+          if (request) {
+            request.resolve(event.data.result);
+          }
+        });
+        searchWorker.addEventListener("error", () => {
+          searchWorker.terminate();
+          searchWorker = null;
+          useStationData();
+          searchRequests.forEach(({ message, resolve }) => {
+            resolve(answerSearchRequest(stationSearch, stationDetails, message));
+          });
+          searchRequests.clear();
+        });
+      } catch (error) {
+        searchWorker = null;
       }
-      const results = stations.map((station) => {
-        let score = 0;
-        if (station.nameLower.startsWith(query.toLowerCase())) {
-          score += 3;
-        }
-        if (station.altLower && station.altLower.startsWith(query.toLowerCase())) {
-          score += 2;
-        }
-        if (station.codeLower && station.codeLower.startsWith(query.toLowerCase())) {
-          score += 2;
-        }
-        if (station.search.includes(q)) {
-          score += 1;
-        }
-        return { station, score };
-      }).filter((entry) => entry.score > 0);
+    }
+    if (!searchWorker) {
+      useStationData();
+    }
 
-      results.sort((a, b) => {
-        if (b.score !== a.score) {
-          return b.score - a.score;
-        }
-        return a.station.name.localeCompare(b.station.name);
+    const askSearch = (message) => {
+      if (!searchWorker) {
+        return Promise.resolve(answerSearchRequest(stationSearch, stationDetails, message));
+      }
+      nextSearchRequest += 1;
+      const id = nextSearchRequest;
+      return new Promise((resolve) => {
+        searchRequests.set(id, { message, resolve });
+        searchWorker.postMessage({ ...message, id });
       });
+    };
 
-      return results.slice(0, 8).map((entry) => entry.station);
+    const findSuggestions = (query) => askSearch({ type: "suggest", query })
+      .then((indexes) => indexes.map((index) => stations[index]));
+
+    const findStationByParam = (stationValue, lineValue) => askSearch({ type: "match", station: stationValue, line: lineValue })
+      .then((index) => (index < 0 ? null : stations[index]));
+
+    // Shows suggestions for the latest query only; answers to earlier
+    // keystrokes that arrive late are dropped.
+    const suggestionsFor = (container, onSelect) => {
+      const buttons = new Map();
+      let latest = 0;
+      return (query) => {
+        latest += 1;
+        const current = latest;
+        findSuggestions(query).then((items) => {
+          if (current === latest) {
+            showSuggestions(container, items, onSelect, buttons);
+          }
+        });
+      };
     };
 
     const fillSelect = (select, options, placeholder) => {
@@ -924,6 +1272,157 @@ HTML_TEMPLATE = """<!DOCTYPE html>
       renderDirectionSelector(preferredDirection);
 
       renderLineTags(selectedStation);
+
+      // A trip fixes the line and direction of its first leg.
+      const legs = currentTrip();
+      if (legs) {
+        if (legs[0].from === selectedStation) {
+          lineSelect.value = legs[0].line;
+          directionSelect.value = legs[0].boardKey;
+        }
+        lineSelect.disabled = true;
+        directionSelect.disabled = true;
+      }
+    };
+
+    const doorByIndex = new Map((DATA.meta.doors || []).map((door) => [door.door_index, door]));
+
+    const resolveDoors = (doorRefs) => doorRefs.map((index) => doorByIndex.get(index));
+
+    const jsonEntries = {
+      list: (station, directionKey, groupKey) => {
+        if (groupKey === "transfers") {
+          return station.transfers_by_dir ? (station.transfers_by_dir[directionKey] || []) : [];
+        }
+        const egressForDir = station.egress_by_dir[directionKey] || {};
+        return egressForDir[groupKey] || [];
+      },
+      label: (egress) => egress.label,
+      note: (egress) => egress.note,
+      delta: (egress) => egress.delta,
+      doors: (egress) => resolveDoors(egress.doors),
+      targetLines: (egress) => egress.target_lines || [],
+    };
+
+    // --binary builds ship door, egress, and transfer tables as packed
+    // little-endian arrays. Entries are plain indexes into typed-array views
+    // over the fetched buffer; strings are decoded only when rendered.
+    const BINARY_MAGIC = 0x424d4344;
+    const BINARY_NO_STRING = 0xffffffff;
+    const BINARY_LAYOUT = DATA.meta.binary;
+    let binaryTables = null;
+    let binaryRequest = null;
+
+    const decodeBinaryTables = (buffer) => {
+      const header = new DataView(buffer);
+      if (header.getUint32(0, true) !== BINARY_MAGIC || header.getUint16(4, true) !== 1) {
+        throw new Error("Unrecognized station data file.");
+      }
+      const doorCount = header.getUint32(8, true);
+      const stationCount = header.getUint32(12, true);
+      const entryCount = header.getUint32(16, true);
+      const doorRefCount = header.getUint32(20, true);
+      const stringCount = header.getUint32(24, true);
+      const stringBytes = header.getUint32(28, true);
+      const rangeCount = stationCount * BINARY_LAYOUT.directions.length * BINARY_LAYOUT.groups.length * 2;
+      let offset = 32;
+      const take = (ArrayType, length) => {
+        const view = new ArrayType(buffer, offset, length);
+        offset += view.byteLength;
+        return view;
+      };
+      return {
+        entryX: take(Float64Array, entryCount),
+        entryDelta: take(Float64Array, entryCount),
+        ranges: take(Uint32Array, rangeCount),
+        platformTypes: take(Uint32Array, stationCount),
+        entryLabel: take(Uint32Array, entryCount),
+        entryNote: take(Uint32Array, entryCount),
+        entryTargetLines: take(Uint32Array, entryCount),
+        entryDoorStart: take(Uint32Array, entryCount),
+        stringOffsets: take(Uint32Array, stringCount + 1),
+        doors: take(Uint16Array, doorCount * 3),
+        doorRefs: take(Uint16Array, doorRefCount),
+        entryType: take(Uint8Array, entryCount),
+        entryDoorCount: take(Uint8Array, entryCount),
+        stringBytes: take(Uint8Array, stringBytes),
+        strings: new Array(stringCount),
+        textDecoder: new TextDecoder(),
+      };
+    };
+
+    const readBinaryString = (stringId) => {
+      if (stringId === BINARY_NO_STRING) {
+        return "";
+      }
+      const tables = binaryTables;
+      if (tables.strings[stringId] === undefined) {
+        tables.strings[stringId] = tables.textDecoder.decode(
+          tables.stringBytes.subarray(tables.stringOffsets[stringId], tables.stringOffsets[stringId + 1])
+        );
+      }
+      return tables.strings[stringId];
+    };
+
+    const binaryEntries = {
+      list: (station, directionKey, groupKey) => {
+        const dirIndex = BINARY_LAYOUT.directions.indexOf(directionKey);
+        const groupIndex = BINARY_LAYOUT.groups.indexOf(groupKey);
+        if (dirIndex < 0 || groupIndex < 0) {
+          return [];
+        }
+        const slot = ((station.tableIndex * BINARY_LAYOUT.directions.length + dirIndex)
+          * BINARY_LAYOUT.groups.length + groupIndex) * 2;
+        const start = binaryTables.ranges[slot];
+        const indexes = [];
+        for (let i = 0; i < binaryTables.ranges[slot + 1]; i += 1) {
+          indexes.push(start + i);
+        }
+        return indexes;
+      },
+      label: (entry) => readBinaryString(binaryTables.entryLabel[entry]),
+      note: (entry) => readBinaryString(binaryTables.entryNote[entry]),
+      delta: (entry) => {
+        const delta = binaryTables.entryDelta[entry];
+        return Number.isNaN(delta) ? null : delta;
+      },
+      doors: (entry) => {
+        const start = binaryTables.entryDoorStart[entry];
+        const doors = [];
+        for (let i = 0; i < binaryTables.entryDoorCount[entry]; i += 1) {
+          const row = binaryTables.doorRefs[start + i] * 3;
+          doors.push({
+            door_index: binaryTables.doors[row],
+            car_index: binaryTables.doors[row + 1],
+            door_in_car: binaryTables.doors[row + 2],
+          });
+        }
+        return doors;
+      },
+      targetLines: (entry) => readBinaryString(binaryTables.entryTargetLines[entry]).split("/").filter(Boolean),
+    };
+
+    const entries = BINARY_LAYOUT ? binaryEntries : jsonEntries;
+
+    const loadBinaryTables = () => {
+      if (!binaryRequest) {
+        binaryRequest = fetch(BINARY_LAYOUT.path)
+          .then((response) => {
+            if (!response.ok) {
+              throw new Error(`Station data request failed: ${response.status}`);
+            }
+            return response.arrayBuffer();
+          })
+          .then((buffer) => {
+            binaryTables = decodeBinaryTables(buffer);
+            return binaryTables;
+          })
+          .catch((error) => {
+            binaryRequest = null;
+            throw error;
+          });
+      }
+      return binaryRequest;
     };
 
     const formatDoorLabel = (door) => `Car ${door.car_index}, Door ${door.door_in_car}`;
@@ -937,6 +1436,134 @@ HTML_TEMPLATE = """<!DOCTYPE html>
       return "";
     };
 
+    // DATA.trips is built by build_trip_index() in build_site.py. A train keeps
+    // its door numbering for the whole ride, so the door to board at the origin
+    // is the door nearest the chosen egress where the leg ends.
+    const TRIPS = DATA.trips;
+
+    const tripLeg = (route, from, to) => {
+      const start = route.stations.indexOf(from.tableIndex);
+      const end = route.stations.indexOf(to.tableIndex);
+      if (start < 0 || end < 0 || start === end) {
+        return null;
+      }
+      const toward = end > start ? 1 : 0;
+      return {
+        line: route.line,
+        heading: route.ends[toward],
+        from,
+        to,
+        stops: Math.abs(end - start),
+        boardKey: `${route.keys[toward][start]}B`,
+        arriveKey: `${route.keys[toward][end]}B`,
+      };
+    };
+
+    const bestLeg = (fromStations, toStations) => {
+      let best = null;
+      TRIPS.routes.forEach((route) => {
+        fromStations.forEach((from) => {
+          toStations.forEach((to) => {
+            const leg = tripLeg(route, from, to);
+            if (leg && (!best || leg.stops < best.stops)) {
+              best = leg;
+            }
+          });
+        });
+      });
+      return best;
+    };
+
+    const stationLevels = (station) => {
+      const levels = [station];
+      TRIPS.transfers.forEach(([first, second]) => {
+        if (first === station.tableIndex) {
+          levels.push(stations[second]);
+        } else if (second === station.tableIndex) {
+          levels.push(stations[first]);
+        }
+      });
+      return levels;
+    };
+
+    // One leg when origin and destination share a line, otherwise two legs
+    // through the split-level station with the fewest total stops.
+    const findTrip = (origin, destination) => {
+      const origins = stationLevels(origin);
+      const destinations = stationLevels(destination);
+      if (origins.includes(destination)) {
+        return null;
+      }
+      const direct = bestLeg(origins, destinations);
+      if (direct) {
+        return [direct];
+      }
+      let best = null;
+      TRIPS.transfers.forEach(([first, second]) => {
+        [[first, second], [second, first]].forEach(([arrive, depart]) => {
+          const legs = [
+            bestLeg(origins, [stations[arrive]]),
+            bestLeg([stations[depart]], destinations),
+          ];
+          if (legs[0] && legs[1] && (!best || legs[0].stops + legs[1].stops < best[0].stops + best[1].stops)) {
+            best = legs;
+          }
+        });
+      });
+      return best;
+    };
+
+    const currentTrip = () => (
+      selectedStation && selectedDestination ? findTrip(selectedStation, selectedDestination) : null
+    );
+
+    const tripStations = (legs) => legs.map((leg) => leg.to);
+
+    const describeLeg = (leg) => `${lineName(leg.line)} Line toward ${leg.heading} from ${leg.from.name}`;
+
+    // Transfer entries at the end of `leg` toward the next leg's line, narrowed
+    // to the next leg's heading when the labels name one.
+    const tripTransferEntries = (leg, nextLeg) => {
+      const headingNames = nextLeg.heading.split("/");
+      const toLine = entries.list(leg.to, leg.arriveKey, "transfers")
+        .filter((entry) => entries.targetLines(entry).includes(nextLeg.line));
+      const toHeading = toLine.filter((entry) => {
+        const match = / toward (.+)$/.exec(entries.label(entry));
+        return Boolean(match) && match[1].split("/").some((name) => headingNames.includes(name));
+      });
+      return toHeading.length ? toHeading : toLine;
+    };
+
+    const resultGroups = [
+      { key: "transfers", label: "Transfers" },
+      { key: "escalator", label: "Escalators" },
+      { key: "stairs", label: "Stairs" },
+      { key: "elevator", label: "Elevators" },
+      { key: "other", label: "Other" },
+    ];
+
+    const resultBlocks = (legs) => {
+      if (!legs) {
+        const directionKey = directionSelect.value || selectedStation.directions[0].key;
+        return resultGroups.map((group) => ({
+          key: `${selectedStation.station_code}/${directionKey}/${group.key}`,
+          label: group.label,
+          list: entries.list(selectedStation, directionKey, group.key),
+        }));
+      }
+      const last = legs[legs.length - 1];
+      const blocks = legs.slice(0, -1).map((leg, index) => ({
+        key: `${leg.to.station_code}/${leg.arriveKey}/transfers to ${legs[index + 1].line} ${legs[index + 1].heading}`,
+        label: `Transfer at ${leg.to.name}`,
+        list: tripTransferEntries(leg, legs[index + 1]),
+      }));
+      return blocks.concat(resultGroups.slice(1).map((group) => ({
+        key: `${last.to.station_code}/${last.arriveKey}/${group.key} on arrival`,
+        label: `${group.label} at ${last.to.name}`,
+        list: entries.list(last.to, last.arriveKey, group.key),
+      })));
+    };
+
     const formatDoorIndex = (doors) => {
       if (doors.length === 1) {
         return `Door index ${doors[0].door_index}`;
@@ -951,24 +1578,27 @@ HTML_TEMPLATE = """<!DOCTYPE html>
       wrapper.className = "egress-item";
 
       const title = document.createElement("strong");
-      title.textContent = egress.label || `Egress ${index + 1}`;
+      title.textContent = entries.label(egress) || `Egress ${index + 1}`;
 
       const doorLine = document.createElement("div");
-      const doorLabels = egress.doors.map(formatDoorLabel);
+      const doors = entries.doors(egress);
+      const doorLabels = doors.map(formatDoorLabel);
       doorLine.textContent = doorLabels.length > 1
         ? `${doorLabels.join(" or ")}`
         : doorLabels[0];
 
       const details = document.createElement("div");
       details.className = "muted";
-      const delta = egress.delta != null ? `, delta ${egress.delta}` : "";
-      details.textContent = `${formatDoorIndex(egress.doors)}${delta}`;
+      const egressDelta = entries.delta(egress);
+      const delta = egressDelta != null ? `, delta ${egressDelta}` : "";
+      details.textContent = `${formatDoorIndex(doors)}${delta}`;
 
       wrapper.appendChild(title);
-      if (egress.note) {
+      const egressNote = entries.note(egress);
+      if (egressNote) {
         const note = document.createElement("div");
         note.className = "muted";
-        note.textContent = egress.note;
+        note.textContent = egressNote;
         wrapper.appendChild(note);
       }
       wrapper.appendChild(doorLine);
@@ -981,7 +1611,7 @@ HTML_TEMPLATE = """<!DOCTYPE html>
         window.clearTimeout(copyFeedbackTimer);
         copyFeedbackTimer = null;
       }
-      copyFeedback.textContent = "";
+      setText(copyFeedback, "");
     };
 
     const showCopyFeedback = (message) => {
@@ -1009,20 +1639,94 @@ HTML_TEMPLATE = """<!DOCTYPE html>
           params.set("direction", directionSelect.value);
         }
       }
+      if (selectedDestination) {
+        params.set("to", selectedDestination.name);
+      }
       const query = params.toString();
       const nextUrl = `${window.location.pathname}${query ? `?${query}` : ""}${window.location.hash}`;
       window.history.replaceState(null, "", nextUrl);
     };
 
-    const renderResults = (options = {}) => {
+    const stationDetailsLoaded = (station) => (
+      BINARY_LAYOUT ? Boolean(binaryTables) : Boolean(station.egress_by_dir)
+    );
+
+    const loadStationDetails = (station) => {
+      if (stationDetailsLoaded(station)) {
+        return Promise.resolve(station);
+      }
+      if (BINARY_LAYOUT) {
+        return loadBinaryTables().then(() => station);
+      }
+      if (!DATA.meta.shard_path) {
+        return askSearch({ type: "details", code: station.station_code }).then((details) => {
+          Object.assign(station, details);
+          return station;
+        });
+      }
+      if (!station.shardRequest) {
+        station.shardRequest = fetch(`${DATA.meta.shard_path}${station.shard}`)
+          .then((response) => {
+            if (!response.ok) {
+              throw new Error(`Station data request failed: ${response.status}`);
+            }
+            return response.json();
+          })
+          .then((shard) => {
+            station.egress_by_dir = shard.egress_by_dir;
+            station.transfers_by_dir = shard.transfers_by_dir;
+            return station;
+          })
+          .catch((error) => {
+            station.shardRequest = null;
+            throw error;
+          });
+      }
+      return station.shardRequest;
+    };
+
+    // Result blocks by station code, direction, and entry type (plus the next
+    // leg for trip transfers), each built once with its items in entry order.
+    // Entries never change after they load, so switching line, direction, or
+    // station back to one already shown reattaches its nodes as they were.
+    const resultBlockNodes = new Map();
+
+    const buildResultBlock = (group) => {
+      const block = document.createElement("div");
+      block.className = "egress-block";
+
+      const header = document.createElement("h3");
+      header.textContent = group.label;
+      block.appendChild(header);
+
+      if (!group.list.length) {
+        const empty = document.createElement("div");
+        empty.className = "empty";
+        empty.textContent = "No entries.";
+        block.appendChild(empty);
+      } else {
+        group.list.forEach((egress, idx) => {
+          block.appendChild(buildResultItem(egress, idx));
+        });
+      }
+      return block;
+    };
+
+    const showResultBlocks = (groups) => {
+      reconcileChildren(results, groups.map((group) => (
+        cachedNode(resultBlockNodes, group.key, () => buildResultBlock(group))
+      )));
+      results.classList.toggle("animate", groups.length > 0);
+    };
+
+    const updateResults = (options) => {
       const shouldUpdateUrl = options.updateUrl !== false;
-      results.innerHTML = "";
-      results.classList.remove("animate");
       clearCopyFeedback();
 
       if (!selectedStation) {
-        resultsTitle.textContent = "Select a station to see results.";
-        resultsSub.textContent = "";
+        showResultBlocks([]);
+        setText(resultsTitle, "Select a station to see results.");
+        setText(resultsSub, "");
         copyBtn.disabled = true;
         if (shouldUpdateUrl) {
           updateUrlFromSelection();
@@ -1030,56 +1734,53 @@ HTML_TEMPLATE = """<!DOCTYPE html>
         return;
       }
 
-      const lineCode = lineSelect.value || selectedStation.lines[0];
-      const directionKey = directionSelect.value || selectedStation.directions[0].key;
-      const directionLabel = findDirectionLabel(selectedStation, directionKey);
-
-      resultsTitle.textContent = `${selectedStation.name} - ${lineName(lineCode)} Line`;
-      resultsSub.textContent = directionLabel;
-      copyBtn.disabled = false;
+      const legs = currentTrip();
+      const title = selectedDestination
+        ? `${selectedStation.name} to ${selectedDestination.name}`
+        : selectedStation.name;
+      if (selectedDestination && !legs) {
+        showResultBlocks([]);
+        setText(resultsTitle, title);
+        setText(resultsSub, stationLevels(selectedStation).includes(selectedDestination)
+          ? NO_TRIP_SAME_STATION
+          : NO_TRIP_ROUTE);
+        copyBtn.disabled = true;
+        if (shouldUpdateUrl) {
+          updateUrlFromSelection();
+        }
+        return;
+      }
 
-      const transfersForDir = selectedStation.transfers_by_dir
-        ? (selectedStation.transfers_by_dir[directionKey] || [])
-        : [];
-      const groups = [
-        { key: "transfers", label: "Transfers", list: transfersForDir },
-        { key: "escalator", label: "Escalators" },
-        { key: "stairs", label: "Stairs" },
-        { key: "elevator", label: "Elevators" },
-        { key: "other", label: "Other" },
-      ];
-
-      const egressForDir = selectedStation.egress_by_dir[directionKey] || {};
-
-      groups.forEach((group) => {
-        const block = document.createElement("div");
-        block.className = "egress-block";
-
-        const header = document.createElement("h3");
-        header.textContent = group.label;
-        block.appendChild(header);
-
-        const list = group.list || egressForDir[group.key] || [];
-        if (!list.length) {
-          const empty = document.createElement("div");
-          empty.className = "empty";
-          empty.textContent = "No entries.";
-          block.appendChild(empty);
-        } else {
-          list.forEach((egress, idx) => {
-            block.appendChild(buildResultItem(egress, idx));
-          });
+      if (!(legs ? tripStations(legs) : [selectedStation]).every(stationDetailsLoaded)) {
+        showResultBlocks([]);
+        setText(resultsTitle, `${title} - loading station data...`);
+        setText(resultsSub, "");
+        copyBtn.disabled = true;
+        if (shouldUpdateUrl) {
+          updateUrlFromSelection();
         }
+        return;
+      }
 
-        results.appendChild(block);
-      });
+      if (legs) {
+        setText(resultsTitle, title);
+        setText(resultsSub, legs.map(describeLeg).join(", then "));
+      } else {
+        const lineCode = lineSelect.value || selectedStation.lines[0];
+        const directionKey = directionSelect.value || selectedStation.directions[0].key;
+        setText(resultsTitle, `${title} - ${lineName(lineCode)} Line`);
+        setText(resultsSub, findDirectionLabel(selectedStation, directionKey));
+      }
+      copyBtn.disabled = false;
 
-      results.classList.add("animate");
+      showResultBlocks(resultBlocks(legs));
       if (shouldUpdateUrl) {
         updateUrlFromSelection();
       }
     };
 
+    const renderResults = (options = {}) => measureRender("results-render", () => updateResults(options));
+
     const selectStation = (station, options = {}) => {
       if (!station) {
         return false;
@@ -1089,25 +1790,70 @@ HTML_TEMPLATE = """<!DOCTYPE html>
       stationSuggestions.hidden = true;
       renderSelectors(options.line, options.direction);
       renderResults({ updateUrl: options.updateUrl !== false });
+      if (!stationDetailsLoaded(station)) {
+        loadStationDetails(station).then(() => {
+          if (selectedStation === station) {
+            renderResults({ updateUrl: false });
+          }
+        }).catch(() => {
+          if (selectedStation === station) {
+            resultsTitle.textContent = SHARD_ERROR;
+          }
+        });
+      }
+      loadTripDetails();
       return true;
     };
 
+    const loadTripDetails = () => {
+      const legs = currentTrip();
+      if (!legs) {
+        return;
+      }
+      const origin = selectedStation;
+      const destination = selectedDestination;
+      const isCurrent = () => selectedStation === origin && selectedDestination === destination;
+      Promise.all(tripStations(legs).map(loadStationDetails)).then(() => {
+        if (isCurrent()) {
+          renderResults({ updateUrl: false });
+        }
+      }).catch(() => {
+        if (isCurrent()) {
+          resultsTitle.textContent = SHARD_ERROR;
+        }
+      });
+    };
+
+    const selectDestination = (station, options = {}) => {
+      selectedDestination = station;
+      destinationInput.value = station ? station.name : "";
+      destinationSuggestions.hidden = true;
+      if (selectedStation) {
+        renderSelectors(lineSelect.value, directionSelect.value);
+      }
+      renderResults({ updateUrl: options.updateUrl !== false });
+      loadTripDetails();
+    };
+
+    const suggestStations = suggestionsFor(stationSuggestions, selectStation);
+    const suggestDestinations = suggestionsFor(destinationSuggestions, selectDestination);
+
     stationInput.addEventListener("input", (event) => {
       if (selectedStation && event.target.value.toLowerCase() !== selectedStation.nameLower) {
         selectedStation = null;
         renderSelectors();
         renderResults();
       }
-      const suggestions = findSuggestions(event.target.value);
-      showSuggestions(suggestions);
+      suggestStations(event.target.value);
     });
 
     stationInput.addEventListener("keydown", (event) => {
       if (event.key === "Enter") {
-        const suggestions = findSuggestions(event.target.value);
-        if (suggestions.length) {
-          selectStation(suggestions[0]);
-        }
+        findSuggestions(event.target.value).then((suggestions) => {
+          if (suggestions.length) {
+            selectStation(suggestions[0]);
+          }
+        });
       }
     });
 
@@ -1119,6 +1865,31 @@ HTML_TEMPLATE = """<!DOCTYPE html>
       renderResults();
     });
 
+    destinationInput.addEventListener("input", (event) => {
+      if (selectedDestination && event.target.value.toLowerCase() !== selectedDestination.nameLower) {
+        selectedDestination = null;
+        if (selectedStation) {
+          renderSelectors(lineSelect.value, directionSelect.value);
+        }
+        renderResults();
+      }
+      suggestDestinations(event.target.value);
+    });
+
+    destinationInput.addEventListener("keydown", (event) => {
+      if (event.key === "Enter") {
+        findSuggestions(event.target.value).then((suggestions) => {
+          if (suggestions.length) {
+            selectDestination(suggestions[0]);
+          }
+        });
+      }
+    });
+
+    clearDestination.addEventListener("click", () => {
+      selectDestination(null);
+    });
+
     lineSelect.addEventListener("change", () => {
       renderDirectionSelector(directionSelect.value);
       renderResults();
@@ -1129,10 +1900,11 @@ HTML_TEMPLATE = """<!DOCTYPE html>
 
     exampleButtons.forEach((button) => {
       button.addEventListener("click", () => {
-        const station = findStationByParam(button.dataset.stationExample || "", "");
-        if (station) {
-          selectStation(station);
-        }
+        findStationByParam(button.dataset.stationExample || "", "").then((station) => {
+          if (station) {
+            selectStation(station);
+          }
+        });
       });
     });
 
@@ -1140,40 +1912,41 @@ HTML_TEMPLATE = """<!DOCTYPE html>
       if (!selectedStation) {
         return "";
       }
-      const lineCode = lineSelect.value || selectedStation.lines[0];
-      const directionKey = directionSelect.value || selectedStation.directions[0].key;
-      const directionLabel = findDirectionLabel(selectedStation, directionKey);
-      const egressForDir = selectedStation.egress_by_dir[directionKey] || {};
-      const transfersForDir = selectedStation.transfers_by_dir
-        ? (selectedStation.transfers_by_dir[directionKey] || [])
-        : [];
+      const legs = currentTrip();
+      if (selectedDestination && !legs) {
+        return "";
+      }
+      if (!(legs ? tripStations(legs) : [selectedStation]).every(stationDetailsLoaded)) {
+        return "";
+      }
 
       const lines = [];
-      lines.push(`Station: ${selectedStation.name}`);
-      lines.push(`Line: ${lineName(lineCode)} Line`);
-      lines.push(`Direction: ${directionLabel}`);
+      if (legs) {
+        lines.push(`Trip: ${selectedStation.name} to ${selectedDestination.name}`);
+        legs.forEach((leg) => lines.push(`Ride: ${describeLeg(leg)}`));
+      } else {
+        const lineCode = lineSelect.value || selectedStation.lines[0];
+        const directionKey = directionSelect.value || selectedStation.directions[0].key;
+        lines.push(`Station: ${selectedStation.name}`);
+        lines.push(`Line: ${lineName(lineCode)} Line`);
+        lines.push(`Direction: ${findDirectionLabel(selectedStation, directionKey)}`);
+      }
       lines.push("");
 
-      const groups = [
-        { key: "transfers", label: "Transfers", list: transfersForDir },
-        { key: "escalator", label: "Escalators" },
-        { key: "stairs", label: "Stairs" },
-        { key: "elevator", label: "Elevators" },
-        { key: "other", label: "Other" },
-      ];
-
-      groups.forEach((group) => {
+      resultBlocks(legs).forEach((group) => {
         lines.push(`${group.label}:`);
-        const list = group.list || egressForDir[group.key] || [];
-        if (!list.length) {
+        if (!group.list.length) {
           lines.push("- None");
         } else {
-          list.forEach((egress, idx) => {
-            const label = egress.label || `Egress ${idx + 1}`;
-            const doorLabels = egress.doors.map(formatDoorLabel).join(" or ");
-            const delta = egress.delta != null ? ` (delta ${egress.delta})` : "";
-            const indexLabel = formatDoorIndex(egress.doors);
-            const note = egress.note ? `; ${egress.note}` : "";
+          group.list.forEach((egress, idx) => {
+            const label = entries.label(egress) || `Egress ${idx + 1}`;
+            const doors = entries.doors(egress);
+            const doorLabels = doors.map(formatDoorLabel).join(" or ");
+            const egressDelta = entries.delta(egress);
+            const delta = egressDelta != null ? ` (delta ${egressDelta})` : "";
+            const indexLabel = formatDoorIndex(doors);
+            const egressNote = entries.note(egress);
+            const note = egressNote ? `; ${egressNote}` : "";
             lines.push(`- ${label}: ${doorLabels}, ${indexLabel}${delta}${note}`);
           });
         }
@@ -1219,72 +1992,271 @@ HTML_TEMPLATE = """<!DOCTYPE html>
       });
     }
 
+    // Resolves to whether the URL selected a station.
     const initFromUrl = () => {
       const params = new URLSearchParams(window.location.search);
+      const destinationParam = TRIPS.routes.length ? params.get("to") : null;
       const stationParam = params.get("station");
-      if (!stationParam) {
-        return false;
-      }
       const lineParam = params.get("line");
-      const station = findStationByParam(stationParam, lineParam);
-      if (!station) {
-        return false;
-      }
-      return selectStation(station, {
-        line: lineParam,
-        direction: params.get("direction"),
-        updateUrl: true,
+      return Promise.all([
+        destinationParam ? findStationByParam(destinationParam, "") : null,
+        stationParam ? findStationByParam(stationParam, lineParam) : null,
+      ]).then(([destination, station]) => {
+        if (destinationParam) {
+          selectedDestination = destination;
+          destinationInput.value = destination ? destination.name : "";
+        }
+        if (!station) {
+          return false;
+        }
+        return selectStation(station, {
+          line: lineParam,
+          direction: params.get("direction"),
+          updateUrl: true,
+        });
       });
     };
 
-    if (!initFromUrl()) {
-      renderSelectors();
-      renderResults({ updateUrl: false });
+    const renderEditionSelector = () => {
+      const editions = DATA.meta.editions || [];
+      if (editions.length < 2) {
+        editionField.hidden = true;
+        return;
+      }
+      fillSelect(
+        editionSelect,
+        editions.map((edition) => ({ value: edition.path, label: edition.name })),
+        ""
+      );
+      const current = editions.find((edition) => edition.name === DATA.meta.edition);
+      editionSelect.value = current ? current.path : editions[0].path;
+      editionField.hidden = false;
+    };
+
+    editionSelect.addEventListener("change", () => {
+      window.location.href = `${editionSelect.value}${window.location.search}`;
+    });
+
+    if (BINARY_LAYOUT) {
+      loadBinaryTables().catch(() => {});
     }
+    renderEditionSelector();
+    destinationField.hidden = !TRIPS.routes.length;
+
+    initFromUrl().then((selected) => {
+      if (!selected) {
+        renderSelectors();
+        renderResults({ updateUrl: false });
+      }
+    });
   </script>
 </body>
 </html>
 """
 
-SW_TEMPLATE = """const CACHE_VERSION = "{{CACHE_VERSION}}";
-const CACHE_NAME = `metro-exit-${CACHE_VERSION}`;
-const ASSETS = [
-  "./",
-  "./index.html",
-  "./app.js",
-  "./manifest.webmanifest",
-  "./sw.js",
-  "./social-preview.svg",
-  "./icons/icon-192.svg",
-  "./icons/icon-512.svg",
-];
+SW_TEMPLATE = """// CACHE_VERSION changes whenever the build output does, so a new page always
+// installs a new worker; the caches themselves are keyed by content-hashed
+// file names.
+const CACHE_VERSION = "{{CACHE_VERSION}}";
+const CACHE_PREFIX = "{{CACHE_PREFIX}}";
+const PAGE_CACHE = `${CACHE_PREFIX}page`;
+const ASSET_CACHE = `${CACHE_PREFIX}assets`;
+// Holds this build's page from install until activate moves it to PAGE_CACHE.
+const STAGED_PAGE_CACHE = `${CACHE_PREFIX}page-${CACHE_VERSION}`;
+// Precached on install.
+const ASSETS = {{ASSETS}};
+// Station shards or binary tables, cached the first time they are fetched.
+const DATA_FILES = {{DATA_FILES}};
+// Cache versions of earlier pages with a patch to this one in ./patches/.
+const PATCHES = {{PATCHES}};
+const PAGE_VERSION_RE = /<meta name="cache-version" content="([0-9a-f]+)">/;
+
+const scopeUrl = (path) => new URL(path, self.location).href;
+const PAGE_URL = scopeUrl("./");
+const PAGE_URLS = new Set([PAGE_URL, scopeUrl("./index.html")]);
+const CURRENT_ASSETS = new Set([...ASSETS, ...DATA_FILES].map(scopeUrl));
+
+const pageResponse = (bytes) => new Response(bytes, {
+  headers: { "Content-Type": "text/html; charset=utf-8" },
+});
 
-self.addEventListener("install", (event) => {
+const toHex = (buffer) => Array.from(new Uint8Array(buffer), (byte) => byte.toString(16).padStart(2, "0")).join("");
+
+// A patch is a list of [start, end) byte ranges to copy from the cached page
+// and literal strings; the result must hash to the new page's SHA-256.
+const applyPatch = (old, patch) => {
+  const encoder = new TextEncoder();
+  const parts = patch.ops.map((op) => (typeof op === "string" ? encoder.encode(op) : old.subarray(op[0], op[1])));
+  const page = new Uint8Array(parts.reduce((size, part) => size + part.length, 0));
+  parts.reduce((offset, part) => {
+    page.set(part, offset);
+    return offset + part.length;
+  }, 0);
+  return crypto.subtle.digest("SHA-256", page)
+    .then((digest) => (toHex(digest) === patch.sha256 ? pageResponse(page) : null));
+};
+
+// This build's page from the cached one, or null when it must be fetched.
+const patchCachedPage = (cached) => cached.arrayBuffer().then((buffer) => {
+  const old = new Uint8Array(buffer);
+  const version = pageVersion(old);
+  if (version === CACHE_VERSION) {
+    return pageResponse(old);
+  }
+  if (!PATCHES.includes(version)) {
+    return null;
+  }
+  return fetch(`./patches/${version}.json`)
+    .then((response) => (response.ok ? response.json() : null))
+    .then((patch) => (patch ? applyPatch(old, patch) : null));
+});
+
+const pageVersion = (bytes) => {
+  const match = new TextDecoder().decode(bytes.subarray(0, 4096)).match(PAGE_VERSION_RE);
+  return match && match[1];
+};
+
+// A page a navigation refresh already downloaded for this build, else the
+// cached page patched, else a fresh download.
+const loadPage = () => caches.open(STAGED_PAGE_CACHE).then((staged) => staged.match(PAGE_URL))
+  .then((page) => page || caches.open(PAGE_CACHE).then((cache) => cache.match(PAGE_URL))
+    .then((cached) => (cached ? patchCachedPage(cached) : null)))
+  .catch(() => null)
+  .then((page) => page || fetch(new Request(PAGE_URL, { cache: "reload" })))
+  .then((page) => {
+    if (!page.ok) {
+      throw new Error(`Page request failed: ${page.status}`);
+    }
+    return page;
+  });
+
+const precacheAssets = () => caches.open(ASSET_CACHE).then((cache) => Promise.all(
+  ASSETS.map((asset) => cache.match(asset).then((cached) => cached || cache.add(asset)))
+));
+
+// The shared page cache is only written on activate, once every asset the new
+// page loads is cached: a failed install leaves the old page (and the old
+// worker serving it) untouched.
+self.addEventListener("install", (event) => {
   self.skipWaiting();
   event.waitUntil(
-    caches.open(CACHE_NAME).then((cache) => cache.addAll(ASSETS))
+    Promise.all([precacheAssets(), loadPage()])
+      .then(([, page]) => caches.open(STAGED_PAGE_CACHE).then((cache) => cache.put(PAGE_URL, page)))
   );
 });
 
+const promoteStagedPage = () => caches.open(STAGED_PAGE_CACHE)
+  .then((staged) => staged.match(PAGE_URL))
+  .then((page) => (page ? caches.open(PAGE_CACHE).then((cache) => cache.put(PAGE_URL, page)) : null));
+
+// Hashed assets this build no longer lists are evicted; unchanged ones stay.
+const evictStaleAssets = () => caches.open(ASSET_CACHE).then((cache) => cache.keys().then((requests) => Promise.all(
+  requests
+    .filter((request) => !CURRENT_ASSETS.has(request.url))
+    .map((request) => cache.delete(request))
+)));
+
 self.addEventListener("activate", (event) => {
   event.waitUntil(
-    caches.keys()
-      .then((keys) => Promise.all(
-        keys.filter((key) => key !== CACHE_NAME).map((key) => caches.delete(key))
-      ))
-      .then(() => self.clients.claim())
+    Promise.all([
+      // Navigations revalidate through the preload request the browser starts
+      // while this worker boots.
+      self.registration.navigationPreload ? self.registration.navigationPreload.enable() : null,
+      promoteStagedPage().then(() => caches.keys()).then((keys) => Promise.all(
+        keys
+          .filter((key) => key.startsWith(CACHE_PREFIX) && key !== PAGE_CACHE && key !== ASSET_CACHE)
+          .map((key) => caches.delete(key))
+      )),
+      evictStaleAssets(),
+    ]).then(() => self.clients.claim())
   );
 });
 
+const isPageNavigation = (request) => (
+  request.mode === "navigate" && PAGE_URLS.has(request.url.split("?")[0])
+);
+
+// Stores a refreshed page. A page for this build replaces the cached one; a
+// newer build's page is staged where that build's worker looks for it on
+// install (so it is not downloaded twice) and the update check runs now. The
+// shared page cache never holds a page whose assets are not cached yet.
+const storeRefreshedPage = (cache, response) => response.clone().arrayBuffer().then((buffer) => {
+  const version = pageVersion(new Uint8Array(buffer));
+  if (!version || version === CACHE_VERSION) {
+    return cache.put(PAGE_URL, response);
+  }
+  return caches.open(`${CACHE_PREFIX}page-${version}`)
+    .then((staged) => staged.put(PAGE_URL, response))
+    .then(() => self.registration.update());
+});
+
+// The navigation preload response, or a network request without one.
+const fetchPage = (event) => Promise.resolve(event.preloadResponse)
+  .then((preloaded) => preloaded || fetch(event.request));
+
+// Revalidates the cached page. When this build has a patch from the cached
+// page's version, the patch is applied instead of using the full preload
+// download.
+const revalidatePage = (event, cache, cached) => cached.clone().arrayBuffer().then((buffer) => {
+  if (PATCHES.includes(pageVersion(new Uint8Array(buffer)))) {
+    return patchCachedPage(cached).then((page) => (page ? cache.put(PAGE_URL, page) : null));
+  }
+  return fetchPage(event).then((response) => (response.ok ? storeRefreshedPage(cache, response) : null));
+});
+
+// Stale-while-revalidate: answer from the cached page at once and refresh it
+// in the background; without a cached page, answer from the network.
+const staleWhileRevalidate = (event) => caches.open(PAGE_CACHE).then((cache) => cache.match(PAGE_URL).then((cached) => {
+  if (cached) {
+    event.waitUntil(revalidatePage(event, cache, cached.clone()).catch(() => null));
+    return cached;
+  }
+  return fetchPage(event).then((response) => {
+    if (response.ok) {
+      event.waitUntil(storeRefreshedPage(cache, response.clone()).catch(() => null));
+    }
+    return response;
+  });
+}));
+
+const cacheFirst = (request) => caches.open(ASSET_CACHE).then((cache) => cache.match(request).then((cached) => {
+  if (cached) {
+    return cached;
+  }
+  return fetch(request).then((response) => {
+    if (response.ok) {
+      cache.put(request, response.clone());
+    }
+    return response;
+  });
+}));
+
 self.addEventListener("fetch", (event) => {
-  event.respondWith(
-    caches.match(event.request).then((cached) => {
-      if (cached) {
-        return cached;
-      }
-      return fetch(event.request);
-    })
-  );
+  if (isPageNavigation(event.request)) {
+    event.respondWith(staleWhileRevalidate(event));
+  } else if (event.request.method === "GET" && CURRENT_ASSETS.has(event.request.url)) {
+    event.respondWith(cacheFirst(event.request));
+  }
+});
+"""
+
+# Loaded by app.js with new Worker(); parses the page's #app-data and
+# #station-data text off the main thread and answers requests in order.
+SEARCH_WORKER_TEMPLATE = """let DATA = null;
+let stationSearch = null;
+let stationDetails = null;
+
+{{SEARCH_SCRIPT}}
+self.addEventListener("message", (event) => {
+  const message = event.data;
+  if (message.type === "load") {
+    DATA = JSON.parse(message.appData);
+    const stationData = JSON.parse(message.stationData);
+    stationSearch = createStationSearch(DATA.stations, stationData.search);
+    stationDetails = stationData.stations || {};
+    return;
+  }
+  self.postMessage({ id: message.id, result: answerSearchRequest(stationSearch, stationDetails, message) });
 });
 """
 
@@ -1297,12 +2269,12 @@ MANIFEST_TEMPLATE = """{
   "theme_color": "#111722",
   "icons": [
     {
-      "src": "./icons/icon-192.svg",
+      "src": "./icons/{{ICON_192_PATH}}",
       "sizes": "192x192",
       "type": "image/svg+xml"
     },
     {
-      "src": "./icons/icon-512.svg",
+      "src": "./icons/{{ICON_512_PATH}}",
       "sizes": "512x512",
       "type": "image/svg+xml"
     }
@@ -1356,11 +2328,161 @@ def fail(message):
     raise SystemExit(1)
 
 
+class BuildProfiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = []
+
+    def start(self):
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        if self.enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        tracemalloc.reset_peak()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            self.phases.append({
+                "phase": name,
+                "seconds": round(seconds, 6),
+                "peak_bytes": peak_bytes - start_bytes,
+                "retained_bytes": current_bytes - start_bytes,
+            })
+
+    def report(self):
+        width = max([len("Phase"), *(len(item["phase"]) for item in self.phases)])
+        print(f"{'Phase':<{width}}  {'Time (ms)':>10}  {'Peak (KiB)':>11}")
+        for item in self.phases:
+            print(
+                f"{item['phase']:<{width}}  {item['seconds'] * 1000:>10.2f}  "
+                f"{item['peak_bytes'] / 1024:>11.1f}"
+            )
+        total = sum(item["seconds"] for item in self.phases)
+        peak = max((item["peak_bytes"] for item in self.phases), default=0)
+        print(f"{'total':<{width}}  {total * 1000:>10.2f}  {peak / 1024:>11.1f}")
+
+    def write_json(self, path, inputs):
+        report = {
+            "python": sys.version.split()[0],
+            "inputs": {name: digest for name, digest in inputs.items() if name.endswith(".csv")},
+            "phases": self.phases,
+            "total_seconds": round(sum(item["seconds"] for item in self.phases), 6),
+            "peak_bytes": max((item["peak_bytes"] for item in self.phases), default=0),
+        }
+        Path(path).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
 def read_csv(path):
     with path.open(newline="") as handle:
         return list(csv.DictReader(handle))
 
 
+DoorRow = namedtuple("DoorRow", ["car", "x"])
+ExitRow = namedtuple("ExitRow", ["station", "label", "description"])
+EgressRow = namedtuple("EgressRow", ["station", "egress_type", "x", "y", "exit_label"])
+RouteRow = namedtuple("RouteRow", ["line", "first_end", "last_end", "station"])
+
+
+def text_value(value, column, file_name):
+    return value
+
+
+def float_value(value, column, file_name):
+    return parse_float(value, column, file_name)
+
+
+def optional_int_value(value, column, file_name):
+    return parse_int(value, column, file_name) if value else None
+
+
+def egress_type_value(value, column, file_name):
+    return EGRESS_TYPE_MAP.get(value, "other")
+
+
+# Typed row layouts for the streamed source files. Each field is read from its
+# column once, stripped, and converted.
+ROW_SCHEMAS = {
+    "Doors": (DoorRow, [("Car", text_value), ("x", float_value)]),
+    "Exits": (
+        ExitRow,
+        [("nameStd", text_value), ("exitLabel", text_value), ("description", text_value)],
+    ),
+    "Egresses": (
+        EgressRow,
+        [
+            ("nameStd", text_value),
+            ("icon", egress_type_value),
+            ("x", float_value),
+            ("y", optional_int_value),
+            ("exitLabel", text_value),
+        ],
+    ),
+    "Routes": (
+        RouteRow,
+        [("line", text_value), ("firstEnd", text_value), ("lastEnd", text_value), ("nameStd", text_value)],
+    ),
+}
+
+
+# With `station_lookup`, the first (station) column is resolved before any
+# other column is converted: rows naming no station are skipped unparsed,
+# unknown stations fail, and each row carries the resolved station name.
+def iter_typed_rows(path, file_label, meta, station_lookup=None):
+    row_type, fields = ROW_SCHEMAS[file_label]
+    with path.open(newline="") as handle:
+        reader = csv.reader(handle)
+        headers = next(reader, [])
+        ensure_columns(meta, file_label, headers, REQUIRED_COLUMNS[file_label])
+        columns = [(headers.index(column), column, convert) for column, convert in fields]
+        if station_lookup is not None:
+            station_index, columns = columns[0][0], columns[1:]
+        for values in reader:
+            if not values:
+                continue
+            width = len(values)
+            if station_lookup is None:
+                station = ()
+            else:
+                station = resolve_station_reference(
+                    values[station_index] if station_index < width else "",
+                    station_lookup,
+                    path.name,
+                )
+                if not station:
+                    continue
+                station = (station,)
+            yield row_type(*station, *[
+                convert(values[index].strip() if index < width else "", column, path.name)
+                for index, column, convert in columns
+            ])
+
+
+# Route stops in order, one row per stop; consecutive rows sharing a line and
+# both ends form one route. None when there is no Routes.csv.
+def load_line_routes(input_files, meta):
+    path = input_files.get("routes")
+    if path is None or not path.exists():
+        return None
+    routes = []
+    for row in iter_typed_rows(path, "Routes", meta):
+        if not routes or routes[-1][:3] != (row.line, row.first_end, row.last_end):
+            routes.append((row.line, row.first_end, row.last_end, []))
+        routes[-1][3].append(row.station)
+    return [(line, first_end, last_end, tuple(names)) for line, first_end, last_end, names in routes]
+
+
 def load_meta(path):
     meta = defaultdict(set)
     with path.open(newline="") as handle:
@@ -1376,9 +2498,9 @@ def load_meta(path):
     return meta
 
 
-def ensure_inputs_exist():
-    for label, path in INPUT_FILES.items():
-        if not path.exists():
+def ensure_inputs_exist(input_files=INPUT_FILES):
+    for label, path in input_files.items():
+        if not path.exists() and label not in OPTIONAL_INPUTS:
             fail(f"Missing required input file: {path}")
 
 
@@ -1413,14 +2535,13 @@ def is_true(value):
 def build_doors(door_rows):
     entries = []
     for idx, row in enumerate(door_rows):
-        car_raw = (row.get("Car") or "").strip()
+        car_raw = row.car
         car_num = parse_int(car_raw, "Car", "Doors.csv") if car_raw else None
-        x_value = parse_float(row.get("x"), "x", "Doors.csv")
         entries.append({
             "id": idx,
             "car_raw": car_raw,
             "car_num": car_num,
-            "x": x_value,
+            "x": row.x,
         })
 
     car_keys = []
@@ -1480,15 +2601,9 @@ def build_doors(door_rows):
 def build_exit_map(exit_rows, station_lookup):
     exit_map = defaultdict(dict)
     for row in exit_rows:
-        station = resolve_station_reference(
-            row.get("nameStd"),
-            station_lookup,
-            "Exits.csv",
-        )
-        label = (row.get("exitLabel") or "").strip()
-        description = (row.get("description") or "").strip()
-        if station and label:
-            exit_map[station][label] = description
+        station = resolve_station_reference(row.station, station_lookup, "Exits.csv")
+        if station and row.label:
+            exit_map[station][row.label] = row.description
     return exit_map
 
 
@@ -1506,25 +2621,34 @@ def is_split_level_station(station_name):
 
 
 def line_order_index(line_code):
-    return [code for code, _name, _color in LINE_DEFS].index(line_code)
+    return LINE_ORDER[line_code]
 
 
+# The label helpers below are memoized per distinct input; the same exit
+# descriptions and line groups recur on every egress row and direction. They
+# take and return tuples so cached values can't be mutated by callers.
+# build_data() clears them first, so --watch and api.py reloads hold one
+# build's entries at most.
+@lru_cache(maxsize=None)
 def format_line_group(line_codes):
-    names = [name for code, name, _color in LINE_DEFS if code in set(line_codes)]
+    codes = sorted(set(line_codes) & LINE_ORDER.keys(), key=line_order_index)
+    names = [LINE_NAMES[code] for code in codes]
     if not names:
         return ""
     suffix = "Line" if len(names) == 1 else "Lines"
     return f"{'/'.join(names)} {suffix}"
 
 
+@lru_cache(maxsize=None)
 def transfer_target_lines(description):
     match = TRANSFER_LINE_RE.search(description or "")
     if not match:
-        return []
+        return ()
     codes = [code for code in match.group(1).split("/") if code in LINE_COLS]
-    return sorted(set(codes), key=line_order_index)
+    return tuple(sorted(set(codes), key=line_order_index))
 
 
+@lru_cache(maxsize=None)
 def transfer_label_parts(description, target_lines, egress_type):
     line_group = format_line_group(target_lines)
     label = f"To {line_group}" if line_group else "Transfer"
@@ -1538,6 +2662,14 @@ def transfer_label_parts(description, target_lines, egress_type):
     return label, ". ".join(part for part in note_parts if part)
 
 
+def memoized_helpers():
+    return {
+        "format_line_group": format_line_group,
+        "transfer_target_lines": transfer_target_lines,
+        "transfer_label_parts": transfer_label_parts,
+    }
+
+
 def has_transfer_entries(station):
     return any(station["transfers_by_dir"][dir_key] for dir_key in ("WB", "EB"))
 
@@ -1577,7 +2709,7 @@ def add_split_level_transfer_fallbacks(stations):
             )
             if not target_lines:
                 continue
-            label = f"To {format_line_group(target_lines)}"
+            label = f"To {format_line_group(tuple(target_lines))}"
             for dir_key in ("WB", "EB"):
                 for egress_type in ("stairs", "escalator", "elevator"):
                     for source in station["egress_by_dir"][dir_key][egress_type]:
@@ -1635,109 +2767,104 @@ def nearest_doors(doors, x_value, tie_threshold=0.25):
     return [doors[closest]], round(closest_distance, 3)
 
 
-def build_data():
-    ensure_inputs_exist()
-
-    meta = load_meta(INPUT_FILES["meta"])
+def build_door_lookup(doors):
+    total_doors = len(doors)
+    slot_count = int(round((PLATFORM_X_MAX - PLATFORM_X_MIN) / PLATFORM_X_STEP)) + 1
+    door_refs = []
+    reversed_refs = []
+    deltas = []
+    for slot in range(slot_count):
+        x_value = PLATFORM_X_MIN + slot * PLATFORM_X_STEP
+        door_matches, delta = nearest_doors(doors, x_value)
+        refs = [door["door_index"] for door in door_matches]
+        door_refs.append(refs)
+        reversed_refs.append(sorted(total_doors - index + 1 for index in refs))
+        deltas.append(delta)
+    return {
+        "x_min": PLATFORM_X_MIN,
+        "x_step": PLATFORM_X_STEP,
+        "reverse_dir": REVERSE_DOORS_FOR_DIR,
+        "doors": door_refs,
+        "reversed_doors": reversed_refs,
+        "delta": deltas,
+    }
 
-    door_rows = read_csv(INPUT_FILES["doors"])
-    station_rows = read_csv(INPUT_FILES["stations"])
-    exit_rows = read_csv(INPUT_FILES["exits"])
-    egress_rows = read_csv(INPUT_FILES["egresses"])
 
-    if not door_rows:
-        fail("Doors.csv has no data rows.")
-    if not station_rows:
-        fail("Stations.csv has no data rows.")
-    if not egress_rows:
-        fail("Egresses.csv has no data rows.")
+def door_lookup_slot(door_lookup, x_value):
+    offset = (x_value - door_lookup["x_min"]) / door_lookup["x_step"]
+    slot = int(round(offset))
+    if abs(offset - slot) > 1e-9 or not 0 <= slot < len(door_lookup["doors"]):
+        return None
+    return slot
 
-    ensure_columns(meta, "Doors", door_rows[0].keys() if door_rows else [], REQUIRED_COLUMNS["Doors"])
-    ensure_columns(meta, "Stations", station_rows[0].keys() if station_rows else [], REQUIRED_COLUMNS["Stations"])
-    ensure_columns(meta, "Exits", exit_rows[0].keys() if exit_rows else [], REQUIRED_COLUMNS["Exits"])
-    ensure_columns(meta, "Egresses", egress_rows[0].keys() if egress_rows else [], REQUIRED_COLUMNS["Egresses"])
 
-    doors, door_meta = build_doors(door_rows)
-    door_by_index = {door["door_index"]: door for door in doors}
-    total_doors = len(doors)
+def lookup_door_refs(door_lookup, doors, x_value):
+    slot = door_lookup_slot(door_lookup, x_value)
+    if slot is not None:
+        return (
+            door_lookup["doors"][slot],
+            door_lookup["reversed_doors"][slot],
+            door_lookup["delta"][slot],
+        )
+    # Off-grid positions are outside meta.csv's contract; search them directly.
+    door_matches, delta = nearest_doors(doors, x_value)
+    refs = [door["door_index"] for door in door_matches]
+    return refs, sorted(len(doors) - index + 1 for index in refs), delta
+
+
+def build_station_entry(row, name, station_codes=WMATA_STATION_CODES, station_code_re=STATION_CODE_RE):
+    station_code = station_codes[name]
+    if not station_code_re.fullmatch(station_code):
+        fail(f"Invalid WMATA station code for {name}: {station_code}")
+    lines = [code for code, col in LINE_COLS.items() if is_true(row.get(col))]
+    lines.sort(key=line_order_index)
+
+    wb_dir = (row.get("WBDir") or "").strip()
+    eb_dir = (row.get("EBDir") or "").strip()
+    directions = [
+        {
+            "key": "WB",
+            "label": f"Toward {wb_dir}" if wb_dir else "Direction A",
+        },
+        {
+            "key": "EB",
+            "label": f"Toward {eb_dir}" if eb_dir else "Direction B",
+        },
+    ]
 
-    station_names = {
-        (row.get("nameStd") or "").strip()
-        for row in station_rows
-        if (row.get("nameStd") or "").strip()
+    return {
+        "name": name,
+        "station_code": station_code,
+        "alt": (row.get("nameAlt") or "").strip(),
+        "subtitle": (row.get("subtitile") or "").strip(),
+        "platform_type": (row.get("platformType") or "").strip(),
+        "lines": lines,
+        "directions": directions,
+        "egress_by_dir": {
+            "WB": {"escalator": [], "stairs": [], "elevator": [], "other": []},
+            "EB": {"escalator": [], "stairs": [], "elevator": [], "other": []},
+        },
+        "transfers_by_dir": {
+            "WB": [],
+            "EB": [],
+        },
     }
-    station_lookup = build_station_reference_lookup(station_rows)
-    exit_map = build_exit_map(exit_rows, station_lookup)
-    missing_station_codes = sorted(station_names - set(WMATA_STATION_CODES))
-    if missing_station_codes:
-        fail(f"Missing WMATA station codes: {', '.join(missing_station_codes)}")
-
-    extra_station_codes = sorted(set(WMATA_STATION_CODES) - station_names)
-    if extra_station_codes:
-        fail(f"WMATA station code map has unknown stations: {', '.join(extra_station_codes)}")
-
-    stations = []
-    station_map = {}
-    for row in station_rows:
-        name = (row.get("nameStd") or "").strip()
-        if not name:
-            continue
-        station_code = WMATA_STATION_CODES[name]
-        if not re.fullmatch(r"[A-Z][0-9]{2}", station_code):
-            fail(f"Invalid WMATA station code for {name}: {station_code}")
-        lines = [code for code, col in LINE_COLS.items() if is_true(row.get(col))]
-        lines.sort(key=lambda code: [c[0] for c in LINE_DEFS].index(code))
-
-        wb_dir = (row.get("WBDir") or "").strip()
-        eb_dir = (row.get("EBDir") or "").strip()
-        directions = [
-            {
-                "key": "WB",
-                "label": f"Toward {wb_dir}" if wb_dir else "Direction A",
-            },
-            {
-                "key": "EB",
-                "label": f"Toward {eb_dir}" if eb_dir else "Direction B",
-            },
-        ]
 
-        station = {
-            "name": name,
-            "station_code": station_code,
-            "alt": (row.get("nameAlt") or "").strip(),
-            "subtitle": (row.get("subtitile") or "").strip(),
-            "platform_type": (row.get("platformType") or "").strip(),
-            "lines": lines,
-            "directions": directions,
-            "egress_by_dir": {
-                "WB": {"escalator": [], "stairs": [], "elevator": [], "other": []},
-                "EB": {"escalator": [], "stairs": [], "elevator": [], "other": []},
-            },
-            "transfers_by_dir": {
-                "WB": [],
-                "EB": [],
-            },
-        }
-        stations.append(station)
-        station_map[name] = station
 
+# Egress rows come from iter_typed_rows() with the station lookup, so their
+# stations are already resolved.
+def add_egress_rows(egress_rows, station_map, exit_map, doors, door_lookup):
+    row_count = 0
     for row in egress_rows:
-        station_name = resolve_station_reference(
-            row.get("nameStd"),
-            station_lookup,
-            "Egresses.csv",
-        )
-        if not station_name:
-            continue
+        row_count += 1
+        station_name = row.station
         station = station_map.get(station_name)
 
-        icon = (row.get("icon") or "").strip()
-        egress_type = EGRESS_TYPE_MAP.get(icon, "other")
-        x_value = parse_float(row.get("x"), "x", "Egresses.csv")
-        y_value = (row.get("y") or "").strip()
-        y_int = parse_int(y_value, "y", "Egresses.csv") if y_value else None
+        egress_type = row.egress_type
+        x_value = row.x
+        y_int = row.y
 
-        exit_label = (row.get("exitLabel") or "").strip()
+        exit_label = row.exit_label
         exit_desc = exit_map.get(station_name, {}).get(exit_label, "")
         target_lines = transfer_target_lines(exit_desc)
         if exit_label and exit_desc:
@@ -1749,8 +2876,8 @@ def build_data():
         else:
             label = ""
 
-        door_matches, delta = nearest_doors(doors, x_value)
-        if not door_matches:
+        door_refs, reversed_refs, delta = lookup_door_refs(door_lookup, doors, x_value)
+        if not door_refs:
             continue
 
         if platform_is_side(station["platform_type"]) and y_int in {1, 2}:
@@ -1759,22 +2886,8 @@ def build_data():
             dirs = ["WB", "EB"]
 
         def map_doors_for_direction(direction_key):
-            if direction_key != REVERSE_DOORS_FOR_DIR:
-                mapped = door_matches
-            else:
-                mapped = []
-                for door in door_matches:
-                    rev_index = total_doors - door["door_index"] + 1
-                    mapped.append(door_by_index[rev_index])
-                mapped.sort(key=lambda item: item["door_index"])
-            return [
-                {
-                    "door_index": door["door_index"],
-                    "car_index": door["car_index"],
-                    "door_in_car": door["door_in_car"],
-                }
-                for door in mapped
-            ]
+            refs = reversed_refs if direction_key == REVERSE_DOORS_FOR_DIR else door_refs
+            return list(refs)
 
         for dir_key in dirs:
             egress_entry = {
@@ -1796,14 +2909,447 @@ def build_data():
                         "type": egress_type,
                         "label": transfer_label,
                         "note": transfer_note,
-                        "target_lines": target_lines,
+                        "target_lines": list(target_lines),
                         "x": round(x_value, 3),
                         "delta": delta,
                         "doors": map_doors_for_direction(dir_key),
                     }
                 )
+    return row_count
+
+
+# Parsed source objects stored as JSON under .cache/parse/, keyed by the
+# parser version and the hashes of every file the object depends on, so an
+# edit to Egresses.csv reuses the parsed doors, stations, and exits.
+# Parse cache keys include the source of every function that produces or
+# encodes a cached object, and the tables they read, so editing a parser
+# invalidates its cached objects the way source_hashes() covers build_site.py.
+@lru_cache(maxsize=None)
+def parser_code_hash():
+    functions = (
+        read_csv,
+        iter_typed_rows,
+        ensure_columns,
+        text_value,
+        float_value,
+        parse_float,
+        optional_int_value,
+        parse_int,
+        egress_type_value,
+        parse_doors,
+        build_doors,
+        normalize_station_reference,
+        add_station_reference,
+        build_station_reference_lookup,
+        resolve_station_reference,
+        build_exit_map,
+        load_station_rows,
+        encode_station_lookup,
+        decode_station_lookup,
+        load_station_lookup,
+        load_doors,
+        load_exit_map,
+    )
+    tables = {
+        "ROW_SCHEMAS": {
+            label: [row_type._fields, [(column, convert.__name__) for column, convert in fields]]
+            for label, (row_type, fields) in ROW_SCHEMAS.items()
+        },
+        "EGRESS_TYPE_MAP": EGRESS_TYPE_MAP,
+        "REQUIRED_COLUMNS": REQUIRED_COLUMNS,
+        "STATION_REFERENCE_TRANSLATION": STATION_REFERENCE_TRANSLATION,
+    }
+    source = [[inspect.getsource(function) for function in functions], tables]
+    return sha256_hex(json.dumps(source, sort_keys=True).encode("utf-8"))
+
+
+class ParseCache:
+    def __init__(self, cache_dir=PARSE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.file_hashes = {}
+        self.hits = []
+        self.misses = []
+
+    def file_hash(self, path):
+        if path not in self.file_hashes:
+            self.file_hashes[path] = sha256_hex(path.read_bytes())
+        return self.file_hashes[path]
+
+    def load(self, kind, paths, parse, encode, decode):
+        key_source = json.dumps([parser_code_hash(), kind, [self.file_hash(path) for path in paths]])
+        key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()[:20]
+        cache_path = self.cache_dir / f"{kind}-{key}.json"
+        if cache_path.exists():
+            try:
+                value = decode(json.loads(cache_path.read_text(encoding="utf-8")))
+            except (ValueError, KeyError, TypeError):
+                cache_path.unlink(missing_ok=True)
+            else:
+                self.hits.append(kind)
+                return value
+
+        value = parse()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps(encode(value), separators=(",", ":")), encoding="utf-8")
+        os.replace(temp_path, cache_path)
+        stale = sorted(self.cache_dir.glob(f"{kind}-*.json"), key=lambda path: path.stat().st_mtime)
+        for path in stale[:-PARSE_CACHE_KEEP]:
+            path.unlink(missing_ok=True)
+        self.misses.append(kind)
+        return value
+
+    def summary(self):
+        reused = ", ".join(self.hits) or "nothing"
+        parsed = ", ".join(self.misses) or "nothing"
+        return f"Parse cache: reused {reused}; parsed {parsed}."
+
+
+def cached_parse(parse_cache, kind, paths, parse, encode, decode):
+    if parse_cache is None:
+        return parse()
+    return parse_cache.load(kind, paths, parse, encode, decode)
+
+
+def load_station_rows(input_files, parse_cache=None):
+    # Pairs rather than objects: DictReader rows can carry a None key for
+    # overlong lines, which a JSON object can't round-trip.
+    return cached_parse(
+        parse_cache,
+        "stations",
+        [input_files["stations"]],
+        lambda: read_csv(input_files["stations"]),
+        lambda rows: [list(row.items()) for row in rows],
+        lambda rows: [dict(pairs) for pairs in rows],
+    )
+
+
+def encode_station_lookup(lookup):
+    return {
+        "names": {key: name for key, name in lookup.items() if name is not AMBIGUOUS_STATION_REFERENCE},
+        "ambiguous": sorted(key for key, name in lookup.items() if name is AMBIGUOUS_STATION_REFERENCE),
+    }
+
+
+def decode_station_lookup(value):
+    lookup = dict(value["names"])
+    lookup.update((key, AMBIGUOUS_STATION_REFERENCE) for key in value["ambiguous"])
+    return lookup
+
+
+def load_station_lookup(input_files, station_rows, parse_cache=None):
+    return cached_parse(
+        parse_cache,
+        "station-lookup",
+        [input_files["stations"]],
+        lambda: build_station_reference_lookup(station_rows),
+        encode_station_lookup,
+        decode_station_lookup,
+    )
+
+
+def parse_doors(input_files, meta):
+    door_rows = list(iter_typed_rows(input_files["doors"], "Doors", meta))
+    if not door_rows:
+        fail("Doors.csv has no data rows.")
+    return build_doors(door_rows)
+
+
+def load_doors(input_files, meta, parse_cache=None):
+    return cached_parse(
+        parse_cache,
+        "doors",
+        [input_files["doors"], input_files["meta"]],
+        lambda: parse_doors(input_files, meta),
+        list,
+        tuple,
+    )
+
 
-    add_split_level_transfer_fallbacks(stations)
+def load_exit_map(input_files, meta, station_lookup, parse_cache=None):
+    return cached_parse(
+        parse_cache,
+        "exit-map",
+        [input_files["exits"], input_files["stations"], input_files["meta"]],
+        lambda: build_exit_map(iter_typed_rows(input_files["exits"], "Exits", meta), station_lookup),
+        dict,
+        lambda value: defaultdict(dict, value),
+    )
+
+
+# Built egress/transfer entries keyed by a fingerprint of their inputs; values
+# are stored as JSON so every hit is a fresh copy. `build_keys` limits which
+# misses are built (the rest are left empty), so build_editions can fingerprint
+# every edition and build each distinct station once before fanning out.
+class StationCache:
+    def __init__(self, store=None, build_keys=None):
+        self.store = {} if store is None else store
+        self.build_keys = build_keys
+        self.keys = []
+        self.hits = 0
+        self.misses = 0
+
+    def should_build(self, key):
+        return self.build_keys is None or key in self.build_keys
+
+    def get(self, key):
+        self.keys.append(key)
+        cached = self.store.get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(cached)
+
+    def put(self, key, value):
+        self.store[key] = dump_payload(value)
+
+
+def station_fingerprint(row, station_code, egress_rows, exits, door_fingerprint):
+    source = (
+        [(column, (row.get(column) or "").strip()) for column in REQUIRED_COLUMNS["Stations"]],
+        station_code,
+        sorted(exits.items()),
+        [tuple(egress_row) for egress_row in egress_rows],
+        door_fingerprint,
+    )
+    return hashlib.sha1(repr(source).encode("utf-8")).hexdigest()
+
+
+def add_cached_egress_rows(
+    egress_rows,
+    station_map,
+    source_rows,
+    exit_map,
+    doors,
+    door_lookup,
+    station_cache,
+    door_fingerprint,
+):
+    rows_by_station = defaultdict(list)
+    row_count = 0
+    for row in egress_rows:
+        row_count += 1
+        rows_by_station[row.station].append(row)
+
+    for name, station in station_map.items():
+        station_rows = rows_by_station.get(name, [])
+        key = station_fingerprint(
+            source_rows[name],
+            station["station_code"],
+            station_rows,
+            exit_map.get(name, {}),
+            door_fingerprint,
+        )
+        cached = station_cache.get(key)
+        if cached is not None:
+            station.update(cached)
+            continue
+        if not station_cache.should_build(key):
+            continue
+        add_egress_rows(station_rows, station_map, exit_map, doors, door_lookup)
+        station_cache.put(
+            key,
+            {
+                "egress_by_dir": station["egress_by_dir"],
+                "transfers_by_dir": station["transfers_by_dir"],
+            },
+        )
+    return row_count
+
+
+# Mirrors normalize() in app.js.
+def normalize_search_text(value):
+    return SEARCH_NORMALIZE_RE.sub(" ", str(value or "").lower()).strip()
+
+
+def station_search_aliases(station):
+    # Same aliases and scores as the exact-match ranking in findStationByParam().
+    return (
+        (station["name"], 6),
+        (station.get("station_code"), 6),
+        (base_station_name(station["name"]), 5),
+        (station.get("alt"), 4),
+        (station.get("subtitle"), 3),
+    )
+
+
+def base36(value, width):
+    digits = ""
+    for _ in range(width):
+        value, digit = divmod(value, 36)
+        digits = BASE36_DIGITS[digit] + digits
+    return digits
+
+
+# The search index refers to stations by their position in the payload, written
+# as `width` base-36 digits where it is packed into a string.
+# prefix: station positions sorted by lowercased name, alt name, and code, for
+# binary-searched prefix matches (code point order, as JS compares strings).
+# trigrams (large networks only): the packed sorted positions of the stations
+# whose normalized search text contains a trigram -> every trigram with that
+# posting, concatenated. aliases: normalized alias -> packed position and
+# one-digit score per station.
+def build_search_index(stations):
+    width = 1
+    while 36 ** width < len(stations):
+        width += 1
+    with_trigrams = len(stations) >= SEARCH_TRIGRAM_MIN_STATIONS
+    prefix = {}
+    for field, key in SEARCH_PREFIX_FIELDS:
+        values = sorted(((station.get(key) or "").lower(), index) for index, station in enumerate(stations))
+        prefix[field] = [index for value, index in values if value]
+
+    trigrams = defaultdict(list)
+    aliases = defaultdict(dict)
+    for index, station in enumerate(stations):
+        text = normalize_search_text(" ".join([
+            station["name"],
+            station.get("alt") or "",
+            station.get("subtitle") or "",
+            station.get("station_code") or "",
+        ]))
+        if with_trigrams:
+            for trigram in sorted({text[start:start + 3] for start in range(len(text) - 2)}):
+                trigrams[trigram].append(index)
+        for value, score in station_search_aliases(station):
+            alias = normalize_search_text(value)
+            if alias:
+                aliases[alias][index] = max(score, aliases[alias].get(index, 0))
+
+    search = {
+        "width": width,
+        "prefix": prefix,
+        "aliases": {
+            alias: "".join(f"{base36(index, width)}{score}" for index, score in sorted(hits.items()))
+            for alias, hits in aliases.items()
+        },
+    }
+    if with_trigrams:
+        postings = defaultdict(str)
+        for trigram, positions in sorted(trigrams.items()):
+            postings["".join(base36(position, width) for position in positions)] += trigram
+        search["trigrams"] = dict(postings)
+    return search
+
+
+def direction_label_names(label):
+    return set(label.removeprefix("Toward ").split("/"))
+
+
+# The platform direction (WB/EB) a train on `line` uses at `station` while
+# heading toward the `toward` end of its route. WB/EB follow each station's
+# diagram rather than the compass, so they can flip along a line; the
+# direction labels name the terminals and settle it. Termini label both
+# directions with their own name, so their platform type decides. None when
+# the labels do not settle it.
+def route_direction_key(station, line, toward, away):
+    def naming(names, others):
+        return [
+            direction["key"]
+            for direction in station["directions"]
+            if direction_label_names(direction["label"]) & names
+            and not direction_label_names(direction["label"]) & others
+        ]
+
+    matches = naming(direction_label_names(toward), direction_label_names(away))
+    if len(matches) == 1:
+        return matches[0]
+    # Otherwise take the direction that does not name the far end.
+    opposite = naming(direction_label_names(away), direction_label_names(toward))
+    if not matches and len(opposite) == 1:
+        return "EB" if opposite[0] == "WB" else "WB"
+    terminus_key = TERMINUS_DIRECTIONS.get(station["platform_type"].lower())
+    if terminus_key and len(matches) == 2:
+        return terminus_key
+    if terminus_key and not matches:
+        return "EB" if terminus_key == "WB" else "WB"
+    return None
+
+
+# (line, message) for each route stop whose platform direction toward an end
+# the direction labels do not settle. build_trip_index drops those routes;
+# validate_domain.py reports them.
+def unmatched_route_directions(stations, line_routes):
+    station_by_name = {station["name"]: station for station in stations}
+    unmatched = []
+    for line, first_end, last_end, names in line_routes:
+        for name in (name for name in names if name in station_by_name):
+            for toward, away in ((first_end, last_end), (last_end, first_end)):
+                if route_direction_key(station_by_name[name], line, toward, away) is None:
+                    unmatched.append(
+                        (line, f"Cannot tell which {name} platform direction heads toward {toward} on the {line} Line.")
+                    )
+    return unmatched
+
+
+# Trips stay on one train per leg, so a door chosen at the origin is the same
+# door at the destination: the answer for origin -> destination is the
+# destination's egress entries for the direction the train arrives in. The
+# payload therefore stores no station-pair matrix, only each route's station
+# order and, per stop, the platform direction toward either end ("W"/"E" per
+# character, index-aligned with `stations`). Split-level stations (separate
+# station entries per level) are listed as transfer pairs for two-leg trips.
+# Why `line_routes` cannot route `stations`, or None when every route stop is a
+# station on that line and every station line is routed.
+def line_routes_problem(stations, line_routes):
+    lines_by_name = {station["name"]: station["lines"] for station in stations}
+    routed = set()
+    for line, _first_end, _last_end, names in line_routes:
+        for name in names:
+            if name not in lines_by_name:
+                return f"Routes.csv lists {name} on the {line} Line, but Stations.csv has no such station."
+            if line not in lines_by_name[name]:
+                return f"Routes.csv lists {name} on the {line} Line, but Stations.csv does not."
+            routed.add((line, name))
+    for station in stations:
+        for line in station["lines"]:
+            if (line, station["name"]) not in routed:
+                return f"{station['name']} is on the {line} Line in Stations.csv but missing from Routes.csv."
+    return None
+
+
+# With `strict`, routes that do not match the stations fail the build;
+# otherwise (station subsets, or `line_routes` of None for networks without a
+# Routes.csv) the payload ships no routes and the app hides trip planning. A
+# route with a stop whose platform directions cannot be told is left out.
+def build_trip_index(stations, line_routes, strict=True):
+    problem = line_routes_problem(stations, line_routes) if line_routes is not None else None
+    if problem and strict:
+        fail(problem)
+    if line_routes is None or problem:
+        line_routes = ()
+    index_by_name = {station["name"]: index for index, station in enumerate(stations)}
+    routes = []
+    for line, first_end, last_end, names in line_routes:
+        route_stations = [index_by_name[name] for name in names]
+        keys = [
+            [route_direction_key(stations[index], line, toward, away) for index in route_stations]
+            for toward, away in ((first_end, last_end), (last_end, first_end))
+        ]
+        if None in keys[0] + keys[1]:
+            continue
+        routes.append({
+            "ends": [first_end, last_end],
+            "keys": ["".join(key[0] for key in direction_keys) for direction_keys in keys],
+            "line": line,
+            "stations": route_stations,
+        })
+
+    levels = defaultdict(list)
+    for index, station in enumerate(stations):
+        if is_split_level_station(station["name"]):
+            levels[base_station_name(station["name"])].append(index)
+    transfers = [
+        [first, second]
+        for indexes in levels.values()
+        for position, first in enumerate(indexes)
+        for second in indexes[position + 1:]
+    ]
+    return {"routes": routes, "transfers": transfers}
+
+
+def sort_station_entries(stations):
     for station in stations:
         sort_transfer_entries(station)
         for dir_key in ["WB", "EB"]:
@@ -1814,60 +3360,1332 @@ def build_data():
 
     stations.sort(key=lambda station: station["name"])
 
+
+def build_data(
+    profiler=None,
+    input_files=INPUT_FILES,
+    station_codes=WMATA_STATION_CODES,
+    station_code_re=STATION_CODE_RE,
+    station_cache=None,
+    require_all_codes=True,
+    sources=None,
+    parse_cache=None,
+):
+    profiler = profiler or BuildProfiler()
+    ensure_inputs_exist(input_files)
+    for helper in memoized_helpers().values():
+        helper.cache_clear()
+
+    # `sources` (a network.Network) supplies objects it has already parsed;
+    # without it, Stations, doors, and exits are parsed here (or loaded from
+    # `parse_cache`) and Egresses are streamed as typed rows.
+    if sources:
+        meta, station_rows, (doors, door_meta) = sources.meta, sources.station_rows, sources.doors
+    else:
+        with profiler.phase("read meta.csv"):
+            meta = load_meta(input_files["meta"])
+        with profiler.phase("read Stations.csv"):
+            station_rows = load_station_rows(input_files, parse_cache)
+
+    if not station_rows:
+        fail("Stations.csv has no data rows.")
+
+    ensure_columns(meta, "Stations", station_rows[0].keys(), REQUIRED_COLUMNS["Stations"])
+
+    if not sources:
+        with profiler.phase("build_doors"):
+            doors, door_meta = load_doors(input_files, meta, parse_cache)
+    with profiler.phase("build_door_lookup"):
+        door_lookup = build_door_lookup(doors)
+    door_meta = {
+        **door_meta,
+        "door_lookup": door_lookup,
+        "doors": [
+            {
+                "door_index": door["door_index"],
+                "car_index": door["car_index"],
+                "door_in_car": door["door_in_car"],
+            }
+            for door in doors
+        ],
+    }
+
+    with profiler.phase("station lookup and exit map"):
+        station_names = {
+            (row.get("nameStd") or "").strip()
+            for row in station_rows
+            if (row.get("nameStd") or "").strip()
+        }
+        if sources:
+            station_lookup, exit_map = sources.station_lookup, sources.exit_map
+        else:
+            station_lookup = load_station_lookup(input_files, station_rows, parse_cache)
+            exit_map = load_exit_map(input_files, meta, station_lookup, parse_cache)
+    missing_station_codes = sorted(station_names - set(station_codes))
+    if missing_station_codes:
+        fail(f"Missing WMATA station codes: {', '.join(missing_station_codes)}")
+
+    extra_station_codes = sorted(set(station_codes) - station_names)
+    if extra_station_codes and require_all_codes:
+        fail(f"WMATA station code map has unknown stations: {', '.join(extra_station_codes)}")
+
+    with profiler.phase("station entries"):
+        stations = []
+        station_map = {}
+        source_rows = {}
+        for row in station_rows:
+            name = (row.get("nameStd") or "").strip()
+            if not name:
+                continue
+            station = build_station_entry(row, name, station_codes, station_code_re)
+            stations.append(station)
+            station_map[name] = station
+            source_rows[name] = row
+
+    with profiler.phase("egress rows"):
+        if sources:
+            egress_rows = sources.egress_rows
+        else:
+            egress_rows = iter_typed_rows(input_files["egresses"], "Egresses", meta, station_lookup)
+        if station_cache is None:
+            egress_count = add_egress_rows(
+                egress_rows,
+                station_map,
+                exit_map,
+                doors,
+                door_lookup,
+            )
+        else:
+            egress_count = add_cached_egress_rows(
+                egress_rows,
+                station_map,
+                source_rows,
+                exit_map,
+                doors,
+                door_lookup,
+                station_cache,
+                hashlib.sha1(dump_payload(door_meta).encode("ascii")).hexdigest(),
+            )
+    if not egress_count:
+        fail("Egresses.csv has no data rows.")
+
+    with profiler.phase("add_split_level_transfer_fallbacks"):
+        add_split_level_transfer_fallbacks(stations)
+    with profiler.phase("sort entries"):
+        sort_station_entries(stations)
+
     line_defs = {
         code: {"name": name, "color": color}
         for code, name, color in LINE_DEFS
     }
 
+    with profiler.phase("search index"):
+        search_index = build_search_index(stations)
+    with profiler.phase("trip index"):
+        line_routes = sources.line_routes if sources else load_line_routes(input_files, meta)
+        trip_index = build_trip_index(stations, line_routes, strict=require_all_codes)
+
     data = {
         "meta": door_meta,
         "lines": line_defs,
+        "search": search_index,
         "stations": stations,
+        "trips": trip_index,
     }
 
-    data_json = json.dumps(data, ensure_ascii=True, sort_keys=True, separators=(",", ":"))
+    with profiler.phase("json.dumps"):
+        data_json = dump_payload(data)
 
     return data, data_json
 
 
+def dump_payload(value):
+    return json.dumps(value, ensure_ascii=True, sort_keys=True, separators=(",", ":"))
+
+
+# One hash per station over its whole entry (names, lines, directions,
+# egress_by_dir, transfers_by_dir) with door references resolved, so a door
+# table edit changes the hash of every station that points at the edited doors.
+def station_content_hashes(data):
+    return {
+        station["station_code"]: sha256_hex(dump_payload(station).encode("ascii"))[:ASSET_HASH_LENGTH]
+        for station in expand_door_refs(data)["stations"]
+    }
+
+
+def station_hashes_manifest(data, cache_version):
+    manifest = {"cache_version": cache_version, "stations": station_content_hashes(data)}
+    return json.dumps(manifest, indent=2, sort_keys=True) + "\n"
+
+
+def expand_door_refs(data):
+    door_table = {door["door_index"]: door for door in data["meta"]["doors"]}
+
+    def expand(entries):
+        return [{**entry, "doors": [door_table[index] for index in entry["doors"]]} for entry in entries]
+
+    stations = []
+    for station in data["stations"]:
+        stations.append({
+            **station,
+            "egress_by_dir": {
+                dir_key: {
+                    egress_type: expand(entries)
+                    for egress_type, entries in by_type.items()
+                }
+                for dir_key, by_type in station["egress_by_dir"].items()
+            },
+            "transfers_by_dir": {
+                dir_key: expand(entries)
+                for dir_key, entries in station["transfers_by_dir"].items()
+            },
+        })
+    meta = {key: value for key, value in data["meta"].items() if key != "doors"}
+    return {**data, "meta": meta, "stations": stations}
+
+
+def report_payload_size(data, data_json):
+    inline_json = dump_payload(expand_door_refs(data))
+    size = len(data_json.encode("ascii"))
+    inline_size = len(inline_json.encode("ascii"))
+    saved = inline_size - size
+    percent = (saved / inline_size * 100) if inline_size else 0.0
+    print(
+        f"Payload: {size:,} bytes with the shared door table "
+        f"({inline_size:,} bytes with inline door objects; {saved:,} bytes, {percent:.1f}% smaller)."
+    )
+
+
+# The inline payload in two parts: #app-data, the station index and tables the
+# page renders from, parsed on the main thread; and #station-data, the search
+# index plus each station's details when they are not served from shards or
+# binary tables, parsed by the search worker.
+def split_station_data(data, details=True):
+    index_data = {key: value for key, value in data.items() if key != "search"}
+    station_data = {"search": data["search"]}
+    if details:
+        index_data["stations"] = [{key: station[key] for key in SHARD_STATION_KEYS} for station in data["stations"]]
+        station_data["stations"] = {
+            station["station_code"]: {key: value for key, value in station.items() if key not in SHARD_STATION_KEYS}
+            for station in data["stations"]
+        }
+    return index_data, station_data
+
+
+def shard_data(data):
+    shards = {}
+    index_stations = []
+    for station in data["stations"]:
+        index_stations.append({key: station[key] for key in SHARD_STATION_KEYS})
+        shards[station["station_code"]] = {
+            key: value for key, value in station.items() if key not in SHARD_STATION_KEYS
+        }
+    meta = {**data["meta"], "shard_path": "./data/"}
+    return {**data, "meta": meta, "stations": index_stations}, shards
+
+
+# Binary tables: a header of counts, then one little-endian array per field,
+# ordered by element size (float64, uint32, uint16, uint8) so every array is
+# aligned for a typed-array view without padding. Door refs point at rows of
+# the door table; strings are UTF-8 slices addressed by an offsets array.
+def binary_table_layout(door_count, station_count, entry_count, door_ref_count, string_count, string_bytes):
+    range_count = station_count * len(BINARY_DIRECTIONS) * len(BINARY_GROUPS) * 2
+    return [
+        ("entry_x", "d", entry_count),
+        ("entry_delta", "d", entry_count),
+        ("ranges", "I", range_count),
+        ("platform_types", "I", station_count),
+        ("entry_label", "I", entry_count),
+        ("entry_note", "I", entry_count),
+        ("entry_target_lines", "I", entry_count),
+        ("entry_door_start", "I", entry_count),
+        ("string_offsets", "I", string_count + 1),
+        ("doors", "H", door_count * 3),
+        ("door_refs", "H", door_ref_count),
+        ("entry_type", "B", entry_count),
+        ("entry_door_count", "B", entry_count),
+        ("string_bytes", "B", string_bytes),
+    ]
+
+
+def encode_binary_tables(data):
+    doors = data["meta"]["doors"]
+    door_rows = {door["door_index"]: row for row, door in enumerate(doors)}
+    strings = {}
+    string_chunks = []
+    string_offsets = [0]
+
+    def string_id(value):
+        if value is None:
+            return BINARY_NO_STRING
+        if value not in strings:
+            encoded = value.encode("utf-8")
+            strings[value] = len(strings)
+            string_chunks.append(encoded)
+            string_offsets.append(string_offsets[-1] + len(encoded))
+        return strings[value]
+
+    fields = {name: [] for name, _code, _count in binary_table_layout(0, 0, 0, 0, 0, 0)}
+    fields["doors"] = [
+        value for door in doors for value in (door["door_index"], door["car_index"], door["door_in_car"])
+    ]
+    for station in data["stations"]:
+        fields["platform_types"].append(string_id(station["platform_type"]))
+        for dir_key in BINARY_DIRECTIONS:
+            for group in BINARY_GROUPS:
+                if group == "transfers":
+                    entries = station["transfers_by_dir"][dir_key]
+                else:
+                    entries = station["egress_by_dir"][dir_key].get(group, [])
+                fields["ranges"].extend((len(fields["entry_x"]), len(entries)))
+                for entry in entries:
+                    target_lines = entry.get("target_lines")
+                    fields["entry_x"].append(entry["x"])
+                    fields["entry_delta"].append(float("nan") if entry["delta"] is None else entry["delta"])
+                    fields["entry_label"].append(string_id(entry["label"]))
+                    fields["entry_note"].append(string_id(entry.get("note")))
+                    fields["entry_target_lines"].append(
+                        string_id("/".join(target_lines) if target_lines is not None else None)
+                    )
+                    fields["entry_door_start"].append(len(fields["door_refs"]))
+                    fields["entry_door_count"].append(len(entry["doors"]))
+                    fields["entry_type"].append(BINARY_ENTRY_TYPES.index(entry["type"]))
+                    fields["door_refs"].extend(door_rows[index] for index in entry["doors"])
+    fields["string_offsets"] = string_offsets
+    fields["string_bytes"] = b"".join(string_chunks)
+
+    counts = (
+        len(doors),
+        len(data["stations"]),
+        len(fields["entry_x"]),
+        len(fields["door_refs"]),
+        len(strings),
+        len(fields["string_bytes"]),
+    )
+    chunks = [BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, *counts)]
+    for name, code, count in binary_table_layout(*counts):
+        values = fields[name]
+        if len(values) != count:
+            fail(f"Binary table {name} has {len(values)} values; expected {count}.")
+        chunks.append(bytes(values) if code == "B" else struct.pack(f"<{count}{code}", *values))
+
+    blob = b"".join(chunks)
+    meta = {key: value for key, value in data["meta"].items() if key != "doors"}
+    meta["binary"] = {
+        "path": f"./data/{hashed_asset_name(BINARY_TABLES_NAME, blob)}",
+        "directions": list(BINARY_DIRECTIONS),
+        "groups": list(BINARY_GROUPS),
+        "types": list(BINARY_ENTRY_TYPES),
+    }
+    index_stations = [{key: station[key] for key in SHARD_STATION_KEYS} for station in data["stations"]]
+    return {**data, "meta": meta, "stations": index_stations}, blob
+
+
+def decode_binary_tables(index_data, blob):
+    magic, version, _flags, *counts = BINARY_HEADER.unpack_from(blob, 0)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Unrecognized binary table header.")
+    fields = {}
+    offset = BINARY_HEADER.size
+    for name, code, count in binary_table_layout(*counts):
+        fields[name] = struct.unpack_from(f"<{count}{code}", blob, offset)
+        offset += struct.calcsize(f"<{count}{code}")
+    if offset != len(blob):
+        raise ValueError("Binary table size does not match its header.")
+
+    string_bytes = bytes(fields["string_bytes"])
+    offsets = fields["string_offsets"]
+
+    def read_string(string_id):
+        if string_id == BINARY_NO_STRING:
+            return None
+        return string_bytes[offsets[string_id]:offsets[string_id + 1]].decode("utf-8")
+
+    door_table = fields["doors"]
+    doors = [
+        {"door_index": door_table[row], "car_index": door_table[row + 1], "door_in_car": door_table[row + 2]}
+        for row in range(0, len(door_table), 3)
+    ]
+
+    def decode_entry(entry):
+        start = fields["entry_door_start"][entry]
+        delta = fields["entry_delta"][entry]
+        decoded = {
+            "type": BINARY_ENTRY_TYPES[fields["entry_type"][entry]],
+            "label": read_string(fields["entry_label"][entry]),
+            "x": fields["entry_x"][entry],
+            "delta": None if delta != delta else delta,
+            "doors": [
+                doors[row]["door_index"]
+                for row in fields["door_refs"][start:start + fields["entry_door_count"][entry]]
+            ],
+        }
+        note = read_string(fields["entry_note"][entry])
+        if note is not None:
+            decoded["note"] = note
+        target_lines = read_string(fields["entry_target_lines"][entry])
+        if target_lines is not None:
+            decoded["target_lines"] = target_lines.split("/") if target_lines else []
+        return decoded
+
+    ranges = fields["ranges"]
+    stations = []
+    slot = 0
+    for station_index, index_station in enumerate(index_data["stations"]):
+        station = {**index_station, "platform_type": read_string(fields["platform_types"][station_index])}
+        station["egress_by_dir"] = {}
+        station["transfers_by_dir"] = {}
+        for dir_key in BINARY_DIRECTIONS:
+            station["egress_by_dir"][dir_key] = {}
+            for group in BINARY_GROUPS:
+                start, count = ranges[slot], ranges[slot + 1]
+                slot += 2
+                entries = [decode_entry(entry) for entry in range(start, start + count)]
+                if group == "transfers":
+                    station["transfers_by_dir"][dir_key] = entries
+                else:
+                    station["egress_by_dir"][dir_key][group] = entries
+        stations.append(station)
+
+    meta = {key: value for key, value in index_data["meta"].items() if key != "binary"}
+    meta["doors"] = doors
+    return {**index_data, "meta": meta, "stations": stations}
+
+
 def write_file(path, content):
+    if path.exists() and path.read_text(encoding="utf-8") == content:
+        return False
     path.write_text(content, encoding="utf-8")
+    return True
+
+
+def write_bytes_file(path, data):
+    if path.exists() and path.read_bytes() == data:
+        return False
+    path.write_bytes(data)
+    return True
+
+
+def gzip_bytes(data):
+    # Hand-built header: fixed mtime, no file name, "unknown" OS byte, so the
+    # bytes only depend on the input and compression level.
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    header = b"\x1f\x8b\x08\x00" + struct.pack("<I", 0) + b"\x02\xff"
+    trailer = struct.pack("<II", zlib.crc32(data) & 0xFFFFFFFF, len(data) & 0xFFFFFFFF)
+    return header + body + trailer
+
+
+def compressed_siblings(outputs, docs_dir=DOCS_DIR):
+    siblings = {}
+    rows = []
+    for path, content in outputs.items():
+        raw = content if isinstance(content, bytes) else content.encode("utf-8")
+        gz_path = path.with_name(path.name + ".gz")
+        siblings[gz_path] = gzip_bytes(raw)
+        br_size = None
+        if brotli is not None:
+            br_path = path.with_name(path.name + ".br")
+            siblings[br_path] = brotli.compress(raw, quality=BROTLI_QUALITY)
+            br_size = len(siblings[br_path])
+        rows.append((path.relative_to(docs_dir).as_posix(), len(raw), len(siblings[gz_path]), br_size))
+    return siblings, rows
+
+
+def remove_stale_brotli(outputs):
+    # Without the brotli module, a leftover .br would be served with old content.
+    for path in outputs:
+        br_path = path.with_name(path.name + ".br")
+        if br_path.exists():
+            br_path.unlink()
+
+
+def report_compression(rows):
+    width = max(len("File"), *(len(name) for name, _raw, _gz, _br in rows))
+    print(f"{'File':<{width}}  {'Raw':>9}  {'gzip':>9}  {'brotli':>9}")
+    for name, raw_size, gz_size, br_size in rows:
+        br_label = f"{br_size:,}" if br_size is not None else "-"
+        print(f"{name:<{width}}  {raw_size:>9,}  {gz_size:>9,}  {br_label:>9}")
+    if brotli is None:
+        print("Brotli module not installed; wrote gzip siblings only.")
+
+
+# Deterministic, dependency-free minification. Each pass only removes text
+# that can't change behaviour: HTML indentation and comments (script, pre, and
+# textarea bodies stay verbatim), CSS comments and whitespace outside strings,
+# and JS indentation, blank lines, and whole-line // comments outside template
+# literals. Trailing // comments stay, since telling them apart from "//"
+# inside strings or regexes needs a full tokenizer.
+def minify_css(css):
+    parts = CSS_STRING_RE.split(CSS_COMMENT_RE.sub("", css))
+    for index in range(0, len(parts), 2):
+        part = re.sub(r"\s+", " ", parts[index])
+        part = CSS_PUNCTUATION_RE.sub(r"\1", part)
+        parts[index] = part.replace(": ", ":").replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def minify_html(html):
+    html = HTML_STYLE_RE.sub(lambda match: match.group(1) + minify_css(match.group(2)) + match.group(3), html)
+    parts = HTML_VERBATIM_RE.split(html)
+    minified = []
+    # split() yields text, then each match's two groups; only text is rewritten.
+    for index in range(0, len(parts), 3):
+        text = HTML_COMMENT_RE.sub("", parts[index])
+        lines = [line.strip() for line in text.splitlines()]
+        minified.append("\n".join(line for line in lines if line))
+        if index + 1 < len(parts):
+            minified.append(parts[index + 1])
+    return "".join(minified) + "\n"
+
+
+def minify_js(js):
+    lines = []
+    in_template = False
+    for line in js.splitlines():
+        if in_template:
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith("//"):
+                lines.append(stripped)
+        if (line.count("`") - line.count("\\`")) % 2:
+            in_template = not in_template
+    return "\n".join(lines) + "\n"
 
 
-def build_site():
-    data, data_json = build_data()
-    cache_seed = data_json + HTML_TEMPLATE + SW_TEMPLATE + MANIFEST_TEMPLATE + SOCIAL_PREVIEW
-    cache_version = hashlib.sha1(cache_seed.encode("ascii")).hexdigest()[:10]
+def report_minification(rows):
+    width = max(len("File"), *(len(name) for name, _before, _after in rows))
+    print(f"{'File':<{width}}  {'Before':>9}  {'After':>9}  {'Saved':>6}")
+    for name, before, after in rows:
+        print(f"{name:<{width}}  {before:>9,}  {after:>9,}  {1 - after / before:>6.1%}")
+
+
+def sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# "app.js" -> "app.<hash>.js", so a file's URL changes exactly when its bytes do.
+def hashed_asset_name(name, content):
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    stem, _, suffix = name.partition(".")
+    return f"{stem}.{sha256_hex(content)[:ASSET_HASH_LENGTH]}.{suffix}"
+
+
+def sw_path_list(outputs, docs_dir, minify=False):
+    paths = [f"./{path.relative_to(docs_dir).as_posix()}" for path in sorted(outputs)]
+    if minify or not paths:
+        return json.dumps(paths, separators=(",", ":"))
+    return json.dumps(paths, indent=2)
+
+
+def remove_stale_hashed_assets(directory, keep):
+    if not directory.is_dir():
+        return
+    for path in directory.iterdir():
+        if path.is_file() and HASHED_ASSET_RE.fullmatch(path.name) and path not in keep:
+            path.unlink()
+
+
+# A page split into the pieces a patch can copy: each line of the shell around
+# the inline payloads (keyed by its text and occurrence), each top-level value
+# of a payload, and each station entry. Pieces keep their separators, so runs
+# of unchanged pieces stay contiguous in both pages.
+def page_pieces(page):
+    text = page.decode("utf-8")
+    seen = Counter()
+
+    def shell(part):
+        lines = []
+        for line in part.splitlines(keepends=True):
+            seen[line] += 1
+            lines.append((("shell", line, seen[line]), line))
+        return lines
+
+    pieces = []
+    offset = 0
+    for match in PAGE_DATA_RE.finditer(text):
+        block = match.group(1)
+        pieces.extend(shell(text[offset:match.start(2)]))
+        pieces.extend(payload_pieces(block, json.loads(match.group(2))))
+        offset = match.end(2)
+    if not offset:
+        return [("page", page)]
+    pieces.extend(shell(text[offset:]))
+    pieces = [(key, piece.encode("utf-8")) for key, piece in pieces]
+    if b"".join(piece for _key, piece in pieces) != page:
+        return [("page", page)]
+    return pieces
+
+
+# Stations are a list in #app-data and keyed by station code in #station-data.
+def payload_pieces(block, payload):
+    pieces = []
+    for position, (key, value) in enumerate(sorted(payload.items())):
+        separator = f"{',' if position else '{'}{json.dumps(key)}:"
+        if key != "stations":
+            pieces.append(((block, "value", key), separator + dump_payload(value)))
+        elif isinstance(value, dict):
+            pieces.append(((block, "stations"), separator + "{"))
+            pieces.extend(
+                ((block, "station", code), f"{',' if index else ''}{json.dumps(code)}:{dump_payload(station)}")
+                for index, (code, station) in enumerate(sorted(value.items()))
+            )
+            pieces.append(((block, "stations-end"), "}"))
+        else:
+            pieces.append(((block, "stations"), separator + "["))
+            pieces.extend(
+                ((block, "station", station.get("station_code")), ("," if index else "") + dump_payload(station))
+                for index, station in enumerate(value)
+            )
+            pieces.append(((block, "stations-end"), "]"))
+    pieces.append(((block, "payload-end"), "}"))
+    return pieces
+
+
+# Byte ranges [start, end) to copy from the old page and literal strings that
+# together rebuild the new page.
+def page_patch_ops(old_page, new_page):
+    old_pieces = {}
+    offset = 0
+    for key, piece in page_pieces(old_page):
+        old_pieces[key] = (offset, piece)
+        offset += len(piece)
+    ops = []
+    for key, piece in page_pieces(new_page):
+        start, old_piece = old_pieces.get(key, (None, None))
+        if old_piece == piece:
+            if ops and isinstance(ops[-1], list) and ops[-1][1] == start:
+                ops[-1][1] += len(piece)
+            else:
+                ops.append([start, start + len(piece)])
+        elif ops and isinstance(ops[-1], str):
+            ops[-1] += piece.decode("utf-8")
+        else:
+            ops.append(piece.decode("utf-8"))
+    return ops
+
+
+def apply_page_patch(old_page, ops):
+    return b"".join(op.encode("utf-8") if isinstance(op, str) else old_page[op[0]:op[1]] for op in ops)
+
+
+def load_page_history(history_dir):
+    try:
+        versions = json.loads((history_dir / "versions.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    return [
+        version for version in versions
+        if isinstance(version, str) and (history_dir / f"{version}.html.gz").is_file()
+    ]
+
+
+def load_history_page(history_dir, version):
+    return gzip.decompress((history_dir / f"{version}.html.gz").read_bytes())
+
+
+# Newest first; the current page moves to the front.
+def record_page_history(page, cache_version, history_dir):
+    versions = [cache_version, *(version for version in load_page_history(history_dir) if version != cache_version)]
+    versions = versions[:PAGE_HISTORY_SIZE]
+    history_dir.mkdir(parents=True, exist_ok=True)
+    write_bytes_file(history_dir / f"{cache_version}.html.gz", gzip_bytes(page))
+    write_file(history_dir / "versions.json", json.dumps(versions, indent=2) + "\n")
+    for path in history_dir.glob("*.html.gz"):
+        if path.name.removesuffix(".html.gz") not in versions:
+            path.unlink()
 
-    DOCS_DIR.mkdir(parents=True, exist_ok=True)
-    ICONS_DIR.mkdir(parents=True, exist_ok=True)
 
-    html = HTML_TEMPLATE.replace("{{DATA_JSON}}", data_json)
-    html = html.replace("{{CACHE_VERSION}}", cache_version)
+def page_patches(page, cache_version, history_dir, patches_dir):
+    patches = {}
+    for version in load_page_history(history_dir):
+        if version == cache_version:
+            continue
+        patch = dump_payload({
+            "from": version,
+            "ops": page_patch_ops(load_history_page(history_dir, version), page),
+            "sha256": sha256_hex(page),
+            "to": cache_version,
+        }) + "\n"
+        if len(patch) <= len(page) * PATCH_MAX_RATIO:
+            patches[patches_dir / f"{version}.json"] = patch
+    return patches
+
+
+def source_hashes(input_files=INPUT_FILES):
+    hashes = {}
+    for label, path in sorted(input_files.items()):
+        if path.exists():
+            hashes[path.name] = sha256_hex(path.read_bytes())
+    templates = {
+        "HTML_TEMPLATE": HTML_TEMPLATE,
+        "SEARCH_SCRIPT": SEARCH_SCRIPT,
+        "SEARCH_WORKER_TEMPLATE": SEARCH_WORKER_TEMPLATE,
+        "SW_TEMPLATE": SW_TEMPLATE,
+        "MANIFEST_TEMPLATE": MANIFEST_TEMPLATE,
+        "SOCIAL_PREVIEW": SOCIAL_PREVIEW,
+        "ICON_192": ICON_192,
+        "ICON_512": ICON_512,
+    }
+    for name, template in templates.items():
+        hashes[name] = sha256_hex(template.encode("utf-8"))
+    # Build logic changes can alter output without touching a template.
+    hashes["build_site.py"] = sha256_hex(Path(__file__).read_bytes())
+    return hashes
+
 
-    script_pattern = re.compile(
-        r'(<script id="app-data" type="application/json">.*?</script>)\s*<script>(.*?)</script>',
-        re.S,
+def load_build_manifest(manifest_path=BUILD_MANIFEST_PATH):
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != BUILD_MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def outputs_match_manifest(manifest):
+    outputs = manifest.get("outputs")
+    if not isinstance(outputs, dict) or not outputs:
+        return False
+    for rel_path, digest in outputs.items():
+        path = BASE_DIR / rel_path
+        if not path.exists() or sha256_hex(path.read_bytes()) != digest:
+            return False
+    return True
+
+
+def write_build_manifest(inputs, options, output_paths, cache_version, manifest_path=BUILD_MANIFEST_PATH):
+    manifest = {
+        "version": BUILD_MANIFEST_VERSION,
+        "cache_version": cache_version,
+        "inputs": inputs,
+        "options": options,
+        "outputs": {
+            path.relative_to(BASE_DIR).as_posix(): sha256_hex(path.read_bytes())
+            for path in sorted(output_paths)
+        },
+    }
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    write_file(manifest_path, json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+
+def build_site(
+    incremental=False,
+    shard=False,
+    profiler=None,
+    input_files=INPUT_FILES,
+    docs_dir=DOCS_DIR,
+    manifest_path=BUILD_MANIFEST_PATH,
+    edition=None,
+    station_cache=None,
+    verbose=True,
+    binary=False,
+    sources=None,
+    parse_cache=None,
+    minify=False,
+    history_dir=PAGE_HISTORY_DIR,
+    record_history=False,
+):
+    if shard and binary:
+        fail("--shard and --binary cannot be combined.")
+    profiler = profiler or BuildProfiler()
+    icons_dir = docs_dir / "icons"
+    shards_dir = docs_dir / "data"
+    ensure_inputs_exist(input_files)
+    inputs = source_hashes(input_files)
+    options = {"shard": shard, "binary": binary, "minify": minify, "edition": edition}
+    if incremental:
+        manifest = load_build_manifest(manifest_path)
+        if (
+            manifest
+            and manifest.get("inputs") == inputs
+            and manifest.get("options") == options
+            and outputs_match_manifest(manifest)
+        ):
+            if verbose:
+                print("Build inputs unchanged; skipping build.")
+            return None
+
+    profiler.start()
+    data, data_json = build_data(
+        profiler,
+        input_files=input_files,
+        station_cache=station_cache,
+        require_all_codes=edition is None,
+        sources=sources,
+        parse_cache=parse_cache,
     )
-    match = script_pattern.search(html)
-    if not match:
-        fail("Failed to extract app script from HTML template.")
-    app_js = match.group(2).strip() + "\n"
-    html = script_pattern.sub(r'\1\n  <script src="./app.js"></script>', html, count=1)
+    parse_cache = sources.parse_cache if sources else parse_cache
+    if verbose and parse_cache is not None:
+        print(parse_cache.summary())
+    cache_prefix = DEFAULT_CACHE_PREFIX
+    if edition is not None:
+        data["meta"].update(edition)
+        data_json = dump_payload(data)
+        cache_prefix = f"metro-edition-{edition['edition']}-"
+    if verbose:
+        with profiler.phase("payload size report"):
+            report_payload_size(data, data_json)
+
+    index_data = data
+    shard_outputs = {}
+    if shard:
+        index_data, shards = shard_data(data)
+        for station in index_data["stations"]:
+            content = dump_payload(shards[station["station_code"]]) + "\n"
+            station["shard"] = hashed_asset_name(f"{station['station_code']}.json", content)
+            shard_outputs[shards_dir / station["shard"]] = content
+        shard_bytes = sum(len(content.encode("ascii")) for content in shard_outputs.values())
+        if verbose:
+            print(f"Sharded: {len(shard_outputs)} station shards totalling {shard_bytes:,} bytes.")
+
+    binary_outputs = {}
+    if binary:
+        with profiler.phase("binary table encoding"):
+            index_data, blob = encode_binary_tables(data)
+            if decode_binary_tables(index_data, blob) != data:
+                fail("Binary tables do not round-trip to the JSON payload.")
+        binary_path = docs_dir / index_data["meta"]["binary"]["path"]
+        binary_outputs = {binary_path: blob}
+        if verbose:
+            print(f"Binary: {len(blob):,} byte {binary_path.name}.")
+
+    index_data, station_data = split_station_data(index_data, details=not (shard or binary))
+    data_json = dump_payload(index_data)
+    station_json = dump_payload(station_data)
+    if verbose:
+        print(
+            f"Inline: {len(data_json.encode('ascii')):,} byte app-data index, "
+            f"{len(station_json.encode('ascii')):,} byte station-data for the search worker."
+        )
+
+    cache_seed = data_json + station_json + "".join(shard_outputs.values())
+    cache_seed += "".join(hashlib.sha1(blob).hexdigest() for blob in binary_outputs.values())
+    cache_seed += HTML_TEMPLATE + SEARCH_SCRIPT + SEARCH_WORKER_TEMPLATE + SW_TEMPLATE + MANIFEST_TEMPLATE + SOCIAL_PREVIEW
+    if minify:
+        cache_seed += "minify"
+    cache_version = hashlib.sha1(cache_seed.encode("ascii")).hexdigest()[:10]
 
-    write_file(DOCS_DIR / "index.html", html)
-    write_file(DOCS_DIR / "app.js", app_js)
+    docs_dir.mkdir(parents=True, exist_ok=True)
+    icons_dir.mkdir(parents=True, exist_ok=True)
+    if shard or binary:
+        shards_dir.mkdir(parents=True, exist_ok=True)
+
+    with profiler.phase("template substitution"):
+        html = HTML_TEMPLATE.replace("{{SEARCH_SCRIPT}}", textwrap.indent(SEARCH_SCRIPT, "    "))
+        html = html.replace("{{DATA_JSON}}", data_json)
+        html = html.replace("{{STATION_DATA_JSON}}", station_json)
+        html = html.replace("{{CACHE_VERSION}}", cache_version)
+        search_worker_js = SEARCH_WORKER_TEMPLATE.replace("{{SEARCH_SCRIPT}}", SEARCH_SCRIPT)
+
+    with profiler.phase("app script extraction"):
+        script_pattern = re.compile(
+            r'(<script id="station-data" type="application/json">.*?</script>)\s*<script>(.*?)</script>',
+            re.S,
+        )
+        match = script_pattern.search(html)
+        if not match:
+            fail("Failed to extract app script from HTML template.")
+        app_js = match.group(2).strip() + "\n"
+        html = script_pattern.sub(r'\1\n  <script src="./{{APP_SCRIPT_PATH}}"></script>', html, count=1)
 
     sw_js = SW_TEMPLATE.replace("{{CACHE_VERSION}}", cache_version)
-    write_file(DOCS_DIR / "sw.js", sw_js)
-
-    write_file(DOCS_DIR / "manifest.webmanifest", MANIFEST_TEMPLATE)
-    write_file(DOCS_DIR / "social-preview.svg", SOCIAL_PREVIEW)
-    write_file(ICONS_DIR / "icon-192.svg", ICON_192)
-    write_file(ICONS_DIR / "icon-512.svg", ICON_512)
+    sw_js = sw_js.replace("{{CACHE_PREFIX}}", cache_prefix)
+
+    if minify:
+        with profiler.phase("minify"):
+            minified = {
+                "index.html": minify_html(html),
+                "app.js": minify_js(app_js),
+                "search-worker.js": minify_js(search_worker_js),
+                "sw.js": minify_js(sw_js),
+            }
+        if verbose:
+            report_minification([
+                (name, len(original.encode("utf-8")), len(minified[name].encode("utf-8")))
+                for name, original in (
+                    ("index.html", html),
+                    ("app.js", app_js),
+                    ("search-worker.js", search_worker_js),
+                    ("sw.js", sw_js),
+                )
+            ])
+        html, app_js, sw_js = minified["index.html"], minified["app.js"], minified["sw.js"]
+        search_worker_js = minified["search-worker.js"]
+
+    # Everything but the page, the service worker, and the social preview
+    # (linked by absolute URL) is served under a content-hashed name.
+    with profiler.phase("asset hashing"):
+        icon_192_name = hashed_asset_name("icon-192.svg", ICON_192)
+        icon_512_name = hashed_asset_name("icon-512.svg", ICON_512)
+        manifest = MANIFEST_TEMPLATE.replace("{{ICON_192_PATH}}", icon_192_name)
+        manifest = manifest.replace("{{ICON_512_PATH}}", icon_512_name)
+        search_worker_name = hashed_asset_name("search-worker.js", search_worker_js)
+        app_js = app_js.replace("{{SEARCH_WORKER_PATH}}", search_worker_name)
+        app_js_name = hashed_asset_name("app.js", app_js)
+        manifest_name = hashed_asset_name("manifest.webmanifest", manifest)
+        html = html.replace("{{APP_SCRIPT_PATH}}", app_js_name)
+        html = html.replace("{{MANIFEST_PATH}}", manifest_name)
+        hashed_outputs = {
+            docs_dir / app_js_name: app_js,
+            docs_dir / search_worker_name: search_worker_js,
+            docs_dir / manifest_name: manifest,
+            icons_dir / icon_192_name: ICON_192,
+            icons_dir / icon_512_name: ICON_512,
+        }
+        sw_js = sw_js.replace("{{ASSETS}}", sw_path_list(hashed_outputs, docs_dir, minify))
+        sw_js = sw_js.replace("{{DATA_FILES}}", sw_path_list({**shard_outputs, **binary_outputs}, docs_dir, minify))
+
+    with profiler.phase("station hashes"):
+        station_hashes = station_hashes_manifest(data, cache_version)
+
+    page = html.encode("utf-8")
+    patches_dir = docs_dir / PATCHES_DIR_NAME
+    patch_outputs = {}
+    if history_dir is not None:
+        with profiler.phase("page patches"):
+            patch_outputs = page_patches(page, cache_version, history_dir, patches_dir)
+        if verbose and patch_outputs:
+            sizes = ", ".join(f"{len(patch):,}" for patch in patch_outputs.values())
+            print(f"Patches from {len(patch_outputs)} earlier pages: {sizes} bytes (page {len(page):,} bytes).")
+    sw_js = sw_js.replace("{{PATCHES}}", json.dumps(sorted(path.stem for path in patch_outputs)))
+
+    outputs = {
+        docs_dir / "index.html": html,
+        docs_dir / "sw.js": sw_js,
+        docs_dir / "social-preview.svg": SOCIAL_PREVIEW,
+        docs_dir / STATION_HASHES_NAME: station_hashes,
+        **hashed_outputs,
+        **shard_outputs,
+        **binary_outputs,
+        **patch_outputs,
+    }
+    if patch_outputs:
+        patches_dir.mkdir(parents=True, exist_ok=True)
+    with profiler.phase("write outputs"):
+        changed = [
+            path
+            for path, content in outputs.items()
+            if (write_bytes_file if isinstance(content, bytes) else write_file)(path, content)
+        ]
 
+    with profiler.phase("compress outputs"):
+        siblings, compression_rows = compressed_siblings(outputs, docs_dir)
+        for path, content in siblings.items():
+            write_bytes_file(path, content)
+    if brotli is None:
+        remove_stale_brotli(outputs)
+    for generated_dir in [patches_dir, *([shards_dir] if shard or binary else [])]:
+        if not generated_dir.is_dir():
+            continue
+        for stale in generated_dir.iterdir():
+            if stale.is_file() and stale not in outputs and stale not in siblings:
+                stale.unlink()
+    for directory in (docs_dir, icons_dir):
+        remove_stale_hashed_assets(directory, {*outputs, *siblings})
+    if verbose:
+        report_compression(compression_rows)
+        if incremental:
+            print(f"Wrote {len(changed)} of {len(outputs)} output files.")
+
+    if history_dir is not None and record_history:
+        record_page_history(page, cache_version, history_dir)
+    write_build_manifest(inputs, options, [*outputs, *siblings], cache_version, manifest_path)
+    profiler.stop()
     return data
 
 
+# Injected into HTML served by the --watch preview only, never written to docs/.
+LIVERELOAD_SNIPPET = f"""  <script>
+    new EventSource("{LIVERELOAD_PATH}").onmessage = () => window.location.reload();
+  </script>
+"""
+
+# The preview replaces the app's caching service worker with one that
+# clears old caches and leaves every request to the network, so a reload
+# always shows the latest build.
+PREVIEW_SW = """self.addEventListener("install", () => self.skipWaiting());
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then((keys) => Promise.all(keys.map((key) => caches.delete(key))))
+      .then(() => self.clients.claim())
+  );
+});
+"""
+
+
+class PreviewServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, docs_dir):
+        super().__init__(address, partial(PreviewRequestHandler, directory=str(docs_dir)))
+        self.generation = 0
+        self.changed = threading.Condition()
+
+    def notify_reload(self):
+        with self.changed:
+            self.generation += 1
+            self.changed.notify_all()
+
+
+class PreviewRequestHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == LIVERELOAD_PATH:
+            self.stream_reloads()
+            return
+        if path.endswith("/sw.js"):
+            self.send_text(PREVIEW_SW, "text/javascript; charset=utf-8")
+            return
+        file_path = Path(self.translate_path(path))
+        if file_path.is_dir():
+            file_path = file_path / "index.html"
+        if path.endswith(("/", ".html")) and file_path.is_file():
+            html = file_path.read_text(encoding="utf-8")
+            html = html.replace("</body>", f"{LIVERELOAD_SNIPPET}</body>", 1)
+            self.send_text(html, "text/html; charset=utf-8")
+            return
+        super().do_GET()
+
+    def send_text(self, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reloads(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        server = self.server
+        seen = server.generation
+        try:
+            while True:
+                with server.changed:
+                    server.changed.wait_for(lambda: server.generation != seen, LIVERELOAD_KEEPALIVE)
+                    current = server.generation
+                if current == seen:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    seen = current
+                    self.wfile.write(f"data: {current}\n\n".encode("ascii"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def end_headers(self):
+        self.send_header("Cache-Control", "no-store")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def watched_mtimes(input_files=INPUT_FILES):
+    paths = [*input_files.values(), Path(__file__).resolve()]
+    return {path: path.stat().st_mtime_ns if path.exists() else None for path in paths}
+
+
+def watch(port=PREVIEW_PORT, shard=False, binary=False, minify=False):
+    server = PreviewServer(("127.0.0.1", port), DOCS_DIR)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving docs/ with live reload at http://127.0.0.1:{port}/ (Ctrl+C to stop).")
+
+    # Station entries persist across rebuilds, so an edit only recomputes the
+    # stations whose rows, exits, or door table changed. Intermediate pages
+    # stay out of the page history.
+    station_store = {}
+    parse_cache = ParseCache()
+    template_path = Path(__file__).resolve()
+    snapshot = None
+    try:
+        while True:
+            current = watched_mtimes()
+            if current != snapshot:
+                if snapshot is not None and current[template_path] != snapshot[template_path]:
+                    print("build_site.py changed; restarting watch.")
+                    server.server_close()
+                    os.execv(sys.executable, [sys.executable, *sys.argv])
+                snapshot = current
+                station_cache = StationCache(station_store)
+                started = time.perf_counter()
+                try:
+                    data = build_site(
+                        shard=shard,
+                        binary=binary,
+                        minify=minify,
+                        station_cache=station_cache,
+                        verbose=False,
+                        parse_cache=parse_cache,
+                    )
+                except SystemExit:
+                    print("Build failed; waiting for the next change.")
+                else:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    print(
+                        f"Rebuilt in {elapsed_ms:.0f} ms: {station_cache.misses} of "
+                        f"{len(data['stations'])} stations recomputed."
+                    )
+                    server.notify_reload()
+                parse_cache.hits.clear()
+                parse_cache.misses.clear()
+                parse_cache.file_hashes.clear()
+            time.sleep(WATCH_INTERVAL)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+# Editions without their own Routes.csv use the main one; an edition whose
+# stations it does not cover ships no routes.
+def edition_input_files(edition_dir):
+    input_files = {key: Path(edition_dir) / path.name for key, path in INPUT_FILES.items()}
+    if not input_files["routes"].exists():
+        input_files["routes"] = INPUT_FILES["routes"]
+    return input_files
+
+
+def build_edition(edition_dir, editions, incremental, shard, binary, minify, station_store):
+    name = Path(edition_dir).name
+    manifest_path = CACHE_DIR / f"build-manifest-{name}.json"
+    station_cache = StationCache(station_store)
+    data = build_site(
+        incremental=incremental,
+        shard=shard,
+        binary=binary,
+        minify=minify,
+        input_files=edition_input_files(edition_dir),
+        docs_dir=EDITIONS_DIR / name,
+        manifest_path=manifest_path,
+        edition={"edition": name, "editions": editions},
+        station_cache=station_cache,
+        verbose=False,
+        parse_cache=ParseCache(),
+        history_dir=None,
+    )
+    manifest = load_build_manifest(manifest_path) or {}
+    return {
+        "name": name,
+        "cache_version": manifest.get("cache_version"),
+        "station_count": len(data["stations"]) if data else None,
+        "shared_stations": station_cache.hits,
+        "built_stations": station_cache.misses,
+    }
+
+
+# Station fingerprints for an edition, and the entries built for `build_keys`.
+def edition_station_entries(edition_dir, build_keys):
+    station_cache = StationCache(build_keys=build_keys)
+    build_data(
+        input_files=edition_input_files(edition_dir),
+        station_cache=station_cache,
+        require_all_codes=False,
+        parse_cache=ParseCache(),
+    )
+    return station_cache.keys, station_cache.store
+
+
+def write_editions_index(summaries):
+    entries = [
+        {"name": item["name"], "path": f"./{item['name']}/", "cache_version": item["cache_version"]}
+        for item in summaries
+    ]
+    links = "\n".join(
+        f'      <li><a href="{entry["path"]}">{entry["name"]}</a></li>' for entry in entries
+    )
+    index_html = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <title>DC Metro Exit Guide data editions</title>
+</head>
+<body>
+  <main>
+    <h1>Data editions</h1>
+    <ul>
+{links}
+    </ul>
+  </main>
+</body>
+</html>
+"""
+    outputs = {
+        EDITIONS_DIR / "editions.json": json.dumps(entries, indent=2) + "\n",
+        EDITIONS_DIR / "index.html": index_html,
+    }
+    for path, content in outputs.items():
+        write_file(path, content)
+    for path, content in compressed_siblings(outputs, EDITIONS_DIR)[0].items():
+        write_bytes_file(path, content)
+
+
+def build_editions(edition_dirs, jobs=None, incremental=False, shard=False, binary=False, minify=False):
+    names = [Path(edition_dir).name for edition_dir in edition_dirs]
+    for edition_dir, name in zip(edition_dirs, names):
+        if not EDITION_NAME_RE.fullmatch(name):
+            fail(f"Edition directory name is not a safe path segment: {edition_dir}")
+        ensure_inputs_exist(edition_input_files(edition_dir))
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        fail(f"Duplicate edition names: {', '.join(duplicates)}")
+
+    # Newest edition first in the app's switcher.
+    editions = [{"name": name, "path": f"../{name}/"} for name in sorted(names, reverse=True)]
+    EDITIONS_DIR.mkdir(parents=True, exist_ok=True)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(edition_dirs)))
+    if jobs == 1:
+        station_store = {}
+        summaries = [
+            build_edition(edition_dir, editions, incremental, shard, binary, minify, station_store)
+            for edition_dir in edition_dirs
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # Each distinct station is built once, by the first edition that
+            # has it, and every edition then builds from a plain dict of those
+            # entries, so workers neither race on nor round-trip to a shared store.
+            fingerprints = list(pool.map(edition_station_entries, edition_dirs, repeat(frozenset())))
+            seen = set()
+            owned = []
+            for keys, _ in fingerprints:
+                owned.append({key for key in keys if key not in seen})
+                seen.update(keys)
+            station_store = {}
+            builders = [(edition_dir, keys) for edition_dir, keys in zip(edition_dirs, owned) if keys]
+            for _, entries in pool.map(edition_station_entries, *zip(*builders)):
+                station_store.update(entries)
+            summaries = list(pool.map(
+                build_edition,
+                edition_dirs,
+                repeat(editions),
+                repeat(incremental),
+                repeat(shard),
+                repeat(binary),
+                repeat(minify),
+                repeat(station_store),
+            ))
+        for summary, keys in zip(summaries, owned):
+            if summary["station_count"] is not None:
+                summary["built_stations"] = len(keys)
+                summary["shared_stations"] = summary["station_count"] - len(keys)
+
+    summaries.sort(key=lambda item: item["name"], reverse=True)
+    write_editions_index(summaries)
+    for item in summaries:
+        if item["station_count"] is None:
+            print(f"Edition {item['name']}: unchanged (cache {item['cache_version']}).")
+            continue
+        print(
+            f"Edition {item['name']}: {item['station_count']} stations, "
+            f"{item['shared_stations']} reused from another edition, "
+            f"cache {item['cache_version']}."
+        )
+    return summaries
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site into docs/.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="skip the build when source CSV and template hashes match the last build manifest",
+    )
+    parser.add_argument(
+        "--shard",
+        action="store_true",
+        help="write per-station data to docs/data/<station_code>.json and inline only a station index",
+    )
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="write door, egress, and transfer tables to docs/data/tables.<hash>.bin as packed little-endian arrays",
+    )
+    parser.add_argument(
+        "--editions",
+        nargs="+",
+        metavar="DIR",
+        help="build each edition directory of source CSVs into docs/editions/<DIR name>/",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="worker processes for --editions (default: CPU count)",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="strip indentation, comments, and collapsible whitespace from index.html, app.js, and sw.js",
+    )
+    parser.add_argument(
+        "--record-history",
+        action="store_true",
+        help="record this build's page in page-history/ so later builds ship patches from it (release builds only)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="rebuild when the source CSVs or templates change and serve docs/ with live reload",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=PREVIEW_PORT,
+        help="preview server port for --watch (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-parse-cache",
+        dest="parse_cache",
+        action="store_false",
+        help="parse every source CSV instead of reusing parsed objects from .cache/parse/",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=is_true(os.environ.get("DCMETRO_BUILD_PROFILE", "")),
+        help="print wall time and peak tracemalloc memory per build phase (or set DCMETRO_BUILD_PROFILE=1)",
+    )
+    parser.add_argument(
+        "--profile-json",
+        metavar="PATH",
+        default=os.environ.get("DCMETRO_BUILD_PROFILE_JSON"),
+        help="also write the phase profile as JSON (or set DCMETRO_BUILD_PROFILE_JSON)",
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    build_site()
+    args = parse_args()
+    if args.watch:
+        watch(args.port, shard=args.shard, binary=args.binary, minify=args.minify)
+        raise SystemExit(0)
+    if args.editions:
+        build_editions(
+            args.editions,
+            args.jobs,
+            incremental=args.incremental,
+            shard=args.shard,
+            binary=args.binary,
+            minify=args.minify,
+        )
+        raise SystemExit(0)
+    profiler = BuildProfiler(enabled=args.profile or bool(args.profile_json))
+    build_site(
+        incremental=args.incremental,
+        shard=args.shard,
+        profiler=profiler,
+        binary=args.binary,
+        minify=args.minify,
+        parse_cache=ParseCache() if args.parse_cache else None,
+        record_history=args.record_history,
+    )
+    if profiler.phases:
+        profiler.report()
+        if args.profile_json:
+            profiler.write_json(args.profile_json, source_hashes())
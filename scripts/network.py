@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+import re
+import struct
+import sys
+from functools import cached_property, lru_cache
+
+from build_site import (
+    APP_DATA_RE,
+    ASSET_HASH_LENGTH,
+    DOCS_DIR,
+    STATION_DATA_RE,
+    INPUT_FILES,
+    ParseCache,
+    build_data,
+    build_site,
+    decode_binary_tables,
+    ensure_inputs_exist,
+    fail,
+    iter_typed_rows,
+    load_doors,
+    load_exit_map,
+    load_line_routes,
+    load_meta,
+    load_station_lookup,
+    load_station_rows,
+    normalize_search_text,
+    normalize_station_reference,
+    sha256_hex,
+    station_content_hashes,
+    station_search_aliases,
+)
+
+CACHE_VERSION_RE = re.compile(r'CACHE_VERSION = "([0-9a-f]+)"')
+RESULT_GROUPS = (
+    ("transfers", "Transfers"),
+    ("escalator", "Escalators"),
+    ("stairs", "Stairs"),
+    ("elevator", "Elevators"),
+    ("other", "Other"),
+)
+QUERY_CACHE_SIZE = 65536
+SOURCE_LABELS = {
+    "Doors": "doors",
+    "Stations": "stations",
+    "Exits": "exits",
+    "Egresses": "egresses",
+}
+
+
+# The source CSVs and the built payload, each read and parsed at most once.
+# The build, validate_build.py, and validate_domain.py all take one of these,
+# so `check` runs all three against a single in-memory copy. Parsed doors,
+# stations, and exits also come from the on-disk parse cache when unchanged.
+class Network:
+    def __init__(self, input_files=INPUT_FILES, docs_dir=DOCS_DIR, parse_cache=None):
+        self.input_files = input_files
+        self.docs_dir = docs_dir
+        self.parse_cache = parse_cache
+
+    @cached_property
+    def meta(self):
+        ensure_inputs_exist(self.input_files)
+        return load_meta(self.input_files["meta"])
+
+    @cached_property
+    def headers(self):
+        ensure_inputs_exist(self.input_files)
+        headers = {}
+        for label, key in SOURCE_LABELS.items():
+            with self.input_files[key].open(newline="") as handle:
+                headers[label] = next(csv.reader(handle), [])
+        return headers
+
+    @cached_property
+    def station_rows(self):
+        ensure_inputs_exist(self.input_files)
+        return load_station_rows(self.input_files, self.parse_cache)
+
+    @cached_property
+    def doors(self):
+        return load_doors(self.input_files, self.meta, self.parse_cache)
+
+    @cached_property
+    def station_lookup(self):
+        return load_station_lookup(self.input_files, self.station_rows, self.parse_cache)
+
+    @cached_property
+    def exit_map(self):
+        return load_exit_map(self.input_files, self.meta, self.station_lookup, self.parse_cache)
+
+    # A fresh stream on every access, so each pass reads Egresses.csv row by
+    # row instead of holding the whole file.
+    @property
+    def egress_rows(self):
+        return iter_typed_rows(self.input_files["egresses"], "Egresses", self.meta, self.station_lookup)
+
+    @cached_property
+    def line_routes(self):
+        return load_line_routes(self.input_files, self.meta)
+
+    @cached_property
+    def app_data(self):
+        return load_app_data(self.docs_dir)
+
+    @cached_property
+    def cache_version(self):
+        return load_cache_version(self.docs_dir)
+
+    @cached_property
+    def station_hashes(self):
+        return station_content_hashes(self.app_data)
+
+    def build(self, **options):
+        data = build_site(input_files=self.input_files, docs_dir=self.docs_dir, sources=self, **options)
+        if data is not None:
+            self.app_data = data
+        self.__dict__.pop("cache_version", None)
+        self.__dict__.pop("station_hashes", None)
+        return data
+
+    # The payload rebuilt from the sources in memory, for long-running
+    # servers: nothing is written to docs/, and the cache version is a hash of
+    # the payload rather than of a written build.
+    def rebuild_payload(self, station_cache=None):
+        _data, data_json = build_data(sources=self, station_cache=station_cache)
+        # Read back from the JSON so keys are ordered as in the written payload.
+        self.app_data = json.loads(data_json)
+        self.cache_version = sha256_hex(data_json.encode("ascii"))[:ASSET_HASH_LENGTH]
+        self.__dict__.pop("station_hashes", None)
+        return self.app_data
+
+
+@lru_cache(maxsize=None)
+def load_network():
+    return Network(parse_cache=ParseCache())
+
+
+def load_app_data(docs_dir=DOCS_DIR):
+    html_path = docs_dir / "index.html"
+    if not html_path.exists():
+        fail("docs/index.html does not exist. Run scripts/build_site.py first.")
+    html = html_path.read_text(encoding="utf-8")
+    match = APP_DATA_RE.search(html)
+    if not match:
+        fail("docs/index.html missing embedded app-data JSON.")
+    station_match = STATION_DATA_RE.search(html)
+    if not station_match:
+        fail("docs/index.html missing embedded station-data JSON.")
+    data = merge_station_data(json.loads(match.group(1)), json.loads(station_match.group(1)))
+    return merge_binary_tables(merge_station_shards(data, docs_dir), docs_dir)
+
+
+def load_cache_version(docs_dir=DOCS_DIR):
+    sw_path = docs_dir / "sw.js"
+    match = CACHE_VERSION_RE.search(sw_path.read_text(encoding="utf-8")) if sw_path.exists() else None
+    if not match:
+        fail("docs/sw.js missing CACHE_VERSION. Run scripts/build_site.py first.")
+    return match.group(1)
+
+
+def merge_station_data(data, station_data):
+    data["search"] = station_data.get("search", {})
+    details = station_data.get("stations", {})
+    for station in data.get("stations", []):
+        station.update(details.get(station.get("station_code"), {}))
+    return data
+
+
+def merge_station_shards(data, docs_dir=DOCS_DIR):
+    shard_path = data.get("meta", {}).get("shard_path")
+    if not shard_path:
+        return data
+    for station in data.get("stations", []):
+        path = docs_dir / shard_path / station.pop("shard", "")
+        if not path.exists():
+            fail(f"Missing station shard for {station.get('name')}: {path}")
+        station.update(json.loads(path.read_text(encoding="utf-8")))
+    return data
+
+
+def merge_binary_tables(data, docs_dir=DOCS_DIR):
+    binary = data.get("meta", {}).get("binary")
+    if not binary:
+        return data
+    path = docs_dir / binary.get("path", "")
+    if not path.is_file():
+        fail(f"Missing binary station tables: {path}")
+    try:
+        return decode_binary_tables(data, path.read_bytes())
+    except (ValueError, struct.error) as error:
+        fail(f"Invalid binary station tables {path}: {error}")
+
+
+class QueryError(ValueError):
+    pass
+
+
+# Numbers as app.js interpolates them into text (1.0 -> "1").
+def js_number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+# Door recommendations for callers outside the browser, with the same text as
+# buildCopyPayload() in app.js. Stations resolve through the Stations.csv
+# reference lookup (name or alternate name) or a station code; line and
+# direction match the way the app reads ?line= and ?direction=, defaulting to
+# the first of each when omitted. Answers are kept per resolved station, line,
+# and direction, and raw requests are memoized on top of that.
+class Recommender:
+    def __init__(self, network):
+        self.data = network.app_data
+        self.station_lookup = network.station_lookup
+        self.stations = {station["name"]: station for station in self.data["stations"]}
+        self.station_codes = {station["station_code"]: station["name"] for station in self.data["stations"]}
+        self.doors = {door["door_index"]: door for door in self.data["meta"]["doors"]}
+        # Normalized name, code, base name, alt name, and subtitle -> {station
+        # name: best score}, as SEARCH.aliases in the app.
+        self.aliases = {}
+        for station in self.data["stations"]:
+            for value, score in station_search_aliases(station):
+                alias = normalize_search_text(value)
+                if alias:
+                    hits = self.aliases.setdefault(alias, {})
+                    hits[station["name"]] = max(score, hits.get(station["name"], 0))
+        self.answers = {}
+        self.answer_json = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._answer_json)
+
+    def resolve_station(self, value, line=None):
+        key = normalize_station_reference(str(value or ""))
+        if not key:
+            raise QueryError("Missing station.")
+        name = self.station_lookup.get(key)
+        if name is None:
+            name = self.station_codes.get(key.upper())
+        if isinstance(name, str):
+            return self.stations[name]
+        # Case-insensitive aliases, including a split-level station's base
+        # name, preferring stations on the requested line (findStationByParam).
+        hits = self.aliases.get(normalize_search_text(key), {})
+        candidates = [(self.stations[hit], score) for hit, score in hits.items()]
+        if not candidates:
+            if name is None:
+                raise QueryError(f"Unknown station: {key}")
+            raise QueryError(f"Ambiguous station: {key}")
+        on_line = [entry for entry in candidates if self.serves_line(entry[0], line)]
+        candidates = on_line or candidates
+        candidates.sort(key=lambda entry: (-entry[1], entry[0]["name"]))
+        return candidates[0][0]
+
+    def serves_line(self, station, value):
+        requested = normalize_search_text(value)
+        return bool(requested) and any(
+            requested in (normalize_search_text(code), normalize_search_text(self.data["lines"][code]["name"]))
+            for code in station["lines"]
+        )
+
+    def resolve_line(self, station, value):
+        requested = normalize_search_text(value)
+        if not requested:
+            return station["lines"][0]
+        for code in station["lines"]:
+            if requested in (normalize_search_text(code), normalize_search_text(self.data["lines"][code]["name"])):
+                return code
+        raise QueryError(f"{station['name']} is not on line: {value}")
+
+    def resolve_direction(self, station, value):
+        requested = normalize_search_text(value)
+        if not requested:
+            return station["directions"][0]["key"]
+        for direction in station["directions"]:
+            label = direction["label"]
+            if requested in (
+                normalize_search_text(direction["key"]),
+                normalize_search_text(label),
+                normalize_search_text(re.sub(r"^Toward\s+", "", label, flags=re.I)),
+            ):
+                return direction["key"]
+        raise QueryError(f"Unknown direction for {station['name']}: {value}")
+
+    def recommend(self, station, line=None, direction=None):
+        station = self.resolve_station(station, line)
+        key = (station["name"], self.resolve_line(station, line), self.resolve_direction(station, direction))
+        if key not in self.answers:
+            self.answers[key] = {
+                "station": key[0],
+                "line": key[1],
+                "direction": key[2],
+                "text": self.copy_payload(station, key[1], key[2]),
+            }
+        return self.answers[key]
+
+    def _answer_json(self, station, line, direction):
+        try:
+            return dump_answer(self.recommend(station, line, direction))
+        except QueryError as error:
+            return dump_answer({"error": str(error)})
+
+    def entries(self, station, direction_key, group_key):
+        if group_key == "transfers":
+            return station.get("transfers_by_dir", {}).get(direction_key, [])
+        return station["egress_by_dir"].get(direction_key, {}).get(group_key, [])
+
+    def copy_payload(self, station, line_code, direction_key):
+        direction_label = next(
+            (direction["label"] for direction in station["directions"] if direction["key"] == direction_key),
+            "",
+        )
+        lines = [
+            f"Station: {station['name']}",
+            f"Line: {self.data['lines'][line_code]['name']} Line",
+            f"Direction: {direction_label}",
+            "",
+        ]
+        for group_key, group_label in RESULT_GROUPS:
+            lines.append(f"{group_label}:")
+            entries = self.entries(station, direction_key, group_key)
+            if not entries:
+                lines.append("- None")
+            for position, entry in enumerate(entries):
+                doors = [self.doors[index] for index in entry["doors"]]
+                door_labels = " or ".join(f"Car {door['car_index']}, Door {door['door_in_car']}" for door in doors)
+                if len(doors) == 1:
+                    index_label = f"Door index {doors[0]['door_index']}"
+                else:
+                    index_label = f"Door index {doors[0]['door_index']}-{doors[-1]['door_index']}"
+                delta = f" (delta {js_number(entry['delta'])})" if entry.get("delta") is not None else ""
+                note = f"; {entry['note']}" if entry.get("note") else ""
+                label = entry.get("label") or f"Egress {position + 1}"
+                lines.append(f"- {label}: {door_labels}, {index_label}{delta}{note}")
+            lines.append("")
+        return "\n".join(lines)
+
+
+def dump_answer(answer):
+    return json.dumps(answer, ensure_ascii=False, separators=(",", ":"))
+
+
+# Reads one JSON request per line ({"station": ..., "line": ..., "direction":
+# ...}, plus an optional "id" echoed back) and writes one JSON answer per line,
+# in order. Bad requests get {"error": ...} rather than stopping the stream.
+def query(network, requests=sys.stdin, out=sys.stdout):
+    recommender = Recommender(network)
+    # Answers are flushed one by one only for a terminal; a piped batch is
+    # flushed once at the end.
+    interactive = getattr(requests, "isatty", lambda: False)()
+    for number, line in enumerate(requests, 1):
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise QueryError("Request is not a JSON object.")
+            answer = recommender.answer_json(
+                str(request.get("station") or ""),
+                str(request.get("line") or ""),
+                str(request.get("direction") or ""),
+            )
+        except ValueError as error:
+            request = {}
+            answer = dump_answer({"error": f"Line {number}: {error}"})
+        if "id" in request:
+            answer = f'{{"id":{dump_answer(request["id"])},{answer[1:]}'
+        out.write(answer + "\n")
+        if interactive:
+            out.flush()
+    out.flush()
+
+
+def check(shard=False, binary=False, record_history=False):
+    import validate_build
+    import validate_domain
+
+    network = load_network()
+    network.build(shard=shard, binary=binary, record_history=record_history)
+    validate_build.validate(network)
+    validate_domain.main(network)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Shared source and payload loader for the build scripts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check_parser = commands.add_parser(
+        "check",
+        help="build the site, then run validate_build.py and validate_domain.py on the same in-memory data",
+    )
+    modes = check_parser.add_mutually_exclusive_group()
+    modes.add_argument("--shard", action="store_true", help="build with --shard")
+    modes.add_argument("--binary", action="store_true", help="build with --binary")
+    check_parser.add_argument("--record-history", action="store_true", help="build with --record-history")
+    commands.add_parser(
+        "query",
+        help="answer JSONL door recommendation requests from stdin against the built docs/ payload",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "check":
+        check(shard=args.shard, binary=args.binary, record_history=args.record_history)
+    elif args.command == "query":
+        query(load_network())
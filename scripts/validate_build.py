@@ -1,24 +1,25 @@
 #!/usr/bin/env python3
-import csv
+import gzip
 import json
 import re
 import sys
 from pathlib import Path
-from collections import defaultdict
 
-from build_site import WMATA_STATION_CODES
+from build_site import (
+    ASSET_HASH_LENGTH,
+    PAGE_HISTORY_DIR,
+    PATCHES_DIR_NAME,
+    STATION_HASHES_NAME,
+    WMATA_STATION_CODES,
+    apply_page_patch,
+    load_history_page,
+    sha256_hex,
+)
+from network import load_network
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 DOCS_DIR = BASE_DIR / "docs"
 
-INPUT_FILES = {
-    "meta": BASE_DIR / "meta.csv",
-    "doors": BASE_DIR / "Doors.csv",
-    "stations": BASE_DIR / "Stations.csv",
-    "exits": BASE_DIR / "Exits.csv",
-    "egresses": BASE_DIR / "Egresses.csv",
-}
-
 REQUIRED_COLUMNS = {
     "Doors": ["Car", "x"],
     "Stations": [
@@ -51,6 +52,10 @@ REQUIRED_COLUMNS = {
 }
 
 STATION_CODE_PATTERN = re.compile(r"^[A-Z][0-9]{2}$")
+APP_SCRIPT_PATTERN = re.compile(r'<script src="\./([^"]+)"></script>')
+SEARCH_WORKER_PATTERN = re.compile(r'new Worker\("\./([^"]+)"\)')
+MANIFEST_LINK_PATTERN = re.compile(r'<link rel="manifest" href="\./([^"]+)">')
+SW_LIST_PATTERN = re.compile(r"const (ASSETS|DATA_FILES|PATCHES) = (\[.*?\]);", re.S)
 
 
 def fail(message):
@@ -58,27 +63,6 @@ def fail(message):
     raise SystemExit(1)
 
 
-def read_meta(path):
-    meta = defaultdict(set)
-    with path.open(newline="") as handle:
-        reader = csv.DictReader(handle)
-        for row in reader:
-            file_key = row.get("File", "").strip()
-            var = row.get("Variable", "").strip()
-            if file_key and var:
-                for part in file_key.split(","):
-                    key = part.strip()
-                    if key:
-                        meta[key].add(var)
-    return meta
-
-
-def ensure_inputs_exist():
-    for label, path in INPUT_FILES.items():
-        if not path.exists():
-            fail(f"Missing required input file: {path}")
-
-
 def ensure_columns(meta, file_label, headers, required):
     missing = [col for col in required if col not in headers]
     if missing:
@@ -89,56 +73,89 @@ def ensure_columns(meta, file_label, headers, required):
         fail(f"meta.csv missing variables for {file_label}: {', '.join(meta_missing)}")
 
 
-def load_headers(path):
-    with path.open(newline="") as handle:
-        reader = csv.reader(handle)
-        return next(reader, [])
-
-
-def load_station_names(path):
-    with path.open(newline="") as handle:
-        reader = csv.DictReader(handle)
-        return [row.get("nameStd", "").strip() for row in reader if row.get("nameStd")]
-
-
-def load_embedded_data(path):
-    html = path.read_text(encoding="utf-8")
-    match = re.search(r"<script id=\"app-data\" type=\"application/json\">(.*?)</script>", html, re.S)
-    if not match:
-        fail("docs/index.html missing embedded app-data JSON")
-    return json.loads(match.group(1))
-
-
-def validate():
-    ensure_inputs_exist()
-
-    meta = read_meta(INPUT_FILES["meta"])
-    for key, file_path in {
-        "Doors": INPUT_FILES["doors"],
-        "Stations": INPUT_FILES["stations"],
-        "Exits": INPUT_FILES["exits"],
-        "Egresses": INPUT_FILES["egresses"],
-    }.items():
-        headers = load_headers(file_path)
-        ensure_columns(meta, key, headers, REQUIRED_COLUMNS[key])
+def load_sw_lists():
+    sw_path = DOCS_DIR / "sw.js"
+    if not sw_path.exists():
+        fail("docs/sw.js does not exist. Run scripts/build_site.py first.")
+    lists = {name: json.loads(value) for name, value in SW_LIST_PATTERN.findall(sw_path.read_text(encoding="utf-8"))}
+    if set(lists) != {"ASSETS", "DATA_FILES", "PATCHES"}:
+        fail("docs/sw.js is missing its ASSETS, DATA_FILES, or PATCHES list.")
+    return lists
+
+
+# Every file the service worker caches is named for its content, and the page
+# only loads assets the worker precaches.
+def validate_hashed_assets(html, app_js, lists):
+    for asset in lists["ASSETS"] + lists["DATA_FILES"]:
+        path = DOCS_DIR / asset
+        if not path.is_file():
+            fail(f"docs/sw.js lists a missing file: {asset}")
+        parts = path.name.split(".")
+        if len(parts) < 3 or parts[-2] != sha256_hex(path.read_bytes())[:ASSET_HASH_LENGTH]:
+            fail(f"{asset} is not named for its content hash. Run scripts/build_site.py.")
+    manifest = MANIFEST_LINK_PATTERN.search(html)
+    for match in (APP_SCRIPT_PATTERN.search(html), SEARCH_WORKER_PATTERN.search(app_js), manifest):
+        if match is None or f"./{match.group(1)}" not in lists["ASSETS"]:
+            fail("docs/index.html loads an asset docs/sw.js does not precache.")
+
+
+# Each patch the worker may fetch rebuilds the current page from its recorded
+# earlier page.
+def validate_page_patches(page, versions):
+    patch_paths = sorted((DOCS_DIR / PATCHES_DIR_NAME).glob("*.json"))
+    if sorted(path.stem for path in patch_paths) != sorted(versions):
+        fail("docs/sw.js PATCHES does not match docs/patches/. Run scripts/build_site.py.")
+    for path in patch_paths:
+        patch = json.loads(path.read_text(encoding="utf-8"))
+        try:
+            old_page = load_history_page(PAGE_HISTORY_DIR, patch["from"])
+        except OSError:
+            fail(f"{path.relative_to(BASE_DIR)} patches from a page missing from page-history/.")
+        if apply_page_patch(old_page, patch["ops"]) != page or patch["sha256"] != sha256_hex(page):
+            fail(f"{path.relative_to(BASE_DIR)} does not rebuild docs/index.html. Run scripts/build_site.py.")
+
+
+def validate(network=None):
+    network = network or load_network()
+    for key, headers in network.headers.items():
+        ensure_columns(network.meta, key, headers, REQUIRED_COLUMNS[key])
 
     index_path = DOCS_DIR / "index.html"
     if not index_path.exists():
         fail("docs/index.html does not exist. Run scripts/build_site.py first.")
 
-    app_js_path = DOCS_DIR / "app.js"
+    html = index_path.read_text(encoding="utf-8")
+    script = APP_SCRIPT_PATTERN.search(html)
+    if not script:
+        fail("docs/index.html does not load an app script.")
+    app_js_path = DOCS_DIR / script.group(1)
     if not app_js_path.exists():
-        fail("docs/app.js does not exist. Run scripts/build_site.py first.")
-    if not app_js_path.read_text(encoding="utf-8").strip():
-        fail("docs/app.js is empty.")
-
-    data = load_embedded_data(index_path)
+        fail(f"docs/{script.group(1)} does not exist. Run scripts/build_site.py first.")
+    app_js = app_js_path.read_text(encoding="utf-8")
+    if not app_js.strip():
+        fail(f"docs/{script.group(1)} is empty.")
+    lists = load_sw_lists()
+    validate_hashed_assets(html, app_js, lists)
+    validate_page_patches(index_path.read_bytes(), lists["PATCHES"])
+
+    for path in sorted(DOCS_DIR.rglob("*.gz")):
+        source = path.with_suffix("")
+        if not source.exists():
+            fail(f"{path.relative_to(BASE_DIR)} has no uncompressed source file.")
+        if gzip.decompress(path.read_bytes()) != source.read_bytes():
+            fail(f"{path.relative_to(BASE_DIR)} is stale. Run scripts/build_site.py.")
+    for name in ("index.html", script.group(1), "sw.js"):
+        if not (DOCS_DIR / f"{name}.gz").exists():
+            fail(f"docs/{name}.gz does not exist. Run scripts/build_site.py first.")
+
+    data = network.app_data
     stations = data.get("stations", [])
     if not stations:
         fail("Embedded data has no stations.")
 
     names_in_data = {station.get("name") for station in stations}
-    sample_names = [name for name in load_station_names(INPUT_FILES["stations"]) if name][:3]
+    source_names = [(row.get("nameStd") or "").strip() for row in network.station_rows]
+    sample_names = [name for name in source_names if name][:3]
     if not sample_names:
         fail("Stations.csv has no station names.")
 
@@ -162,6 +179,13 @@ def validate():
                 f"expected {expected_code}, found {station_code}"
             )
 
+    hashes_path = DOCS_DIR / STATION_HASHES_NAME
+    if not hashes_path.exists():
+        fail(f"docs/{STATION_HASHES_NAME} does not exist. Run scripts/build_site.py first.")
+    hashes = json.loads(hashes_path.read_text(encoding="utf-8"))
+    if hashes.get("cache_version") != network.cache_version or hashes.get("stations") != network.station_hashes:
+        fail(f"docs/{STATION_HASHES_NAME} does not match the built payload. Run scripts/build_site.py.")
+
     columbia_heights = [
         station for station in stations if station.get("name") == "Columbia Heights"
     ]
@@ -1,14 +1,9 @@
 #!/usr/bin/env python3
-import csv
-import json
 import re
 import sys
-from pathlib import Path
 
-from build_site import build_station_reference_lookup, resolve_station_reference
-
-BASE_DIR = Path(__file__).resolve().parents[1]
-DOCS_DIR = BASE_DIR / "docs"
+from build_site import unmatched_route_directions
+from network import load_network
 
 LINE_COLUMNS = {
     "RD": "hasRD",
@@ -53,11 +48,6 @@ def fail(message):
     raise SystemExit(1)
 
 
-def read_rows(path):
-    with path.open(newline="") as handle:
-        return list(csv.DictReader(handle))
-
-
 def is_true(value):
     return str(value).strip().upper() in {"TRUE", "T", "YES", "1"}
 
@@ -66,23 +56,7 @@ def station_lines(row):
     return {code for code, col in LINE_COLUMNS.items() if is_true(row.get(col))}
 
 
-def load_app_data():
-    html_path = DOCS_DIR / "index.html"
-    if not html_path.exists():
-        fail("docs/index.html does not exist. Run scripts/build_site.py first.")
-    html = html_path.read_text(encoding="utf-8")
-    match = re.search(
-        r"<script id=\"app-data\" type=\"application/json\">(.*?)</script>",
-        html,
-        re.S,
-    )
-    if not match:
-        fail("docs/index.html missing embedded app-data JSON.")
-    return json.loads(match.group(1))
-
-
-def load_station_sources():
-    station_rows = read_rows(BASE_DIR / "Stations.csv")
+def load_station_sources(station_rows):
     if not station_rows:
         fail("Stations.csv has no data rows.")
 
@@ -112,13 +86,12 @@ def load_station_sources():
     return by_name
 
 
-def validate_cross_file_station_references(source_rows):
-    station_lookup = build_station_reference_lookup(source_rows)
-    for file_name in ("Exits.csv", "Egresses.csv"):
-        for row in read_rows(BASE_DIR / file_name):
-            station = row.get("nameStd", "").strip()
-            if station:
-                resolve_station_reference(station, station_lookup, file_name)
+def validate_cross_file_station_references(network):
+    # Building the exit map resolves every Exits.csv reference.
+    network.exit_map
+    # Streaming the egress rows resolves every Egresses.csv reference.
+    for _row in network.egress_rows:
+        pass
 
 
 def validate_expected_source_cases(source_by_name):
@@ -216,12 +189,50 @@ def validate_embedded_inventory(data, source_names):
                 )
 
 
-def main():
-    source_by_name = load_station_sources()
+# Lines with a route the build left out (see unmatched_route_directions) are
+# warned about instead of failing the coverage check.
+def validate_trip_routes(data, line_routes):
+    stations = data.get("stations", [])
+    trips = data.get("trips")
+    unmatched = unmatched_route_directions(stations, line_routes or [])
+    for _line, message in unmatched:
+        print(f"Warning: {message}", file=sys.stderr)
+    unmatched_lines = {line for line, _message in unmatched}
+    if not isinstance(trips, dict) or not (trips.get("routes") or unmatched):
+        fail("Embedded data has no trip routes.")
+    routed = set()
+    for route in trips["routes"]:
+        line = route.get("line")
+        indexes = route.get("stations") or []
+        keys = route.get("keys") or []
+        if line not in LINE_CODES or len(route.get("ends") or []) != 2:
+            fail(f"Embedded trip route is invalid: {line}")
+        if len(keys) != 2 or any(len(key) != len(indexes) or set(key) - {"W", "E"} for key in keys):
+            fail(f"Embedded trip route has invalid direction keys: {line} {route.get('ends')}")
+        for index in indexes:
+            if not isinstance(index, int) or not 0 <= index < len(stations):
+                fail(f"Embedded trip route has an invalid station index: {line} {index}")
+            if line not in stations[index].get("lines", []):
+                fail(f"Embedded trip route stops at {stations[index].get('name')}, which is not on the {line} Line")
+            routed.add((line, index))
+    for index, station in enumerate(stations):
+        for line in station.get("lines", []):
+            if (line, index) not in routed and line not in unmatched_lines:
+                fail(f"Embedded trip routes do not reach {station.get('name')} on the {line} Line")
+    for pair in trips.get("transfers", []):
+        names = {stations[index].get("name", "") for index in pair}
+        if len(pair) != 2 or not names <= set(EXPECTED_TRANSFER_TARGETS):
+            fail(f"Embedded trip transfer is not a split-level station pair: {sorted(names)}")
+
+
+def main(network=None):
+    network = network or load_network()
+    source_by_name = load_station_sources(network.station_rows)
     source_names = set(source_by_name)
-    validate_cross_file_station_references(source_by_name.values())
+    validate_cross_file_station_references(network)
     validate_expected_source_cases(source_by_name)
-    validate_embedded_inventory(load_app_data(), source_names)
+    validate_embedded_inventory(network.app_data, source_names)
+    validate_trip_routes(network.app_data, network.line_routes)
     print("Domain validation passed.")
 
 
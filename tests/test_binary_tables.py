@@ -0,0 +1,52 @@
+import json
+import sys
+import unittest
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / "scripts"))
+
+from build_site import build_data, decode_binary_tables, encode_binary_tables  # noqa: E402
+
+
+class BinaryTablesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        _data, data_json = build_data()
+        cls.data = json.loads(data_json)
+        cls.index_data, cls.blob = encode_binary_tables(cls.data)
+
+    def test_round_trip_matches_payload(self):
+        decoded = decode_binary_tables(json.loads(json.dumps(self.index_data)), self.blob)
+        self.assertEqual(decoded, self.data)
+
+    def test_round_trip_keeps_missing_delta_and_empty_target_lines(self):
+        data = json.loads(json.dumps(self.data))
+        station = next(station for station in data["stations"] if station["transfers_by_dir"]["WB"])
+        entry = station["transfers_by_dir"]["WB"][0]
+        entry["delta"] = None
+        entry["target_lines"] = []
+        del entry["note"]
+        index_data, blob = encode_binary_tables(data)
+        self.assertEqual(decode_binary_tables(index_data, blob), data)
+
+    def test_index_leaves_entries_to_the_blob(self):
+        self.assertNotIn("doors", self.index_data["meta"])
+        for station in self.index_data["stations"]:
+            self.assertNotIn("egress_by_dir", station)
+            self.assertNotIn("transfers_by_dir", station)
+
+    def test_encoding_is_deterministic(self):
+        self.assertEqual(encode_binary_tables(self.data)[1], self.blob)
+
+    def test_rejects_unknown_header(self):
+        with self.assertRaises(ValueError):
+            decode_binary_tables(self.index_data, b"XXXX" + self.blob[4:])
+
+    def test_rejects_size_mismatch(self):
+        with self.assertRaises(ValueError):
+            decode_binary_tables(self.index_data, self.blob + b"\0")
+
+
+if __name__ == "__main__":
+    unittest.main()
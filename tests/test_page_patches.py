@@ -0,0 +1,75 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / "scripts"))
+
+from build_site import (  # noqa: E402
+    DOCS_DIR,
+    PAGE_HISTORY_SIZE,
+    apply_page_patch,
+    load_page_history,
+    page_patch_ops,
+    page_patches,
+    record_page_history,
+    sha256_hex,
+)
+
+
+class PagePatchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.old_page = (DOCS_DIR / "index.html").read_bytes()
+        cls.new_page = cls.old_page.replace(b"Seat Pleasant", b"Seat Pleasant, MD")
+        assert cls.new_page != cls.old_page
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.history_dir = Path(temp_dir.name) / "page-history"
+        self.patches_dir = Path(temp_dir.name) / "patches"
+
+    def test_unchanged_page_is_one_copy(self):
+        self.assertEqual(page_patch_ops(self.old_page, self.old_page), [[0, len(self.old_page)]])
+
+    def test_apply_rebuilds_new_page_from_copies(self):
+        ops = page_patch_ops(self.old_page, self.new_page)
+        self.assertEqual(apply_page_patch(self.old_page, ops), self.new_page)
+        literal = sum(len(op.encode("utf-8")) for op in ops if isinstance(op, str))
+        self.assertLess(literal, len(self.new_page) * 0.1)
+
+    def test_page_without_payload_is_sent_whole(self):
+        ops = page_patch_ops(b"<p>old</p>", b"<p>new</p>")
+        self.assertEqual(ops, ["<p>new</p>"])
+        self.assertEqual(apply_page_patch(b"<p>old</p>", ops), b"<p>new</p>")
+
+    def test_patch_sha256_checks_the_result(self):
+        record_page_history(self.old_page, "old", self.history_dir)
+        record_page_history(self.new_page, "new", self.history_dir)
+        patches = page_patches(self.new_page, "new", self.history_dir, self.patches_dir)
+        self.assertEqual(list(patches), [self.patches_dir / "old.json"])
+        patch = json.loads(patches[self.patches_dir / "old.json"])
+        self.assertEqual((patch["from"], patch["to"]), ("old", "new"))
+        self.assertEqual(patch["sha256"], sha256_hex(self.new_page))
+        self.assertEqual(sha256_hex(apply_page_patch(self.old_page, patch["ops"])), patch["sha256"])
+        # A client holding some other page must not accept the result.
+        other_page = self.old_page.replace(b"Addison Road", b"Addison Rd.")
+        self.assertNotEqual(sha256_hex(apply_page_patch(other_page, patch["ops"])), patch["sha256"])
+
+    def test_oversized_patches_are_skipped(self):
+        record_page_history(b"<p>unrelated</p>" * 100, "old", self.history_dir)
+        self.assertEqual(page_patches(self.new_page, "new", self.history_dir, self.patches_dir), {})
+
+    def test_history_keeps_newest_pages(self):
+        for number in range(PAGE_HISTORY_SIZE + 2):
+            record_page_history(f"<p>{number}</p>".encode("utf-8"), f"v{number}", self.history_dir)
+        expected = [f"v{number}" for number in range(PAGE_HISTORY_SIZE + 1, 1, -1)]
+        self.assertEqual(load_page_history(self.history_dir), expected)
+        self.assertEqual(len(list(self.history_dir.glob("*.html.gz"))), PAGE_HISTORY_SIZE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / "scripts"))
+
+import build_site  # noqa: E402
+from build_site import INPUT_FILES, PARSE_CACHE_KEEP, ParseCache, StationCache, build_data  # noqa: E402
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.work_dir = Path(temp_dir.name)
+        self.cache_dir = self.work_dir / "parse"
+        self.source = self.work_dir / "source.csv"
+        self.source.write_text("a,b\n1,2\n", encoding="utf-8")
+        self.parses = 0
+
+    def load(self, parse_cache, kind="rows"):
+        def parse():
+            self.parses += 1
+            return {"text": self.source.read_text(encoding="utf-8")}
+
+        return parse_cache.load(kind, [self.source], parse, dict, dict)
+
+    def test_reuses_unchanged_source(self):
+        first = self.load(ParseCache(self.cache_dir))
+        parse_cache = ParseCache(self.cache_dir)
+        self.assertEqual(self.load(parse_cache), first)
+        self.assertEqual(self.parses, 1)
+        self.assertEqual(parse_cache.hits, ["rows"])
+
+    def test_source_edit_invalidates(self):
+        self.load(ParseCache(self.cache_dir))
+        self.source.write_text("a,b\n1,3\n", encoding="utf-8")
+        parse_cache = ParseCache(self.cache_dir)
+        self.assertEqual(self.load(parse_cache), {"text": "a,b\n1,3\n"})
+        self.assertEqual(parse_cache.misses, ["rows"])
+
+    def test_parser_code_change_invalidates(self):
+        self.load(ParseCache(self.cache_dir))
+        with mock.patch.object(build_site, "parser_code_hash", return_value="edited"):
+            self.load(ParseCache(self.cache_dir))
+        self.assertEqual(self.parses, 2)
+
+    def test_corrupt_entry_is_reparsed(self):
+        self.load(ParseCache(self.cache_dir))
+        for path in self.cache_dir.glob("rows-*.json"):
+            path.write_text("{", encoding="utf-8")
+        self.assertEqual(self.load(ParseCache(self.cache_dir)), {"text": "a,b\n1,2\n"})
+        self.assertEqual(self.parses, 2)
+
+    def test_keeps_recent_entries_per_kind(self):
+        for value in range(PARSE_CACHE_KEEP + 2):
+            self.source.write_text(f"a\n{value}\n", encoding="utf-8")
+            self.load(ParseCache(self.cache_dir))
+            self.load(ParseCache(self.cache_dir), kind="other")
+        self.assertEqual(len(list(self.cache_dir.glob("rows-*.json"))), PARSE_CACHE_KEEP)
+        self.assertEqual(len(list(self.cache_dir.glob("other-*.json"))), PARSE_CACHE_KEEP)
+
+    def test_parser_code_hash_covers_row_schemas(self):
+        before = build_site.parser_code_hash()
+        schemas = {**build_site.ROW_SCHEMAS, "Extra": build_site.ROW_SCHEMAS["Doors"]}
+        with mock.patch.object(build_site, "ROW_SCHEMAS", schemas):
+            build_site.parser_code_hash.cache_clear()
+            self.assertNotEqual(build_site.parser_code_hash(), before)
+        build_site.parser_code_hash.cache_clear()
+        self.assertEqual(build_site.parser_code_hash(), before)
+
+
+class StationCacheTest(unittest.TestCase):
+    def test_hits_are_fresh_copies(self):
+        station_cache = StationCache()
+        self.assertIsNone(station_cache.get("key"))
+        station_cache.put("key", {"entries": [1]})
+        station_cache.get("key")["entries"].append(2)
+        self.assertEqual(station_cache.get("key"), {"entries": [1]})
+        self.assertEqual((station_cache.hits, station_cache.misses), (2, 1))
+        self.assertEqual(station_cache.keys, ["key", "key", "key"])
+
+    def test_build_keys_limit_misses(self):
+        station_cache = StationCache(build_keys={"wanted"})
+        self.assertTrue(station_cache.should_build("wanted"))
+        self.assertFalse(station_cache.should_build("other"))
+        self.assertTrue(StationCache().should_build("other"))
+
+    def test_egress_edit_rebuilds_only_its_station(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_files = {key: Path(temp_dir) / path.name for key, path in INPUT_FILES.items()}
+            for key, path in INPUT_FILES.items():
+                shutil.copyfile(path, input_files[key])
+            store = {}
+            first = StationCache(store)
+            data, _data_json = build_data(input_files=input_files, station_cache=first)
+            self.assertEqual(first.hits, 0)
+            self.assertEqual(first.misses, len(data["stations"]))
+
+            unchanged = StationCache(store)
+            build_data(input_files=input_files, station_cache=unchanged)
+            self.assertEqual((unchanged.hits, unchanged.misses), (len(data["stations"]), 0))
+
+            egresses = input_files["egresses"].read_bytes()
+            edited = egresses.replace(b"\nAddison Road,esc,3,", b"\nAddison Road,esc,4,", 1)
+            self.assertNotEqual(edited, egresses)
+            input_files["egresses"].write_bytes(edited)
+            after_edit = StationCache(store)
+            build_data(input_files=input_files, station_cache=after_edit)
+            self.assertEqual((after_edit.hits, after_edit.misses), (len(data["stations"]) - 1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()